@@ -0,0 +1,126 @@
+# measures how much memory the raw and cooked ASTs of big files take
+#
+# run this from the directory that contains asdac:
+#
+#    $ python3 asdac-benchmarks/ast_memory.py
+#
+# the AST nodes used to be namedtuples, and the same ASTs are also copied to
+# namedtuples for comparing, see asdac/utils.py for what they are now
+#
+# "bytes/node" is the average size of one node object, and "whole AST" is the
+# total memory allocated for keeping the AST, including locations, strings and
+# other things in it, the namedtuple column is that with the sizes of the
+# nodes replaced
+
+import argparse
+import collections
+import pathlib
+import sys
+import tracemalloc
+
+benchmark_dir = pathlib.Path(__file__).absolute().parent
+sys.path.insert(0, str(benchmark_dir.parent))
+
+from asdac import common, cooked_ast, raw_ast, utils     # noqa
+import programs     # noqa
+
+# wide_imports is not here, because cooking needs the imported files
+PROGRAM_NAMES = ['many_functions', 'deep_nesting', 'long_expressions',
+                 'string_interpolations', 'big_classes']
+
+
+def _new_compilation():
+    return common.Compilation(
+        pathlib.Path('main.asda').absolute(), pathlib.Path('asda-compiled'),
+        common.Messager(-1))
+
+
+# returns (result, number of bytes allocated for keeping the result)
+def measure_memory(function, *args):
+    tracemalloc.start()
+    try:
+        result = common.call_with_deep_recursion(function, *args)
+        size = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    return (result, size)
+
+
+# works with utils.Node objects and namedtuples
+def get_nodes(value):
+    # list instead of recursion, because deep_nesting is deep
+    result = []
+    stack = [value]
+    while stack:
+        value = stack.pop()
+        if hasattr(value, '_fields'):
+            result.append(value)
+            stack.extend(getattr(value, name) for name in value._fields)
+        elif isinstance(value, (list, tuple)):
+            stack.extend(value)
+    return result
+
+
+_namedtuple_classes = {}
+
+
+# returns a copy of an AST with namedtuples instead of utils.Node objects
+def to_namedtuples(value):
+    if isinstance(value, utils.Node):
+        klass = type(value)
+        if klass not in _namedtuple_classes:
+            _namedtuple_classes[klass] = collections.namedtuple(
+                klass.__name__, klass._fields)
+        return _namedtuple_classes[klass](*map(to_namedtuples,
+                                               value._values()))
+    if isinstance(value, list):
+        return list(map(to_namedtuples, value))
+    if isinstance(value, tuple):
+        return tuple(map(to_namedtuples, value))
+    return value
+
+
+def print_row(name, ast, total_size):
+    namedtuple_ast = common.call_with_deep_recursion(to_namedtuples, ast)
+    nodes = get_nodes(ast)
+    node_size = sum(map(sys.getsizeof, nodes))
+    namedtuple_size = sum(map(sys.getsizeof, get_nodes(namedtuple_ast)))
+
+    print('%-30s %8d %10.1f %10.1f %10dk %10dk' % (
+        name, len(nodes), node_size / len(nodes),
+        namedtuple_size / len(nodes), total_size // 1000,
+        (total_size - node_size + namedtuple_size) // 1000))
+
+
+def cook(compilation, raw):
+    compilation.set_imports([])
+    cooked, export_types = cooked_ast.cook(compilation, raw, {})
+    return cooked
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--size', type=int, default=500,
+        help="size given to the generators in programs.py, default is 500")
+    args = parser.parse_args()
+
+    print('%-30s %8s %21s %23s' % ('', '', 'bytes/node', 'whole AST'))
+    print('%-30s %8s %10s %10s %11s %11s' % (
+        'program', 'nodes', 'now', 'namedtuple', 'now', 'namedtuple'))
+
+    for program_name in PROGRAM_NAMES:
+        generator, junk = programs.PROGRAMS[program_name]
+        code = generator(args.size)['main.asda']
+        compilation = _new_compilation()
+
+        (raw, imports), raw_size = measure_memory(
+            raw_ast.parse, compilation, code)
+        cooked, cooked_size = measure_memory(cook, compilation, raw)
+
+        print_row(program_name + ' (raw)', raw, raw_size)
+        print_row(program_name + ' (cooked)', cooked, cooked_size)
+
+
+if __name__ == '__main__':
+    main()
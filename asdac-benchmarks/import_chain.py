@@ -0,0 +1,87 @@
+# measures "asdac --jobs N" with a long chain of imports, with and without
+# finding out export types before compiling
+#
+# module1.asda imports module0.asda, module2.asda imports module1.asda and so
+# on, so without the export types from cooked_ast.extract_export_types(), each
+# module must wait until the previous module is compiled, and only one file is
+# compiled at a time
+#
+# run this from the directory that contains asdac:
+#
+#    $ python3 asdac-benchmarks/import_chain.py
+
+import argparse
+import os
+import pathlib
+import sys
+import tempfile
+import time
+
+benchmark_dir = pathlib.Path(__file__).absolute().parent
+sys.path.insert(0, str(benchmark_dir.parent))
+
+import asdac.__main__       # noqa
+from asdac import common     # noqa
+
+
+class NoExtractingCompileManager(asdac.__main__.ParallelCompileManager):
+    _extract_exports = False
+
+
+def generate_module(index, functions):
+    lines = []
+    if index != 0:
+        lines.append('import "module%d.asda" as previous' % (index - 1))
+    for function in range(functions):
+        lines.extend([
+            'export let f%d = (Int x) -> Int:' % function,
+            '    let y = x * %d' % (function + 1),
+            '    if y == %d:' % index,
+            '        print("module %d, function %d: {y}")' % (index, function),
+            '    return y + x - 1',
+            '',
+        ])
+    if index != 0:
+        lines.append('print(previous:f0(1).to_string())')
+    return '\n'.join(lines) + '\n'
+
+
+def generate_program(directory, modules, functions):
+    for index in range(modules):
+        (directory / ('module%d.asda' % index)).write_text(
+            generate_module(index, functions), encoding='utf-8')
+    return directory / ('module%d.asda' % (modules - 1))
+
+
+def time_compiling(manager_class, directory, main_path, jobs):
+    compile_manager = manager_class(
+        directory / 'asda-compiled', common.Messager(-1), True, jobs)
+    start = time.perf_counter()
+    compile_manager.compile_all([main_path])
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--modules', type=int, default=16)
+    parser.add_argument('--functions', type=int, default=30,
+                        help="number of functions in each module")
+    parser.add_argument('--jobs', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        directory = pathlib.Path(directory)
+        main_path = generate_program(directory, args.modules, args.functions)
+
+        print("%d modules with %d functions each, --jobs %d" % (
+            args.modules, args.functions, args.jobs))
+        for description, manager_class in [
+                ("waiting for imports", NoExtractingCompileManager),
+                ("extracting exports", asdac.__main__.ParallelCompileManager)]:
+            seconds = time_compiling(
+                manager_class, directory, main_path, args.jobs)
+            print("%-20s  %7.3fs" % (description, seconds))
+
+
+if __name__ == '__main__':
+    main()
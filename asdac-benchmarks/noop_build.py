@@ -0,0 +1,84 @@
+# measures how long it takes to find out that nothing needs to be compiled
+#
+# the time is measured inside one python process, so starting python and
+# importing asdac are not included
+#
+# run this from the directory that contains asdac:
+#
+#    $ python3 asdac-benchmarks/noop_build.py
+
+import argparse
+import os
+import pathlib
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).absolute().parent.parent))
+
+import asdac.__main__       # noqa
+from asdac import common, manifest     # noqa
+
+
+def generate_program(directory, modules):
+    # each module imports the previous module, and main.asda imports them all
+    main_lines = []
+    for index in range(modules):
+        lines = ['export let message = "module %d"' % index]
+        if index != 0:
+            lines.insert(0, 'import "module%d.asda" as previous' % (index - 1))
+            lines.append('print(previous:message)')
+
+        (directory / ('module%d.asda' % index)).write_text(
+            '\n'.join(lines) + '\n', encoding='utf-8')
+        main_lines.append('import "module%d.asda" as module%d'
+                          % (index, index))
+
+    main_lines.append('print(module0:message)')
+    (directory / 'main.asda').write_text(
+        '\n'.join(main_lines) + '\n', encoding='utf-8')
+
+
+def time_build(directory, jobs):
+    compiled_dir = directory / 'asda-compiled'
+    messager = common.Messager(-1)
+    if jobs == 1:
+        compile_manager = asdac.__main__.CompileManager(
+            compiled_dir, messager, False)
+    else:
+        compile_manager = asdac.__main__.ParallelCompileManager(
+            compiled_dir, messager, False, jobs)
+
+    start = time.perf_counter()
+    compile_manager.compile_all([directory / 'main.asda'])
+    end = time.perf_counter()
+    return (end - start, compile_manager.something_was_compiled)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--modules', type=int, default=1000)
+    parser.add_argument('--jobs', type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        directory = pathlib.Path(directory)
+        generate_program(directory, args.modules)
+        manifest_path = directory / 'asda-compiled' / manifest.FILENAME
+
+        seconds, compiled = time_build(directory, args.jobs)
+        assert compiled
+        print("first build:               %8.3fs" % seconds)
+
+        seconds, compiled = time_build(directory, args.jobs)
+        assert not compiled
+        print("no-op build:               %8.3fs" % seconds)
+
+        os.remove(str(manifest_path))
+        seconds, compiled = time_build(directory, args.jobs)
+        assert not compiled
+        print("no-op build, no manifest:  %8.3fs" % seconds)
+
+
+if __name__ == '__main__':
+    main()
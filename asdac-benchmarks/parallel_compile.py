@@ -0,0 +1,91 @@
+# compares "asdac --jobs N" with compiling one file at a time
+#
+# the generated program is a wide import graph: main.asda imports many
+# modules that don't import each other, so they can all be compiled at the
+# same time
+#
+# run this from the directory that contains asdac:
+#
+#    $ python3 asdac-benchmarks/parallel_compile.py
+
+import argparse
+import os
+import pathlib
+import subprocess
+import sys
+import tempfile
+import time
+
+
+def generate_module(index, functions):
+    lines = []
+    for function in range(functions):
+        lines.extend([
+            'export let f%d = (Int x) -> Int:' % function,
+            '    let y = x * %d' % (function + 1),
+            '    if y == %d:' % index,
+            '        print("module %d, function %d: {y}")' % (index, function),
+            '    return y + x - 1',
+            '',
+        ])
+    return '\n'.join(lines)
+
+
+def generate_program(directory, modules, functions):
+    main_lines = []
+    for index in range(modules):
+        name = 'module%d' % index
+        (directory / (name + '.asda')).write_text(
+            generate_module(index, functions), encoding='utf-8')
+        main_lines.append('import "%s.asda" as %s' % (name, name))
+
+    for index in range(modules):
+        main_lines.append('print(module%d:f0(1).to_string())' % index)
+    (directory / 'main.asda').write_text(
+        '\n'.join(main_lines) + '\n', encoding='utf-8')
+
+
+def time_compiling(directory, jobs):
+    asdac_dir = pathlib.Path(__file__).absolute().parent.parent
+    env = dict(os.environ)
+    env['PYTHONPATH'] = str(asdac_dir)
+
+    start = time.perf_counter()
+    subprocess.check_call(
+        [sys.executable, '-m', 'asdac', '--always-recompile', '--quiet',
+         '--jobs', str(jobs), 'main.asda'],
+        cwd=str(directory), env=env)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--modules', type=int, default=32)
+    parser.add_argument('--functions', type=int, default=30,
+                        help="number of functions in each module")
+    parser.add_argument('--max-jobs', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        directory = pathlib.Path(directory)
+        generate_program(directory, args.modules, args.functions)
+
+        jobs_list = [1]
+        while jobs_list[-1] * 2 <= args.max_jobs:
+            jobs_list.append(jobs_list[-1] * 2)
+        if jobs_list[-1] != args.max_jobs:
+            jobs_list.append(args.max_jobs)
+
+        print("%d modules with %d functions each, %d CPUs" % (
+            args.modules, args.functions, os.cpu_count()))
+        one_job_time = None
+        for jobs in jobs_list:
+            seconds = time_compiling(directory, jobs)
+            if one_job_time is None:
+                one_job_time = seconds
+            print("--jobs %-3d  %7.3fs  speedup %.2fx" % (
+                jobs, seconds, one_job_time / seconds))
+
+
+if __name__ == '__main__':
+    main()
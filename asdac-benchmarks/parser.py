@@ -0,0 +1,93 @@
+# checks that parsing time grows linearly with the number of tokens
+#
+# run this from the directory that contains asdac:
+#
+#    $ python3 asdac-benchmarks/parser.py
+#
+# programs from programs.py are parsed with sizes that give about 70k, 140k
+# and 280k tokens, which is 10k to 40k statements in many_functions, and
+# expressions with 3k to 12k operators in long_expressions, and the time per
+# token should stay about the same
+#
+# the "growth" column is like in stages.py, but compared to the number of
+# tokens: 1.0 means linear, 2.0 means quadratic etc
+
+import argparse
+import math
+import pathlib
+import sys
+import time
+
+benchmark_dir = pathlib.Path(__file__).absolute().parent
+sys.path.insert(0, str(benchmark_dir.parent))
+
+from asdac import common, raw_ast, tokenizer     # noqa
+import programs     # noqa
+
+# deep_nesting is not here, because parsing it fails with RecursionError, and
+# wide_imports is mostly about other files than main.asda
+PROGRAM_NAMES = ['many_functions', 'long_expressions', 'string_interpolations',
+                 'big_classes']
+
+
+def _new_compilation():
+    return common.Compilation(
+        pathlib.Path('main.asda').absolute(), pathlib.Path('asda-compiled'),
+        common.Messager(-1))
+
+
+def count_tokens(code):
+    return sum(1 for token in tokenizer.tokenize(_new_compilation(), code))
+
+
+# returns best time in seconds
+def time_parsing(code, repeat):
+    compilation = _new_compilation()
+    best = float('inf')
+    for junk in range(repeat):
+        start = time.perf_counter()
+        raw_ast.parse(compilation, code)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--tokens', type=int, default=70000,
+        help="number of tokens in the smallest files, default is 70000")
+    parser.add_argument(
+        '--repeat', type=int, default=3,
+        help="parse each file this many times and use the best time")
+    args = parser.parse_args()
+
+    print('%-22s %10s %10s %12s %8s' % (
+        'program', 'lines', 'tokens', 'us/token', 'growth'))
+
+    for program_name in PROGRAM_NAMES:
+        generator, junk = programs.PROGRAMS[program_name]
+
+        # the sizes of programs.py don't map directly to numbers of tokens
+        tokens_per_size = count_tokens(generator(100)['main.asda']) / 100
+
+        previous = None
+        for multiplier in [1, 2, 4]:
+            size = math.ceil(args.tokens * multiplier / tokens_per_size)
+            code = generator(size)['main.asda']
+            tokens = count_tokens(code)
+            seconds = time_parsing(code, args.repeat)
+
+            if previous is None:
+                growth = ''
+            else:
+                growth = '%.2f' % (math.log(seconds / previous[1]) /
+                                   math.log(tokens / previous[0]))
+            previous = (tokens, seconds)
+
+            print('%-22s %10d %10d %12.2f %8s' % (
+                program_name, code.count('\n'), tokens,
+                seconds / tokens * 1e6, growth))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+# generators of asda programs for benchmarking the compiler
+#
+# each generator takes a size and returns {filename: source code}, and the
+# program is compiled by compiling main.asda, so bigger sizes should mean
+# roughly proportionally more code
+
+
+def _indent(lines, levels=1):
+    return [' ' * 4 * levels + line for line in lines]
+
+
+def many_functions(size):
+    lines = []
+    for index in range(size):
+        lines.extend([
+            'let f%d = (Int x, Str s) -> Str:' % index,
+            '    let y = x * %d + 1' % index,
+            '    if y == %d:' % index,
+            '        return s',
+            '    return "{s} {y.to_string()}"',
+            '',
+        ])
+    lines.extend('print(f%d(%d, "hello"))' % (index, index)
+                 for index in range(size))
+    return {'main.asda': '\n'.join(lines) + '\n'}
+
+
+def deep_nesting(size):
+    lines = ['let x = 0']
+    for level in range(size):
+        lines.extend(_indent([
+            'if x == %d:' % level,
+            '    print("level %d")' % level,
+            'x = x + 1',
+            'while x == %d:' % -level,
+        ], level))
+    lines.extend(_indent(['print("deepest")'], size))
+    return {'main.asda': '\n'.join(lines) + '\n'}
+
+
+def long_expressions(size):
+    # 10 lines with size numbers in each line
+    lines = []
+    for index in range(10):
+        terms = ' + '.join('%d * x' % number for number in range(size))
+        lines.append('let x%d = (Int x) -> Int:' % index)
+        lines.append('    return ' + terms)
+        lines.append('print(x%d(%d).to_string())' % (index, index))
+    return {'main.asda': '\n'.join(lines) + '\n'}
+
+
+def string_interpolations(size):
+    lines = ['let a = "a"', 'let b = 123']
+    for index in range(size):
+        lines.append('print("%d: {a} and {b.to_string()}, {a}{a}{a}")'
+                     % index)
+    return {'main.asda': '\n'.join(lines) + '\n'}
+
+
+def wide_imports(size):
+    files = {}
+    main_lines = []
+    for index in range(size):
+        files['module%d.asda' % index] = '\n'.join([
+            'export let message = "module %d"' % index,
+            'export let get_number = () -> Int:',
+            '    return %d' % index,
+        ]) + '\n'
+        main_lines.insert(
+            0, 'import "module%d.asda" as module%d' % (index, index))
+        main_lines.append('print(module%d:message)' % index)
+    files['main.asda'] = '\n'.join(main_lines) + '\n'
+    return files
+
+
+def big_classes(size):
+    # 10 classes with size attributes and size methods in each
+    lines = []
+    for klass in range(10):
+        lines.append('class Class%d(%s):' % (klass, ', '.join(
+            'Str attribute%d' % index for index in range(size))))
+        for index in range(size):
+            lines.extend(_indent([
+                'method method%d(Int x) -> Str:' % index,
+                '    return "{this.attribute%d} {x.to_string()}"' % index,
+            ]))
+        lines.append('')
+    return {'main.asda': '\n'.join(lines) + '\n'}
+
+
+# {name: (generator, default sizes)}
+#
+# some of the sizes are small because the optimizer currently fails with
+# RecursionError for long files
+PROGRAMS = {
+    'many_functions': (many_functions, [10, 20, 40]),
+    'deep_nesting': (deep_nesting, [5, 10, 20, 40]),
+    'long_expressions': (long_expressions, [25, 50, 100]),
+    'string_interpolations': (string_interpolations, [5, 10, 20]),
+    'wide_imports': (wide_imports, [25, 50, 100, 200]),
+    'big_classes': (big_classes, [10, 20, 40, 80]),
+}
@@ -0,0 +1,99 @@
+# measures how long it takes to recompile after changing the exports of a
+# file that many other files import
+#
+# the importing files don't change, so their raw ASTs are loaded from the
+# .rawast files next to the compiled files instead of parsing them again, see
+# asdac/raw_ast_cache.py
+#
+# run this from the directory that contains asdac:
+#
+#    $ python3 asdac-benchmarks/rebuild.py
+
+import argparse
+import pathlib
+import sys
+import tempfile
+import time
+
+benchmark_dir = pathlib.Path(__file__).absolute().parent
+sys.path.insert(0, str(benchmark_dir.parent))
+
+import asdac.__main__       # noqa
+from asdac import common, timings     # noqa
+import programs     # noqa
+
+
+def generate_program(directory, modules, size):
+    # every module imports lib.asda, and main.asda imports all modules
+    main_lines = []
+    for index in range(modules):
+        code = programs.many_functions(size)['main.asda']
+        (directory / ('module%d.asda' % index)).write_text(
+            'import "lib.asda" as lib\n' + code + 'print(lib:message)\n',
+            encoding='utf-8')
+        main_lines.append('import "module%d.asda" as module%d'
+                          % (index, index))
+
+    main_lines.append('print("hello")')
+    (directory / 'main.asda').write_text(
+        '\n'.join(main_lines) + '\n', encoding='utf-8')
+    change_exports(directory, 0)
+
+
+def change_exports(directory, number):
+    (directory / 'lib.asda').write_text(
+        'export let message = "hello"\n' +
+        ''.join('export let number%d = %d\n' % (n, n) for n in range(number)),
+        encoding='utf-8')
+
+
+# returns (total seconds, seconds spent in the parse phase)
+def time_build(directory):
+    compile_manager = asdac.__main__.CompileManager(
+        directory / 'asda-compiled', common.Messager(-1), False)
+
+    recorder = timings.Timings()
+    start = time.perf_counter()
+    with timings.activated(recorder):
+        compile_manager.compile_all([directory / 'main.asda'])
+    end = time.perf_counter()
+    assert compile_manager.something_was_compiled
+
+    parse_time = sum(phase.wall_time for phase in recorder.phases
+                     if phase.name == 'parse')
+    return (end - start, parse_time)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--modules', type=int, default=20,
+        help="number of files that import the changing file, default is 20")
+    parser.add_argument(
+        '--size', type=int, default=20,
+        help="number of functions in each importing file, default is 20")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        directory = pathlib.Path(directory)
+        generate_program(directory, args.modules, args.size)
+
+        seconds, parse_seconds = time_build(directory)
+        print("first build:                 %8.3fs, parsing %8.3fs"
+              % (seconds, parse_seconds))
+
+        change_exports(directory, 1)
+        seconds, parse_seconds = time_build(directory)
+        print("rebuild with raw AST files:  %8.3fs, parsing %8.3fs"
+              % (seconds, parse_seconds))
+
+        for path in (directory / 'asda-compiled').glob('*.rawast'):
+            path.unlink()
+        change_exports(directory, 2)
+        seconds, parse_seconds = time_build(directory)
+        print("rebuild without them:        %8.3fs, parsing %8.3fs"
+              % (seconds, parse_seconds))
+
+
+if __name__ == '__main__':
+    main()
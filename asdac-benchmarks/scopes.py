@@ -0,0 +1,77 @@
+# checks that looking up and defining names doesn't get slower when the
+# code is deeply nested
+#
+# run this from the directory that contains asdac:
+#
+#    $ python3 asdac-benchmarks/scopes.py
+#
+# each program has a variable defined at each level of nested if statements,
+# and the innermost if statement contains lots of lets that use the variables,
+# so cooking them looks up and defines names with all the scopes around them
+#
+# the time per let statement should be about the same for all depths
+
+import argparse
+import pathlib
+import sys
+import time
+
+benchmark_dir = pathlib.Path(__file__).absolute().parent
+sys.path.insert(0, str(benchmark_dir.parent))
+
+from asdac import common, cooked_ast, raw_ast     # noqa
+
+DEPTHS = [1, 10, 100]
+
+
+def generate_code(depth, lets):
+    lines = []
+    for level in range(depth):
+        lines.append('    ' * level + 'let v%d = %d' % (level, level))
+        lines.append('    ' * level + 'if v%d == %d:' % (level, level))
+    lines.extend('    ' * depth + 'let x%d = v%d + v0' % (index, index % depth)
+                 for index in range(lets))
+    return '\n'.join(lines) + '\n'
+
+
+def _new_compilation():
+    compilation = common.Compilation(
+        pathlib.Path('main.asda').absolute(), pathlib.Path('asda-compiled'),
+        common.Messager(-1))
+    compilation.set_imports([])
+    return compilation
+
+
+# returns best time in seconds
+def time_cooking(code, repeat):
+    best = float('inf')
+    for junk in range(repeat):
+        compilation = _new_compilation()
+        raw, imports = common.call_with_deep_recursion(
+            raw_ast.parse, compilation, code)
+
+        start = time.perf_counter()
+        common.call_with_deep_recursion(cooked_ast.cook, compilation, raw, {})
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--lets', type=int, default=20000,
+        help="number of let statements in the innermost scope")
+    parser.add_argument(
+        '--repeat', type=int, default=3,
+        help="cook each file this many times and use the best time")
+    args = parser.parse_args()
+
+    print('%8s %10s %10s' % ('depth', 'lets', 'us/let'))
+    for depth in DEPTHS:
+        seconds = time_cooking(generate_code(depth, args.lets), args.repeat)
+        print('%8d %10d %10.2f' % (
+            depth, args.lets, seconds / args.lets * 1e6))
+
+
+if __name__ == '__main__':
+    main()
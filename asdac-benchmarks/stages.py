@@ -0,0 +1,210 @@
+# times each stage of the compiler with programs from programs.py
+#
+# run this from the directory that contains asdac:
+#
+#    $ python3 asdac-benchmarks/stages.py --save before
+#    $ (change something)
+#    $ python3 asdac-benchmarks/stages.py --compare before
+#
+# results are saved to asdac-benchmarks/results/NAME.json, and comparing
+# shows how much slower or faster each stage got
+#
+# for each program, there is a "growth" column that is 1.0 if doubling the
+# size doubles the time, 2.0 if doubling the size makes it 4 times slower etc,
+# so super-linear things show up as growths clearly bigger than 1
+
+import argparse
+import collections
+import contextlib
+import datetime
+import json
+import math
+import os
+import pathlib
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+benchmark_dir = pathlib.Path(__file__).absolute().parent
+sys.path.insert(0, str(benchmark_dir.parent))
+
+import asdac.__main__       # noqa
+from asdac import common, timings, tokenizer     # noqa
+import programs     # noqa
+
+STAGES = ['tokenize', 'parse', 'cook', 'create_tree', 'optimize',
+          'create_bytecode']
+
+
+def write_program(directory, files):
+    for filename, code in files.items():
+        (directory / filename).write_text(code, encoding='utf-8')
+
+
+# returns {stage: seconds}
+def time_stages_once(directory):
+    messager = common.Messager(-1)
+    compiled_dir = directory / 'asda-compiled'
+    result = collections.OrderedDict.fromkeys(STAGES, 0.0)
+
+    # raw_ast.parse() tokenizes lazily, so tokenizing is included in the
+    # parse time and measured here separately
+    for path in sorted(directory.glob('*.asda')):
+        compilation = common.Compilation(path, compiled_dir, messager)
+        code = path.read_text(encoding='utf-8')
+        start = time.perf_counter()
+        for junk in tokenizer.tokenize(compilation, code):
+            pass
+        result['tokenize'] += time.perf_counter() - start
+
+    compile_manager = asdac.__main__.CompileManager(
+        compiled_dir, messager, True)
+    recorder = timings.Timings()
+    # warnings are printed even with --quiet
+    with open(os.devnull, 'w') as devnull:
+        with contextlib.redirect_stderr(devnull):
+            with timings.activated(recorder):
+                compile_manager.compile_all([directory / 'main.asda'])
+
+    for phase in recorder.phases:
+        if phase.name in result:
+            result[phase.name] += phase.wall_time
+    return result
+
+
+# returns {stage: seconds} with the best time of each stage, or the name of
+# the error if compiling failed
+def time_stages(program_name, size, repeat):
+    generator, junk = programs.PROGRAMS[program_name]
+    with tempfile.TemporaryDirectory() as directory:
+        directory = pathlib.Path(directory)
+        write_program(directory, generator(size))
+
+        results = []
+        for junk in range(repeat):
+            try:
+                results.append(time_stages_once(directory))
+            except (RecursionError, common.CompileError) as e:
+                return type(e).__name__
+
+    return collections.OrderedDict(
+        (stage, min(result[stage] for result in results))
+        for stage in STAGES)
+
+
+def get_growth(old_size, old_seconds, new_size, new_seconds):
+    if old_seconds <= 0 or new_seconds <= 0:
+        return float('nan')
+    return (math.log(new_seconds / old_seconds) /
+            math.log(new_size / old_size))
+
+
+def print_table(results, compare_results):
+    header = '%-22s %6s %9s %7s' % ('program', 'size', 'total', 'growth')
+    header += ''.join(' %15s' % stage for stage in STAGES)
+    print(header)
+
+    for program_name, sizes in results.items():
+        previous = None
+        for size_string, stages in sizes.items():
+            size = int(size_string)
+            if isinstance(stages, str):
+                print('%-22s %6d  failed: %s' % (program_name, size, stages))
+                previous = None
+                continue
+
+            total = sum(stages.values())
+            if previous is None:
+                growth = ''
+            else:
+                growth = '%.2f' % get_growth(*previous, size, total)
+            previous = (size, total)
+
+            line = '%-22s %6d %8.3fs %7s' % (program_name, size, total, growth)
+            for stage in STAGES:
+                line += ' %14.2fms' % (stages[stage] * 1000)
+            print(line)
+
+            try:
+                old_stages = compare_results[program_name][size_string]
+            except (KeyError, TypeError):
+                continue
+            if isinstance(old_stages, str):
+                continue
+
+            line = '%-22s %6s %8.2fx %7s' % (
+                '', 'vs old', total / sum(old_stages.values()), '')
+            for stage in STAGES:
+                if old_stages[stage] > 0:
+                    line += ' %15s' % ('%.2fx' % (
+                        stages[stage] / old_stages[stage]))
+                else:
+                    line += ' %15s' % '-'
+            print(line)
+
+
+def get_asdac_version():
+    try:
+        return subprocess.check_output(
+            ['git', 'describe', '--always', '--dirty'],
+            cwd=str(benchmark_dir), stderr=subprocess.DEVNULL,
+        ).decode('utf-8').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--programs', nargs='+', choices=sorted(programs.PROGRAMS),
+        default=list(programs.PROGRAMS), metavar='PROGRAM',
+        help="which programs to compile, default is all of them: " +
+        ', '.join(programs.PROGRAMS))
+    parser.add_argument(
+        '--sizes', type=int, nargs='+',
+        help="sizes of the programs, default depends on the program")
+    parser.add_argument(
+        '--repeat', type=int, default=3,
+        help="compile each program this many times and use the best times")
+    parser.add_argument(
+        '--save', metavar='NAME',
+        help="save results to asdac-benchmarks/results/NAME.json")
+    parser.add_argument(
+        '--compare', metavar='NAME',
+        help="compare with asdac-benchmarks/results/NAME.json")
+    args = parser.parse_args()
+
+    compare_results = None
+    if args.compare is not None:
+        with (benchmark_dir / 'results' / (args.compare + '.json')).open(
+                'r', encoding='utf-8') as file:
+            compare_results = json.load(file)['results']
+
+    results = collections.OrderedDict()
+    for program_name in args.programs:
+        junk, default_sizes = programs.PROGRAMS[program_name]
+        results[program_name] = collections.OrderedDict(
+            (str(size), time_stages(program_name, size, args.repeat))
+            for size in (args.sizes or default_sizes))
+
+    print_table(results, compare_results)
+
+    if args.save is not None:
+        (benchmark_dir / 'results').mkdir(exist_ok=True)
+        path = benchmark_dir / 'results' / (args.save + '.json')
+        with path.open('w', encoding='utf-8') as file:
+            json.dump(collections.OrderedDict([
+                ('asdac_version', get_asdac_version()),
+                ('python_version', platform.python_version()),
+                ('date', datetime.datetime.now().isoformat()),
+                ('repeat', args.repeat),
+                ('results', results),
+            ]), file, indent=2)
+            file.write('\n')
+        print("Saved to", common.path_string(path))
+
+
+if __name__ == '__main__':
+    main()
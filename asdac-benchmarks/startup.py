@@ -0,0 +1,97 @@
+# measures how long 'python3 -m asdac' takes when there is nothing to do
+#
+# unlike noop_build.py, this runs asdac in a new process each time, so
+# starting python and importing asdac are included, and they are usually most
+# of the time when nothing needs to be compiled
+#
+# run this from the directory that contains asdac:
+#
+#    $ python3 asdac-benchmarks/startup.py
+
+import argparse
+import os
+import pathlib
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+benchmark_dir = pathlib.Path(__file__).absolute().parent
+sys.path.insert(0, str(benchmark_dir))
+
+import noop_build       # noqa
+
+# these are slow to import and shouldn't be needed when nothing needs to be
+# compiled, so they are listed if they get imported anyway
+SLOW_MODULES = ['asdac.cooked_ast', 'asdac.decision_tree', 'asdac.optimizer',
+                'asdac.raw_ast', 'asdac.tokenizer', 'colorama',
+                'concurrent.futures', 'more_itertools', 'regex']
+
+
+# the asdac being benchmarked is not necessarily installed
+ENV = dict(os.environ, PYTHONPATH=str(benchmark_dir.parent))
+
+
+def run(args, directory):
+    start = time.perf_counter()
+    subprocess.run([sys.executable] + args, cwd=str(directory), env=ENV,
+                   check=True, stdout=subprocess.DEVNULL,
+                   stderr=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def get_slow_imports(args, directory):
+    # runs asdac like 'python3 -m asdac' does and then prints sys.modules
+    code = ('import runpy, sys\n'
+            'sys.argv = ["asdac"] + %r\n'
+            'try:\n'
+            '    runpy.run_module("asdac", run_name="__main__")\n'
+            'finally:\n'
+            '    print(" ".join(sys.modules), file=sys.stderr)\n') % (args,)
+    output = subprocess.run(
+        [sys.executable, '-c', code], cwd=str(directory),
+        env=ENV,
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, check=True,
+    ).stderr.decode('utf-8')
+    modules = output.split()
+    return [name for name in SLOW_MODULES if name in modules]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--modules', type=int, default=20)
+    parser.add_argument(
+        '--repeat', type=int, default=10,
+        help="run each command this many times, default is 10")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        directory = pathlib.Path(directory)
+        noop_build.generate_program(directory, args.modules)
+        run(['-m', 'asdac', '--quiet', 'main.asda'], directory)
+
+        commands = [
+            ("python without asdac", ['-c', 'pass']),
+            ("--help", ['-m', 'asdac', '--help']),
+            ("no-op build", ['-m', 'asdac', 'main.asda']),
+            ("no-op build, --jobs=2",
+             ['-m', 'asdac', '--jobs', '2', 'main.asda']),
+        ]
+
+        print('%-25s %9s %9s   %s' % (
+            'command', 'best', 'median', 'slow imports'))
+        for description, command in commands:
+            times = [run(command, directory) for junk in range(args.repeat)]
+            if command[:2] == ['-m', 'asdac']:
+                slow_imports = ', '.join(
+                    get_slow_imports(command[2:], directory)) or '-'
+            else:
+                slow_imports = ''
+            print('%-25s %8.1fms %8.1fms   %s' % (
+                description, min(times) * 1000,
+                statistics.median(times) * 1000, slow_imports))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+# measures how many tokens per second the tokenizer produces for big files
+# generated with programs.py
+#
+# run this from the directory that contains asdac:
+#
+#    $ python3 asdac-benchmarks/tokenizer.py
+#
+# the old tokenizer from asdac-tests/reference_tokenizer.py is benchmarked
+# too, for comparing, and so is the tokenizer without the fast path for
+# files that contain only ASCII characters
+#
+# this also measures how much memory it takes to keep all tokens of a file,
+# as a list of Token objects or as a TokenBuffer that stores them in arrays
+
+import argparse
+import pathlib
+import sys
+import time
+import tracemalloc
+
+benchmark_dir = pathlib.Path(__file__).absolute().parent
+sys.path.insert(0, str(benchmark_dir.parent))
+sys.path.insert(0, str(benchmark_dir.parent / 'asdac-tests'))
+
+from asdac import common, tokenizer     # noqa
+import programs     # noqa
+import reference_tokenizer      # noqa
+
+
+# the generated programs contain only ASCII characters
+def tokenize_without_ascii_path(compilation, code):
+    old_pattern = tokenizer._ASCII_TOKEN_PATTERN
+    tokenizer._ASCII_TOKEN_PATTERN = tokenizer._UNICODE_TOKEN_PATTERN
+    try:
+        yield from tokenizer.tokenize(compilation, code)
+    finally:
+        tokenizer._ASCII_TOKEN_PATTERN = old_pattern
+
+
+TOKENIZERS = [
+    ('tokenizer', tokenizer.tokenize),
+    ('no ASCII path', tokenize_without_ascii_path),
+    ('reference', reference_tokenizer.tokenize),
+]
+
+
+# returns (number of tokens, best time in seconds)
+def time_tokenizing(tokenize, code, repeat):
+    compilation = _new_compilation()
+
+    best = float('inf')
+    for junk in range(repeat):
+        start = time.perf_counter()
+        count = 0
+        for token in tokenize(compilation, code):
+            count += 1
+        best = min(best, time.perf_counter() - start)
+    return (count, best)
+
+
+def _new_compilation():
+    return common.Compilation(
+        pathlib.Path('main.asda').absolute(), pathlib.Path('asda-compiled'),
+        common.Messager(-1))
+
+
+# returns number of bytes allocated for keeping all tokens
+def measure_memory(get_tokens, code):
+    compilation = _new_compilation()
+    tracemalloc.start()
+    try:
+        tokens = get_tokens(compilation, code)
+        size = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del tokens
+    return size
+
+
+def _token_list(compilation, code):
+    # locations of reference tokens have been created already
+    return list(reference_tokenizer.tokenize(compilation, code))
+
+
+def _token_buffer(compilation, code):
+    buffer = tokenizer.TokenBuffer(compilation, code)
+    buffer.has_token(len(code) + 1)    # tokenize everything
+    return buffer
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--size', type=int, default=2000,
+        help="size given to the generators in programs.py, default is 2000")
+    parser.add_argument(
+        '--repeat', type=int, default=5,
+        help="tokenize each file this many times and use the best time")
+    args = parser.parse_args()
+
+    print('%-22s %10s %8s' % ('program', 'tokens', 'bytes') + ''.join(
+        ' %18s' % name for name, junk in TOKENIZERS))
+
+    for program_name, (generator, junk) in programs.PROGRAMS.items():
+        code = generator(args.size)['main.asda']
+        line = '%-22s' % program_name
+        for name, tokenize in TOKENIZERS:
+            count, seconds = time_tokenizing(tokenize, code, args.repeat)
+            if name == TOKENIZERS[0][0]:
+                line += ' %10d %7dk' % (count, len(code) // 1000)
+            line += ' %12.0f tok/s' % (count / seconds)
+        print(line)
+
+    print()
+    print('%-22s %18s %18s' % ('program', 'list of tokens', 'TokenBuffer'))
+    for program_name, (generator, junk) in programs.PROGRAMS.items():
+        code = generator(args.size)['main.asda']
+        print('%-22s %17dk %17dk' % (
+            program_name,
+            measure_memory(_token_list, code) // 1000,
+            measure_memory(_token_buffer, code) // 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+# the operator precedence handling before it was rewritten to go through the
+# parts once for each precedence level, for checking that the new code does
+# the same things, see test_raw_ast.py
+
+from asdac import raw_ast
+
+
+class ReferencePrecedenceHandler(raw_ast._PrecedenceHandler):
+
+    def _find_op(self, op_flags_pairs):
+        ops = [op for op, flags in op_flags_pairs]
+
+        for parts_index, part in enumerate(self.parts):
+            if part.is_expression:
+                continue
+            token = part.value
+
+            try:
+                op_index = ops.index(token.value)
+            except ValueError:
+                continue
+
+            flags = op_flags_pairs[op_index][1]
+            return (parts_index, flags, token)
+
+        return None
+
+    def run(self):
+        self._check_no_adjacent_parts()
+
+        for op_flags_pairs in raw_ast._PRECEDENCE_LIST:
+            while True:
+                find_result = self._find_op(op_flags_pairs)
+                if find_result is None:
+                    break
+                index, flags, this_token = find_result
+
+                before = self._get_part_value(index-1, True)
+                after = self._get_part_value(index+1, True)
+                that_token = self._get_part_value(index+2, False)
+                more_after = self._get_part_value(index+3, True)
+
+                if flags & raw_ast.OP_TERNARY:
+                    assert flags == raw_ast.OP_TERNARY     # no other flags
+                    before_count, after_count, result = self._handle_ternary(
+                        before, this_token, after, that_token, more_after)
+                else:
+                    before_count, after_count, result = (
+                        self._handle_binary_or_prefix(
+                            before, this_token, after, that_token,
+                            op_flags_pairs, flags))
+
+                result = self.part_parsed_callback(result)
+
+                start_index = index - before_count
+                end_index = index + 1 + after_count
+                assert start_index >= 0
+                assert end_index <= len(self.parts)
+                self.parts[start_index:end_index] = [
+                    raw_ast._PrecedenceHandlerPart(True, result)]
+
+        assert len(self.parts) == 1
+        assert self.parts[0].is_expression
+        return self.parts[0].value
@@ -0,0 +1,38 @@
+import os
+
+from asdac import api
+
+
+def test_compile_sources(tmp_path):
+    os.chdir(str(tmp_path))
+    result = api.compile_sources({
+        'lib.asda': 'export let message = "hello"\n',
+        'main.asda': 'import "lib.asda" as lib\nprint(lib:message)\n',
+        'subdir/../unused.asda': 'let x = 1\n',
+    })
+
+    assert list(result.compiled.keys()) == [
+        'lib.asda', 'main.asda', 'subdir/../unused.asda']
+    assert all(bytez.startswith(b'asda') for bytez in result.compiled.values())
+    assert result.errors == []
+    assert result.output == (
+        "warning: value of variable 'x' is set, but never used\n")
+
+    # nothing is written to the disk
+    assert os.listdir('.') == []
+
+
+def test_errors():
+    result = api.compile_sources({
+        'bad.asda': 'print("a")\r\nprint(\n    y)\n',
+        'imports_bad.asda': 'import "bad.asda" as bad\n',
+        'imports_missing.asda': 'import "missing.asda" as missing\n',
+        'good.asda': 'print("Hello")\n',
+    })
+
+    assert list(result.compiled.keys()) == ['good.asda']
+    assert result.errors == [
+        api.Error('bad.asda', "variable not found: y", 3, 4, 3, 5),
+        api.Error('missing.asda', "cannot import a file that doesn't exist",
+                  None, None, None, None),
+    ]
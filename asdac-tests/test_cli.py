@@ -1,17 +1,20 @@
 # see also test_shell_sessions.txt
+import collections
 import io
 import itertools
+import multiprocessing
 import os
 import pathlib
 import random
 import re
+import subprocess
 import sys
 
 import colorama
 import pytest
 
 import asdac.__main__
-from asdac import common
+from asdac import common, cooked_ast, manifest, objects
 
 
 @pytest.fixture
@@ -196,3 +199,173 @@ import "../../B.ASDA" as b
     # source paths for the compiler
     assert '../../A.ASDA' in paths
     assert '../../../B.ASDA' in paths
+
+
+# capfd is needed because the compiling processes don't use the sys.stderr
+# replaced by capsys
+def test_jobs(monkeypatch, capfd, tmp_path):
+    os.chdir(str(tmp_path))
+    with open('lib.asda', 'x') as file:
+        file.write('export let message = "Hello"\n')
+    with open('lib2.asda', 'x') as file:
+        file.write('export let get_message = () -> Str:\n'
+                   '    return "Hi"\n')
+    with open('main.asda', 'x') as file:
+        file.write('import "lib.asda" as lib\n'
+                   'import "lib2.asda" as lib2\n'
+                   'print(lib:message)\n'
+                   'print(lib2:get_message())\n')
+
+    def run(*args):
+        monkeypatch.setattr(sys, 'argv', ['asdac'] + list(args))
+        asdac.__main__.main()
+        output, errors = capfd.readouterr()
+        assert not output
+        return errors.replace(os.sep, '/')
+
+    assert sorted(run('--jobs', '2', 'main.asda').splitlines()) == [
+        'lib.asda: Compiling to "asda-compiled/lib.asdac"...',
+        'lib2.asda: Compiling to "asda-compiled/lib2.asdac"...',
+        'main.asda: Compiling to "asda-compiled/main.asdac"...',
+    ]
+    assert run('--jobs', '2', 'main.asda') == (
+        "Nothing was compiled because the source files haven't changed "
+        "since the previous compilation.\n")
+
+    # the compiled files must be usable without --jobs
+    assert run('main.asda') == (
+        "Nothing was compiled because the source files haven't changed "
+        "since the previous compilation.\n")
+
+
+@pytest.mark.parametrize('jobs', ['1', '2'])
+def test_only_exports_cause_recompiling(jobs, tmp_path, asdac_compile_file):
+    os.chdir(str(tmp_path))
+    with open('lib.asda', 'x') as file:
+        file.write('export let get_message = () -> Str:\n'
+                   '    return "hello"\n')
+    with open('middle.asda', 'x') as file:
+        file.write('import "lib.asda" as lib\n'
+                   'export let message = lib:get_message()\n')
+    with open('main.asda', 'x') as file:
+        file.write('import "middle.asda" as middle\n'
+                   'print(middle:message)\n')
+
+    def run():
+        return sorted(asdac_compile_file(
+            'main.asda', '--jobs', jobs).splitlines())
+
+    assert len(run()) == 3
+
+    # changing a function body changes nothing that other files can see
+    with open('lib.asda', 'w') as file:
+        file.write('export let get_message = () -> Str:\n'
+                   '    return "hello world"\n')
+    assert run() == ['lib.asda: Compiling to "asda-compiled/lib.asdac"...']
+
+    # middle.asda needs recompiling, but its exports don't change
+    with open('lib.asda', 'a') as file:
+        file.write('export let number = 123\n')
+    assert run() == [
+        'lib.asda: Compiling to "asda-compiled/lib.asdac"...',
+        'middle.asda: Compiling to "asda-compiled/middle.asdac"...',
+    ]
+
+
+def test_jobs_cyclic_import(monkeypatch, capsys, tmp_path):
+    os.chdir(str(tmp_path))
+    with open('a.asda', 'x') as file:
+        file.write('import "b.asda" as b\n')
+    with open('b.asda', 'x') as file:
+        file.write('import "a.asda" as a\n')
+
+    monkeypatch.setattr(sys, 'argv', ['asdac', '--jobs', '2', 'a.asda'])
+    with pytest.raises(SystemExit) as error:
+        asdac.__main__.main()
+    assert error.value.code == 1
+
+    output, errors = capsys.readouterr()
+    assert errors == ('error: cyclic imports are not supported: "a.asda" '
+                      'imports itself indirectly\n')
+
+
+def test_jobs_error_finishes_other_files(monkeypatch, capsys, tmp_path):
+    os.chdir(str(tmp_path))
+    with open('bad.asda', 'x') as file:
+        file.write('print(lol)\n')
+    with open('good.asda', 'x') as file:
+        file.write('print("hello")\n' * 100)
+
+    monkeypatch.setattr(sys, 'argv', [
+        'asdac', '--jobs', '2', 'bad.asda', 'good.asda'])
+    with pytest.raises(SystemExit) as error:
+        asdac.__main__.main()
+    assert error.value.code == 1
+
+    output, errors = capsys.readouterr()
+    assert 'good.asda: Compiling to "asda-compiled' in errors
+    assert "variable not found: lol" in errors
+
+    compiled_dir = tmp_path / 'asda-compiled'
+    the_manifest = manifest.Manifest(compiled_dir, common.FileSystem())
+    the_manifest.load(common.Messager(-1))
+    good = common.Compilation(
+        tmp_path / 'good.asda', compiled_dir, common.Messager(-1))
+    assert the_manifest.get_info(good) is not None
+
+
+def test_jobs_wrong_extracted_export_types(monkeypatch, capsys, tmp_path):
+    os.chdir(str(tmp_path))
+    with open('lib.asda', 'x') as file:
+        file.write('export let message = "hello"\n')
+    with open('main.asda', 'x') as file:
+        file.write('import "lib.asda" as lib\nprint(lib:message)\n')
+
+    # the worker processes must see the monkeypatch
+    if multiprocessing.get_start_method() != 'fork':
+        pytest.skip("worker processes are not forked")
+
+    # main.asda doesn't compile with these types
+    monkeypatch.setattr(
+        cooked_ast, 'extract_export_types',
+        lambda statements: collections.OrderedDict([
+            ('message', objects.BUILTIN_TYPES['Int'])]))
+    asdac.__main__.main(['--jobs', '2', '-v', 'main.asda'])
+    output, errors = capsys.readouterr()
+    assert 'lib.asda: The exports are different than' in errors
+    assert 'main.asda: Compiling again, because' in errors
+
+    # main.asdac must have been compiled with the correct types
+    monkeypatch.undo()
+    asdac.__main__.main(['main.asda'])
+    output, errors = capsys.readouterr()
+    assert errors.startswith("Nothing was compiled")
+
+
+def test_nothing_to_do_imports_little(tmp_path):
+    env = dict(os.environ)
+    env.setdefault('PYTHONPATH', '')
+    if env['PYTHONPATH']:
+        env['PYTHONPATH'] += os.pathsep
+    env['PYTHONPATH'] += str(pathlib.Path(__file__).absolute().parent.parent)
+
+    os.chdir(str(tmp_path))
+    with open('hello.asda', 'x') as file:
+        file.write('print("Hello")\n')
+    subprocess.check_call(
+        [sys.executable, '-m', 'asdac', '--quiet', 'hello.asda'], env=env)
+
+    # see also asdac-benchmarks/startup.py
+    code = (
+        'import sys\n'
+        'import asdac.__main__\n'
+        'asdac.__main__.main(sys.argv[1:])\n'
+        'print(" ".join(sys.modules))\n')
+    for args in [['hello.asda'], ['--jobs', '2', 'hello.asda']]:
+        output = subprocess.check_output(
+            [sys.executable, '-c', code] + args, env=env,
+            stderr=subprocess.DEVNULL)
+        modules = output.decode('ascii').split()
+        for name in ['asdac.raw_ast', 'asdac.optimizer', 'colorama',
+                     'concurrent.futures', 'regex']:
+            assert name not in modules
@@ -0,0 +1,39 @@
+import pathlib
+
+from asdac import common
+
+
+def test_read_source_file(tmp_path):
+    file_system = common.FileSystem()
+    path = tmp_path / 'test.asda'
+
+    for content in [b'', b'\xef\xbb\xbfprint("bom")\n', b'a\r\nb\rc\n',
+                    'let ö = "ä"'.encode('utf-8')]:
+        path.write_bytes(content)
+        with file_system.open_source_file(path) as file:
+            expected = file.read()
+        assert file_system.read_source_file(path) == expected
+
+
+def test_location_lines_and_columns():
+    path = pathlib.Path('test.asda').absolute()
+    file_system = common.MemoryFileSystem({path: 'abc\nlet x = y\n'})
+    compilation = common.Compilation(
+        path, pathlib.Path('asda-compiled'), common.Messager(-1), file_system)
+
+    location = common.Location(compilation, 8, 5)
+    assert location.get_line_column() == (2, 4, 2, 9)
+    assert location.get_source() == ('let ', 'x = y', '')
+
+    location = common.Location(compilation, 3, 5)
+    assert location.get_line_column() == (1, 3, 2, 4)
+    assert location.get_source() == ('abc', '\nlet ', 'x = y')
+
+    location = common.Location(compilation, 14, 0)
+    assert location.get_line_column() == (3, 0, 3, 0)
+    assert location.get_source() == ('', '', '')
+
+    # the source code is read only once
+    del file_system.sources[path]
+    assert common.Location(compilation, 0, 1).get_source() == (
+        '', 'a', 'bc')
@@ -0,0 +1,92 @@
+import collections
+import os
+import pickle
+
+import pytest
+
+import asdac.__main__
+from asdac import compile_cache, objects
+
+
+@pytest.mark.parametrize('jobs', ['1', '2'])
+def test_shared_between_projects(jobs, tmp_path, capsys):
+    cache_dir = str(tmp_path / 'cache')
+
+    def run(project):
+        os.chdir(str(tmp_path / project))
+        asdac.__main__.main(['--cache-dir', cache_dir, '--jobs', jobs,
+                             'main.asda'])
+        output, errors = capsys.readouterr()
+        assert not output
+        with open(os.path.join('asda-compiled', 'main.asdac'), 'rb') as file:
+            return (errors.splitlines()[-1], file.read())
+
+    for project in ['project1', 'project2']:
+        (tmp_path / project).mkdir()
+        (tmp_path / project / 'lib.asda').write_text(
+            'export let message = "hello"\n')
+        (tmp_path / project / 'main.asda').write_text(
+            'import "lib.asda" as lib\nprint(lib:message)\n')
+
+    message1, compiled1 = run('project1')
+    message2, compiled2 = run('project2')
+    assert message1 == 'Compile cache: 0 hits, 2 misses'
+    assert message2 == 'Compile cache: 2 hits, 0 misses'
+    assert compiled1 == compiled2
+
+    # main.asda can be taken from the cache only if lib.asda's exports are
+    # the same as before
+    (tmp_path / 'project2' / 'lib.asda').write_text(
+        'export let message = "hello"\nexport let number = 123\n')
+    assert run('project2')[0] == 'Compile cache: 0 hits, 2 misses'
+
+
+def test_clean_up(tmp_path):
+    entry = compile_cache.Entry(
+        b'x' * 1000, collections.OrderedDict(),
+        objects.get_export_hash(collections.OrderedDict()))
+    cache = compile_cache.CompileCache(tmp_path, None)
+
+    for number in range(3):
+        key = '%064d' % number
+        cache.put(key, entry)
+        path = cache._get_path(key)
+        os.utime(str(path), (number, number))
+
+    # room for 3 files, the files are a bit bigger than the bytecode
+    cache.max_size = 3 * path.stat().st_size
+
+    # using a file makes it the most recently used file
+    assert cache.get('%064d' % 0) == entry
+    assert cache.get('%064d' % 123) is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    cache.put('%064d' % 3, entry)
+    cache.clean_up()
+    assert sorted(path.stem[-1] for path in tmp_path.glob('*/*.entry')) == [
+        '0', '3']
+
+
+def test_untrusted_files(tmp_path):
+    cache = compile_cache.CompileCache(tmp_path, 10**6)
+    entry = compile_cache.Entry(
+        b'bytecode', collections.OrderedDict(),
+        objects.get_export_hash(collections.OrderedDict()))
+    key1 = '%064d' % 1
+    key2 = '%064d' % 2
+    cache.put(key1, entry)
+    assert cache.get(key1) == entry
+
+    # files must not be used for other keys, e.g. after renaming them
+    cache._get_path(key2).write_bytes(cache._get_path(key1).read_bytes())
+    assert cache.get(key2) is None
+
+    # pickles are not loaded, because loading them could run any code
+    pickled = pickle.dumps((1, entry))
+    cache._get_path(key1).write_bytes(pickled)
+    assert cache.get(key1) is None
+
+    # the export hash must match the export types
+    cache.put(key1, entry._replace(export_hash=b'\0' * 32))
+    assert cache.get(key1) is None
+    assert (cache.hits, cache.misses) == (1, 3)
@@ -5,7 +5,7 @@ import sys
 
 import pytest
 
-from asdac import cooked_ast, objects
+from asdac import api, common, cooked_ast, objects, raw_ast
 from asdac.common import Location
 
 
@@ -149,6 +149,24 @@ def test_for_loop_scoping(compiler):
         "variable not found: i", 'i')
 
 
+def test_names_forgotten_after_scope():
+    def get_errors(code):
+        result = api.compile_sources({'test.asda': code})
+        return [(error.message, error.line) for error in result.errors]
+
+    assert get_errors('if TRUE:\n    let x = 1\nprint(x.to_string())\n') == [
+        ("variable not found: x", 3)]
+    assert get_errors('let lol[T] = (T t) -> void:\n    void\n'
+                      'let f = (T t) -> void:\n    void\n') == [
+        ("unknown type 'T'", 3)]
+
+    assert get_errors('if TRUE:\n    let x = 1\n'
+                      'if TRUE:\n    let x = "a"\n') == []
+    assert get_errors('if TRUE:\n    outer let x = "a"\nprint(x)\n') == []
+    assert get_errors('if TRUE:\n    outer let x = "a"\nlet x = "b"\n') == [
+        ("there's already a 'x' variable", 3)]
+
+
 def test_if_expression_wrong_types(compiler):
     compiler.doesnt_cooked_parse(
         'print(if TRUE then "a" else 123)',
@@ -251,3 +269,79 @@ class Foo():
 
     compiler.doesnt_cooked_parse(
         'print(this)', "'this' can be used only inside methods", 'this')
+
+
+def test_classes_in_generic_functions():
+    def get_errors(code):
+        result = api.compile_sources({'test.asda': code})
+        return [(error.message, error.line) for error in result.errors]
+
+    # this used to recurse infinitely, because substituting T copied the
+    # class and its methods, including get_this
+    assert get_errors('''
+class Thing(Str s):
+    method get_this() -> Thing:
+        return this
+
+let f[T] = (Thing t, T x) -> T:
+    return x
+print(f[Str](new Thing("a"), "b"))
+''') == []
+
+
+def test_extract_export_types():
+    def get_types(code):
+        compilation = common.Compilation(
+            pathlib.Path('test.asda').absolute(),
+            pathlib.Path('asda-compiled'), common.Messager(-1))
+        compilation.set_imports([])
+        raw, imports = raw_ast.parse(compilation, code)
+
+        extracted = cooked_ast.extract_export_types(raw)
+        cooked, export_types = cooked_ast.cook(compilation, raw, {})
+        if extracted is not None:
+            assert extracted == export_types
+            assert list(extracted.keys()) == list(export_types.keys())
+        return extracted
+
+    str_type = objects.BUILTIN_TYPES['Str']
+    assert get_types('print("hi")\n') == {}
+    assert get_types('''
+export let message = "hello"
+let x = 1
+export let number = x
+''') is None
+    assert get_types('''
+export let message = "hello {1 + 2}"
+let x = 1
+export let number = 123
+export let f = (Str s, functype{(Int) -> Str} g) -> Array[Str]:
+    let result = new Array[Str]()
+    result.push(s)
+    result.push(g(x))
+    return result
+''') == {
+        'message': str_type,
+        'number': objects.BUILTIN_TYPES['Int'],
+        'f': objects.FunctionType([str_type, objects.FunctionType(
+            [objects.BUILTIN_TYPES['Int']], str_type)],
+            objects.substitute_generics(
+                objects.BUILTIN_GENERIC_TYPES['Array'],
+                objects.BUILTIN_GENERIC_TYPES['Array'].generic_types,
+                [str_type], None)),
+    }
+
+    # the classes are created when cooking
+    assert get_types('''
+class Thing(Str s):
+    void
+export let make_thing = () -> Thing:
+    return new Thing("hi")
+''') is None
+
+    # exports can be anywhere in the file, not just at the top level
+    assert get_types('if TRUE:\n    export let x = "a"\n') is None
+    assert get_types('export let f = () -> void:\n    print("a")\n'
+                     'while FALSE:\n'
+                     '    let x = "b"\n') == {
+        'f': objects.FunctionType([], None)}
@@ -0,0 +1,68 @@
+import threading
+import time
+
+import pytest
+
+from asdac import api, common
+
+
+# this is a lot more than python's default recursion limit
+DEPTH = 3000
+
+
+# compiling the code goes through all steps of the compiler, including the
+# optimizer, and it should take much less time, but slow computers are slow
+def compile_and_check_time(code):
+    start_time = time.perf_counter()
+    result = api.compile_sources({'deep.asda': code})
+    assert result.errors == []
+    assert list(result.compiled.keys()) == ['deep.asda']
+    assert time.perf_counter() - start_time < 30
+
+
+def test_call_with_deep_recursion():
+    def recurse(n):
+        return 0 if n == 0 else 1 + recurse(n - 1)
+
+    with pytest.raises(RecursionError):
+        recurse(50000)
+    assert common.call_with_deep_recursion(recurse, 50000) == 50000
+
+    with pytest.raises(ValueError):
+        common.call_with_deep_recursion(int, 'lol')
+
+    # calling it again in the thread doesn't start another thread
+    def get_threads():
+        return (threading.current_thread(), common.call_with_deep_recursion(
+            threading.current_thread))
+
+    outer_thread, inner_thread = common.call_with_deep_recursion(get_threads)
+    assert outer_thread is inner_thread
+    assert outer_thread is not threading.current_thread()
+
+
+@pytest.mark.slow
+def test_deeply_nested_expressions():
+    code = (
+        'let x = ' + '(' * DEPTH + '1' + ')' * DEPTH + '\n' +
+        'print((' + ' + '.join(['x'] * DEPTH) + ').to_string())\n'
+    )
+
+    compile_and_check_time(code)
+
+    compile_and_check_time(
+        'let f = (Int x) -> Int:\n    return x\n' +
+        'print(' + 'f(' * DEPTH + '1' + ')' * DEPTH + '.to_string())\n' +
+        'print((' + 'if TRUE then ' * DEPTH + '"y"' + ' else ""' * DEPTH +
+        '))\n')
+
+
+# 'if TRUE' gets optimized away, and 'if x == 123' doesn't
+@pytest.mark.slow
+@pytest.mark.parametrize('header', ['if TRUE:', 'if x == %d:'])
+def test_deeply_nested_blocks(header):
+    lines = ['let x = 0']
+    for level in range(DEPTH):
+        lines.append(' ' * level + header.replace('%d', str(level)))
+    lines.append(' ' * DEPTH + 'print("deep")')
+    compile_and_check_time('\n'.join(lines) + '\n')
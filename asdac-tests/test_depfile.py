@@ -0,0 +1,33 @@
+import os
+
+import asdac.__main__
+
+
+def test_depfile(tmp_path, capsys):
+    os.chdir(str(tmp_path))
+    os.mkdir('sub dir')
+    with open('lib.asda', 'x') as file:
+        file.write('export let message = "hello"\n')
+    with open(os.path.join('sub dir', 'lib2.asda'), 'x') as file:
+        file.write('import "../lib.asda" as lib\n'
+                   'export let message = lib:message\n')
+    with open('main.asda', 'x') as file:
+        file.write('import "sub dir/lib2.asda" as lib2\n'
+                   'print(lib2:message)\n')
+
+    expected = (
+        'main.d: lib.asda main.asda sub\\ dir/lib2.asda\n'
+        'asda-compiled/lib.asdac: lib.asda\n'
+        'asda-compiled/main.asdac: main.asda sub\\ dir/lib2.asda lib.asda\n'
+        'asda-compiled/sub\\ dir/lib2.asdac: sub\\ dir/lib2.asda lib.asda\n'
+        'lib.asda:\n'
+        'main.asda:\n'
+        'sub\\ dir/lib2.asda:\n'
+    )
+
+    # the depfile must be written even if nothing needs to be compiled
+    for junk in range(2):
+        asdac.__main__.main(['--depfile', 'main.d', 'main.asda'])
+        with open('main.d', 'r') as file:
+            assert file.read().replace(os.sep, '/') == expected
+    capsys.readouterr()
@@ -0,0 +1,41 @@
+import os
+
+import asdac.__main__
+from asdac import manifest
+
+
+def test_manifest(tmp_path, capsys):
+    os.chdir(str(tmp_path))
+    with open('hello.asda', 'x') as file:
+        file.write('print("Hello")\n')
+    manifest_path = os.path.join('asda-compiled', manifest.FILENAME)
+
+    def run(*args):
+        asdac.__main__.main(list(args) + ['hello.asda'])
+        output, errors = capsys.readouterr()
+        assert not output
+        return errors.replace(os.sep, '/')
+
+    assert run() == 'hello.asda: Compiling to "asda-compiled/hello.asdac"...\n'
+    assert os.path.isfile(manifest_path)
+    assert ("hello.asda: The manifest says that the compiled file is up to "
+            "date with the source file.\n") in run('-vvv')
+
+    # the manifest is used only if the files haven't changed
+    with open('hello.asda', 'a') as file:
+        file.write('print("World")\n')
+    assert run() == 'hello.asda: Compiling to "asda-compiled/hello.asdac"...\n'
+    os.remove('asda-compiled/hello.asdac')
+    assert run() == 'hello.asda: Compiling to "asda-compiled/hello.asdac"...\n'
+
+    with open(manifest_path, 'wb') as file:
+        file.write(b'lol')
+    output = run('-vvv')
+    assert ('Ignoring "asda-compiled/manifest.pickle" because reading it '
+            'failed') in output
+    assert 'hello.asda: Reading the compiled file...\n' in output
+    assert output.endswith("Nothing was compiled because the source files "
+                           "haven't changed since the previous compilation.\n")
+
+    # the manifest was fixed by the previous run
+    assert 'Ignoring' not in run('-vvv')
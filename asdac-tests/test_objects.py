@@ -1,3 +1,13 @@
+import collections
+import copy
+import json
+import pickle
+
+import pytest
+
+from asdac import objects
+
+
 def test_generic_lookup_errors(compiler):
     compiler.doesnt_cooked_parse(
         'next[Str, Int]()', "needs 1 type, but got 2 types: [Str, Int]",
@@ -20,3 +30,128 @@ def test_void_returning_generic_bug(compiler):
     lol_create, lol_set, f_create, f_set = compiler.cooked_parse(
         'let lol[T] = () -> void:\n    print("Hello")\nlet f = lol[Str]')
     assert f_set.value.type.returntype is None
+
+
+def test_pickling_and_copying():
+    str_type = objects.BUILTIN_TYPES['Str']
+    assert pickle.loads(pickle.dumps(str_type)) is str_type
+    assert copy.copy(str_type) is not str_type
+
+    array = objects.BUILTIN_GENERIC_TYPES['Array']
+    str_array = objects.substitute_generics(
+        array, array.generic_types, [str_type], None)
+    functype = objects.FunctionType([str_array], str_type)
+
+    unpickled = pickle.loads(pickle.dumps(functype))
+    assert unpickled is not functype
+    assert unpickled == functype
+    assert unpickled.argtypes[0] is str_array
+    assert unpickled.returntype is str_type
+
+
+def test_generic_types_interned():
+    str_type = objects.BUILTIN_TYPES['Str']
+    int_type = objects.BUILTIN_TYPES['Int']
+    array = objects.BUILTIN_GENERIC_TYPES['Array']
+    [t] = array.generic_types
+
+    def substitute(tybe, types):
+        return objects.substitute_generics(
+            tybe, tybe.generic_types, types, None)
+
+    str_array = substitute(array, [str_type])
+    assert str_array is substitute(array, [str_type])
+    assert str_array is not substitute(array, [int_type])
+    assert substitute(array, [t]) is array
+    assert str_array.original_generic is array
+    assert str_array.attributes['pop'].tybe.returntype is str_type
+    assert array.attributes['pop'].tybe.returntype is t
+
+    # Array[U] is a different type than Array[T], but substituting U gives
+    # the same Array[Str] as substituting T
+    u = objects.GenericMarker('U')
+    u_array = substitute(array, [u])
+    assert u_array is not array
+    assert objects.substitute_generics(
+        u_array, [u], [str_type], None) is str_array
+
+    array_array = substitute(array, [str_array])
+    assert array_array is substitute(array, [substitute(array, [str_type])])
+    assert array_array.name == 'Array[Array[Str]]'
+
+    # function types are compared by their argument and return types, but
+    # substituting doesn't create a new function type if nothing changes
+    functype = objects.FunctionType([t, str_type], t)
+    assert objects.FunctionType([str_type, str_type], str_type) == (
+        objects.substitute_generics(functype, [t], [str_type], None))
+    assert hash(objects.FunctionType([str_array], None)) == hash(
+        objects.FunctionType([substitute(array, [str_type])], None))
+    str_functype = objects.FunctionType([str_type], None)
+    assert str_functype.undo_generics({t: int_type}) is str_functype
+
+    # classes can't be generic, so substituting must not copy them
+    klass = objects.UserDefinedClass(
+        'Foo', collections.OrderedDict([('x', str_type)]))
+    klass.add_method('copy', [], klass)
+    assert objects.substitute_generics(
+        objects.FunctionType([klass], t), [t], [str_type], None) == (
+            objects.FunctionType([klass], str_type))
+
+
+def test_export_hash():
+    def get_hash(**export_types):
+        return objects.get_export_hash(
+            collections.OrderedDict(sorted(export_types.items())))
+
+    str_type = objects.BUILTIN_TYPES['Str']
+    int_type = objects.BUILTIN_TYPES['Int']
+    assert get_hash(a=str_type) == get_hash(a=str_type)
+    assert get_hash(a=str_type) != get_hash(a=int_type)
+    assert get_hash(a=str_type) != get_hash(b=str_type)
+    assert get_hash(f=objects.FunctionType([str_type], None)) != get_hash(
+        f=objects.FunctionType([str_type], int_type))
+
+    def create_class():
+        klass = objects.UserDefinedClass(
+            'Foo', collections.OrderedDict([('x', str_type)]))
+        # methods that use the class itself must not recurse infinitely
+        klass.add_method('copy', [], klass)
+        return klass
+
+    assert get_hash(Foo=create_class()) == get_hash(Foo=create_class())
+    other_class = create_class()
+    other_class.add_method('lol', [], None)
+    assert get_hash(Foo=create_class()) != get_hash(Foo=other_class)
+
+
+def test_export_types_json():
+    str_type = objects.BUILTIN_TYPES['Str']
+    array = objects.BUILTIN_GENERIC_TYPES['Array']
+    str_array = objects.substitute_generics(
+        array, array.generic_types, [str_type], None)
+
+    klass = objects.UserDefinedClass(
+        'Foo', collections.OrderedDict([('x', str_array)]))
+    klass.add_method('copy', [], klass)
+    export_types = collections.OrderedDict([
+        ('message', str_type),
+        ('f', objects.FunctionType([klass, str_array], None)),
+        ('Foo', klass),
+    ])
+
+    json_data = objects.export_types_to_json(export_types)
+    assert json.loads(json.dumps(json_data)) == json_data
+    loaded = objects.export_types_from_json(json_data)
+    assert objects.get_export_hash(loaded) == objects.get_export_hash(
+        export_types)
+
+    assert loaded['message'] is str_type
+    new_class = loaded['Foo']
+    assert new_class is not klass
+    assert loaded['f'].argtypes == [new_class, str_array]
+    assert new_class.attributes['copy'].tybe.returntype is new_class
+    assert new_class.constructor_argtypes == [str_array]
+
+    with pytest.raises(ValueError):
+        objects.export_types_to_json(collections.OrderedDict([
+            ('lol', objects.GenericMarker('T'))]))
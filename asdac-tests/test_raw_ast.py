@@ -1,13 +1,18 @@
+import collections
 import functools
 import itertools
+import pathlib
+import random
 
-from asdac import raw_ast
+from asdac import common, raw_ast, tokenizer
 from asdac.raw_ast import (For, FuncCall, GetAttr, Integer, IfStatement,
                            GetType, GetVar, Let, SetVar, String)
 from asdac.common import CompileError, Location
 
 import pytest
 
+import reference_precedence
+
 
 class Any:
     def __repr__(self):
@@ -267,6 +272,12 @@ def test_repeated(compiler):
     compiler.doesnt_raw_parse('let lol = (Str x, Bool x) -> void:\n    void',
                               "repeated argument name: x", 'Bool x')
 
+    # function types have no argument names, so types can repeat
+    [let] = compiler.raw_parse(
+        'let f = (functype{(Str, Str) -> Str} g) -> void:\n    void')
+    [(functype, name, junk)], returntype = let.value.header
+    assert [tybe.name for tybe in functype.header[0]] == ['Str', 'Str']
+
 
 def test_invalid_this_or_that(compiler):
     compiler.doesnt_raw_parse('let f = ("hey" x) -> void:\n blah',
@@ -336,3 +347,46 @@ def test_if_elif_else(compiler):
 
 def test_missing_colon(compiler):
     compiler.doesnt_raw_parse('if a import', "should be ':'", 'import')
+
+
+# returns the result of handler_class(parts, ...).run(), or the error
+def _run_precedence_handler(handler_class, parts):
+    compilation = parts[0].value.location.compilation
+    parser = raw_ast._AsdaParser(
+        compilation, None, collections.OrderedDict())
+    try:
+        return handler_class(parts, parser.operator_helper).run()
+    except common.CompileError as e:
+        return (e.message, e.location)
+
+
+@pytest.mark.slow
+def test_same_as_reference_precedence_handler():
+    compilation = common.Compilation(
+        pathlib.Path('test file'), pathlib.Path('.'), common.Messager(-1))
+    random_ = random.Random(12345)
+    operators = [op for ops in raw_ast._PRECEDENCE_LIST for op, flags in ops]
+
+    for junk in range(20000):
+        parts = []
+        for offset in range(random_.randint(1, 12)):
+            location = common.Location(compilation, offset, 1)
+
+            # expressions next to each other are always an error
+            if parts and parts[-1].is_expression:
+                expression_probability = 0.1
+            else:
+                expression_probability = 0.7
+
+            if random_.random() < expression_probability:
+                parts.append(raw_ast._PrecedenceHandlerPart(
+                    True, GetVar(location, None, 'x%d' % offset, None)))
+            else:
+                token = tokenizer.Token(
+                    'OPERATOR', random_.choice(operators), location)
+                parts.append(raw_ast._PrecedenceHandlerPart(False, token))
+
+        assert (
+            _run_precedence_handler(raw_ast._PrecedenceHandler, parts) ==
+            _run_precedence_handler(
+                reference_precedence.ReferencePrecedenceHandler, parts))
@@ -0,0 +1,127 @@
+import os
+import pathlib
+import shutil
+
+import asdac.__main__
+from asdac import api, common, raw_ast, raw_ast_cache
+
+
+def test_save_and_load():
+    path = pathlib.Path('test.asda').absolute()
+    code = ('import "lib.asda" as lib\n'
+            'let x = "{lib:message} {(1 + 2).to_string()}"\n'
+            'class Thing():\n'
+            '    method get_this() -> Thing:\n'
+            '        return this\n'
+            'try:\n'
+            '    print(x)\n'
+            'catch Error e:\n'
+            '    print("oh no")\n')
+    lib_path = pathlib.Path('lib.asda').absolute()
+    file_system = common.MemoryFileSystem({
+        path: code, lib_path: 'export let message = "hello"\n'})
+
+    def new_compilation():
+        return common.Compilation(path, pathlib.Path('asda-compiled'),
+                                  common.Messager(-1), file_system)
+
+    compilation = new_compilation()
+    key = raw_ast_cache.get_key(compilation, code)
+    assert raw_ast_cache.load(compilation, key) is None
+
+    statements, imports = raw_ast.parse(compilation, code)
+    raw_ast_cache.save(compilation, key, statements, imports)
+
+    # locations don't have __eq__, but their reprs contain the source code
+    compilation2 = new_compilation()
+    loaded_statements, loaded_imports = raw_ast_cache.load(compilation2, key)
+    assert repr(loaded_statements) == repr(statements)
+    assert loaded_imports == imports
+    assert loaded_statements[0].location.compilation is compilation2
+    assert raw_ast_cache.load(
+        compilation2, raw_ast_cache.get_key(compilation2, code + '\n')) is None
+
+    # imported files must exist
+    del file_system.sources[lib_path]
+    assert raw_ast_cache.load(compilation2, key) is None
+    file_system.sources[lib_path] = 'export let message = "hello"\n'
+    assert raw_ast_cache.load(compilation2, key) is not None
+
+    # this is how worker processes send raw ASTs
+    loaded_statements, loaded_imports = raw_ast_cache.loads(
+        compilation2, raw_ast_cache.dumps(compilation, statements, imports))
+    assert repr(loaded_statements) == repr(statements)
+    assert loaded_imports == imports
+    assert loaded_statements[0].location.compilation is compilation2
+
+    file_system.compiled[raw_ast_cache.get_path(compilation)] = b'lol'
+    assert raw_ast_cache.load(compilation2, key) is None
+
+
+def test_not_parsed_when_only_imports_change(tmp_path, capsys):
+    os.chdir(str(tmp_path))
+    (tmp_path / 'lib.asda').write_text('export let message = "hello"\n')
+    (tmp_path / 'main.asda').write_text(
+        'import "lib.asda" as lib\nprint(lib:message)\n')
+
+    def compile_and_get_messages():
+        asdac.__main__.main(['-vvv', 'main.asda'])
+        output, errors = capsys.readouterr()
+        return sorted(line.strip() for line in errors.splitlines()
+                      if 'Parsing' in line or 'raw AST' in line)
+
+    assert compile_and_get_messages() == [
+        'lib.asda: Parsing', 'main.asda: Parsing']
+
+    (tmp_path / 'lib.asda').write_text(
+        'export let message = "hello"\nexport let number = 123\n')
+    assert compile_and_get_messages() == [
+        'lib.asda: Parsing', 'main.asda: Using the raw AST from last time']
+
+
+def test_moving_project_directory(tmp_path, capsys):
+    (tmp_path / 'old').mkdir()
+    os.chdir(str(tmp_path / 'old'))
+    (tmp_path / 'old' / 'lib.asda').write_text(
+        'export let message = "hello"\n')
+    (tmp_path / 'old' / 'main.asda').write_text(
+        'import "lib.asda" as lib\nprint(lib:message)\n')
+    asdac.__main__.main(['--quiet', 'main.asda'])
+
+    # the raw ast of main.asda refers to old/lib.asda, so it can't be used
+    os.chdir(str(tmp_path))
+    shutil.move(str(tmp_path / 'old'), str(tmp_path / 'new'))
+    os.chdir(str(tmp_path / 'new'))
+    (tmp_path / 'new' / 'lib.asda').write_text(
+        'export let message = "hello"\nexport let number = 123\n')
+    asdac.__main__.main(['-vvv', 'main.asda'])
+    output, errors = capsys.readouterr()
+    assert 'main.asda: Parsing' in errors
+    assert 'raw AST' not in errors
+
+
+def test_not_saved_when_not_useful(tmp_path, monkeypatch):
+    os.chdir(str(tmp_path))
+    (tmp_path / 'main.asda').write_text('print("hello")\n')
+    asdac.__main__.main(['--quiet', '--always-recompile', 'main.asda'])
+    assert (tmp_path / 'asda-compiled' / 'main.asdac').exists()
+    assert not list((tmp_path / 'asda-compiled').glob('*.rawast'))
+
+    # api.py compiles in memory, so nothing could use the raw ASTs later
+    def save(*args):
+        raise AssertionError("save() was called")
+
+    monkeypatch.setattr(raw_ast_cache, 'save', save)
+    result = api.compile_sources({'main.asda': 'print("hello")\n'})
+    assert not result.errors
+
+
+def test_save_errors_ignored():
+    path = pathlib.Path('test.asda').absolute()
+    compilation = common.Compilation(
+        path, pathlib.Path('asda-compiled'), common.Messager(-1),
+        common.MemoryFileSystem({path: ''}))
+
+    # lambdas can't be pickled
+    raw_ast_cache.save(compilation, b'key', [lambda: None], [])
+    assert not compilation.file_system.compiled
@@ -0,0 +1,97 @@
+import functools
+import os
+import threading
+
+import pytest
+
+import asdac.__main__
+from asdac import client, server
+
+
+NOTHING_COMPILED = ("Nothing was compiled because the source files haven't "
+                    "changed since the previous compilation.\n")
+
+
+@pytest.fixture
+def socket_path(tmp_path):
+    if not server.is_supported():
+        pytest.skip("unix sockets are not supported")
+
+    # like in asdac.__main__.main(), the warm cache is shared by all requests
+    path = str(tmp_path / 'asdac.sock')
+    compile_server = server.create_server(path, functools.partial(
+        asdac.__main__.main, warm_cache=asdac.__main__.WarmCache()))
+    thread = threading.Thread(target=compile_server.serve_forever)
+    thread.start()
+    yield path
+    compile_server.shutdown()
+    thread.join()
+    compile_server.server_close()
+
+
+def test_warm_cache(tmp_path, capsys):
+    os.chdir(str(tmp_path))
+    with open('lib.asda', 'x') as file:
+        file.write('export let message = "Hello"\n')
+    with open('main.asda', 'x') as file:
+        file.write('import "lib.asda" as lib\n'
+                   'print(lib:message)\n')
+
+    warm_cache = asdac.__main__.WarmCache()
+
+    def run(*args):
+        asdac.__main__.main(list(args), warm_cache=warm_cache)
+        output, errors = capsys.readouterr()
+        assert not output
+        return errors.replace(os.sep, '/')
+
+    assert run('main.asda') == (
+        'main.asda: Compiling to "asda-compiled/main.asdac"...\n'
+        'lib.asda: Compiling to "asda-compiled/lib.asdac"...\n')
+    assert run('-v', 'main.asda') == (
+        'lib.asda: No need to recompile.\n'
+        'main.asda: No need to recompile.\n' + NOTHING_COMPILED)
+
+    # the exports of lib.asda don't change, so main.asda isn't recompiled
+    os.remove('asda-compiled/lib.asdac')
+    assert run('main.asda') == (
+        'lib.asda: Compiling to "asda-compiled/lib.asdac"...\n')
+
+    with open('lib.asda', 'a') as file:
+        file.write('export let number = 123\n')
+    assert run('main.asda') == (
+        'lib.asda: Compiling to "asda-compiled/lib.asdac"...\n'
+        'main.asda: Compiling to "asda-compiled/main.asdac"...\n')
+
+    assert run('--jobs', '2', '-v', 'main.asda') == (
+        'lib.asda: No need to recompile.\n'
+        'main.asda: No need to recompile.\n' + NOTHING_COMPILED)
+
+
+def test_client_and_server(tmp_path, socket_path):
+    os.chdir(str(tmp_path))
+    with open('hello.asda', 'x') as file:
+        file.write('print("Hello")\n')
+
+    assert client.send_request(socket_path, ['hello.asda']) == (
+        '', 'hello.asda: Compiling to "asda-compiled/hello.asdac"...\n', 0)
+    assert client.send_request(socket_path, ['hello.asda']) == (
+        '', NOTHING_COMPILED, 0)
+
+    # the server remembers the compilation, so it doesn't even need to read
+    # the manifest or the compiled file
+    assert client.send_request(socket_path, ['-vvv', 'hello.asda']) == (
+        '', 'hello.asda: No need to recompile.\n' + NOTHING_COMPILED, 0)
+
+    stdout, stderr, exit_code = client.send_request(
+        socket_path, ['--server', 'lol'])
+    assert stdout == ''
+    assert stderr.endswith(
+        'error: --server cannot be used through the server\n')
+    assert exit_code == 2
+
+    with open('bad.asda', 'x') as file:
+        file.write('print(123)\n')
+    stdout, stderr, exit_code = client.send_request(socket_path, ['bad.asda'])
+    assert 'error in bad.asda:1,' in stderr
+    assert exit_code == 1
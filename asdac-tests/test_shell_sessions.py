@@ -3,6 +3,7 @@ import codecs
 import os
 import pathlib
 import re
+import shlex
 import shutil
 import sys
 import time
@@ -45,6 +46,13 @@ def create_test_func(path):
                 [path_string] = args
                 pathlib.Path(path_string).touch()
                 actual_output = ''
+            elif program == 'echo':
+                # only appending is supported, e.g. echo "# lol" >> file.asda
+                text, operator, path_string = shlex.split(command)[1:]
+                assert operator == '>>'
+                with open(path_string, 'a', encoding='utf-8') as file:
+                    file.write(text + '\n')
+                actual_output = ''
             elif program == 'asdac':
                 monkeypatch.setattr(sys, 'argv', ['asdac'] + args)
                 try:
@@ -0,0 +1,40 @@
+import json
+import os
+
+import asdac.__main__
+
+
+def test_timings(tmp_path, capsys):
+    os.chdir(str(tmp_path))
+    with open('lib.asda', 'x') as file:
+        file.write('export let get_message = () -> Str:\n'
+                   '    return "Hello"\n')
+    with open('main.asda', 'x') as file:
+        file.write('import "lib.asda" as lib\n'
+                   'print(lib:get_message())\n')
+
+    asdac.__main__.main(['--quiet', '--timings=json', 'main.asda'])
+    output, errors = capsys.readouterr()
+    assert not errors
+    report = json.loads(output)
+
+    phases = ['check', 'read', 'parse', 'cook', 'create_tree', 'optimize',
+              'create_bytecode', 'write']
+    assert list(report['phases'].keys()) == phases
+    assert sorted(file['path'] for file in report['files']) == [
+        'lib.asda', 'main.asda']
+    for file in report['files']:
+        assert list(file['phases'].keys()) == phases
+        assert file['wall_time'] >= file['phases']['parse']['wall_time'] >= 0
+
+    stats = report['optimizer_functions']['variables.check_boxes_set']
+    assert stats['calls'] >= 2
+    assert stats['changing_calls'] == 0
+
+    # nothing is compiled, but checking the files takes time too
+    asdac.__main__.main(['--quiet', '--timings=chrome', 'main.asda'])
+    output, errors = capsys.readouterr()
+    assert not errors
+    events = json.loads(output)['traceEvents']
+    assert sorted(event['name'] for event in events) == [
+        'lib.asda: check', 'main.asda: check']
@@ -1,8 +1,14 @@
 import functools
+import pathlib
+import random
 
-from asdac import common
+import pytest
+
+from asdac import common, tokenizer
 from asdac.tokenizer import Token
 
+import reference_tokenizer
+
 
 class Any:
     def __eq__(self, other):
@@ -118,3 +124,77 @@ let lol = (
 let lol = (Array[Str]wat)->asd:
     print("yay")
 ''')
+
+
+def test_token_buffer():
+    compilation = common.Compilation(
+        pathlib.Path('test file'), pathlib.Path('.'), common.Messager(-1))
+    buffer = tokenizer.TokenBuffer(compilation, 'let x = x\nx x @')
+
+    # tokenizing stops before the error
+    assert buffer.has_token(4)
+    assert [buffer.get_value(i) for i in range(5)] == [
+        'let', 'x', '=', 'x', '\n']
+    assert buffer.get_type(0) == 'KEYWORD'
+    assert buffer.get_location(1) == common.Location(compilation, 4, 1)
+
+    token = buffer.get_token(3)
+    assert token._location is None      # not created yet
+    assert token == Token('ID', 'x', common.Location(compilation, 8, 1))
+
+    # 'x' is stored only once
+    assert buffer._value_ids[1] == buffer._value_ids[3]
+
+    with pytest.raises(common.CompileError):
+        buffer.has_token(5)
+
+
+def test_ascii_fast_path(compiler):
+    assert (tokenizer._get_token_pattern('let x = "hello"') is
+            tokenizer._ASCII_TOKEN_PATTERN)
+    assert (tokenizer._get_token_pattern('let x = "hellö"') is
+            tokenizer._UNICODE_TOKEN_PATTERN)
+
+    # non-ASCII letters are valid in names, but only with the unicode path
+    assert [token.value for token in compiler.tokenize('let öx = äy')] == [
+        'let', 'öx', '=', 'äy', '\n']
+
+
+# returns the tokens that tokenize() yields before an error, and the error
+#
+# code like '[:]' makes both tokenizers fail with AssertionError, which is not
+# nice, but it's also not something that the new tokenizer should change
+def _tokenize_for_comparing(tokenize, code):
+    compilation = common.Compilation(
+        pathlib.Path('test file'), pathlib.Path('.'), common.Messager(-1))
+
+    result = []
+    try:
+        for token in tokenize(compilation, code, initial_offset=2):
+            result.append((token.type, token.value,
+                           token.location.offset, token.location.length))
+    except common.CompileError as e:
+        return (result, (e.message, e.location.offset, e.location.length))
+    except AssertionError:
+        return (result, 'AssertionError')
+    return (result, None)
+
+
+_CODE_PARTS = [
+    'if', 'x', 'y', 'let', '123', 'a:b', '"str"', '"{x}"', '"', '@', '\t',
+    ':', ':', ':', '\n', '\n', '\n', '\n', '  ', '    ', ' ', ' ',
+    '(', ')', '[', ']', '{', '}', '#comment', '==', '->', '.', ',', 'ö',
+]
+
+
+@pytest.mark.slow
+def test_same_as_reference_tokenizer():
+    random_ = random.Random(12345)
+    codes = ['', '\n', ':', 'x:\n', 'x:\n  y', '(\n', ')', '@']
+    for junk in range(20000):
+        parts = random_.choices(_CODE_PARTS, k=random_.randint(1, 20))
+        codes.append(''.join(parts))
+
+    for code in codes:
+        assert (_tokenize_for_comparing(tokenizer.tokenize, code) ==
+                _tokenize_for_comparing(reference_tokenizer.tokenize, code))
@@ -1,6 +1,9 @@
 import operator
+import pickle
 import re
 
+import pytest
+
 from asdac import utils
 
 
@@ -48,3 +51,26 @@ def test_attributereference_equality():
     assert bbar != bbaz
 
     check_equality([abar, abar2, bbar, bbaz])
+
+
+Point = utils.node_class('Point', ['x', 'y'], __name__)
+Empty = utils.node_class('Empty', [], __name__)
+
+
+def test_node_class():
+    point = Point(1, y=2)
+    assert (point.x, point.y) == (1, 2)
+    assert repr(point) == 'Point(x=1, y=2)'
+    assert repr(Empty()) == 'Empty()'
+    assert not hasattr(point, '__dict__')
+
+    assert point._replace(y=3) == Point(1, 3)
+    with pytest.raises(ValueError):
+        point._replace(z=3)
+
+    assert point == Point(1, 2)
+    assert point != (1, 2)
+    assert hash(point) == hash(Point(1, 2))
+    check_equality([point, Point(1, 2), Point(2, 1), Empty(), Empty()])
+
+    assert pickle.loads(pickle.dumps(point)) == point
@@ -0,0 +1,60 @@
+import os
+import pathlib
+
+import asdac.__main__
+from asdac import common, watch
+
+
+def test_watcher(tmp_path, capsys):
+    os.chdir(str(tmp_path))
+    paths = {name: common.resolve_dotdots(pathlib.Path(name).absolute())
+             for name in ['lib.asda', 'main.asda', 'other.asda']}
+
+    def write(name, content):
+        # the size changes, so the change is noticed even if the modification
+        # time doesn't change
+        with open(name, 'w') as file:
+            file.write(content)
+
+    write('lib.asda', 'export let message = "hello"\n')
+    write('main.asda', 'import "lib.asda" as lib\nprint(lib:message)\n')
+    write('other.asda', 'print("other")\n')
+
+    errors = []
+    manager = asdac.__main__.CompileManager(
+        tmp_path / 'asda-compiled', common.Messager(0), False)
+    watcher = watch.Watcher(manager, [paths['main.asda'], paths['other.asda']],
+                            errors.append)
+
+    def build():
+        capsys.readouterr()
+        watcher.forget(watcher.find_changes())
+        result = watcher.build()
+        return (result, capsys.readouterr()[1])
+
+    assert build()[0]
+    assert watcher.importers[paths['lib.asda']] == {paths['main.asda']}
+    other = manager.source_path_2_compilation[paths['other.asda']]
+
+    assert build() == (True, "Nothing needed to be compiled.\n")
+
+    # files that import the changed file are checked, but not recompiled
+    write('lib.asda', 'export let message = "hello world"\n')
+    assert watcher.find_changes() == [paths['lib.asda']]
+    assert build() == (
+        True, 'lib.asda: Compiling to "asda-compiled/lib.asdac"...\n')
+    assert manager.source_path_2_compilation[paths['other.asda']] is other
+
+    # main.asda is recompiled because the type of lib:message changes
+    write('lib.asda', 'export let message = 123\n')
+    assert build() == (False, (
+        'lib.asda: Compiling to "asda-compiled/lib.asdac"...\n'
+        'main.asda: Compiling to "asda-compiled/main.asdac"...\n'))
+    assert errors.pop().message.startswith("cannot call functype")
+
+    # main.asdac was not overwritten when compiling it failed, and it was
+    # compiled with a lib:message of the same type
+    write('lib.asda', 'export let message = "fixed"\n')
+    assert build() == (
+        True, 'lib.asda: Compiling to "asda-compiled/lib.asdac"...\n')
+    assert not errors
@@ -1,19 +1,55 @@
 import argparse
+import collections
+import contextlib
 import functools
+import io
+import json
+import os
 import pathlib
 import re
 import sys
 import textwrap
 
-import colorama
+# many modules are imported only when they are needed, because importing
+# everything takes a long time compared to checking that nothing needs to be
+# compiled, see asdac-benchmarks/startup.py
+from asdac import (bytecode_reader, common, compile_cache, manifest, objects,
+                   timings)
 
-from asdac import (bytecoder, bytecode_reader, common, cooked_ast,
-                   decision_tree_creator, optimizer, raw_ast)
 
+# returns (raw ast statements, imported paths)
+#
+# if use_raw_ast_files is True, the raw AST is loaded from a file saved by a
+# previous compilation, or saved for the next compilation
+def _parse(compilation, source, use_raw_ast_files):
+    from asdac import raw_ast, raw_ast_cache
 
-# TODO: error handling for bytecode_reader.RecompileFixableError
-def source2bytecode(compilation: common.Compilation):
-    """Compiles a file.
+    if not use_raw_ast_files:
+        compilation.messager(3, "Parsing")
+        return raw_ast.parse(compilation, source)
+
+    # if only the exports of imported files changed, the source code is the
+    # same as before and doesn't need to be parsed again
+    raw_ast_key = raw_ast_cache.get_key(compilation, source)
+    loaded = raw_ast_cache.load(compilation, raw_ast_key)
+    if loaded is not None:
+        compilation.messager(3, "Using the raw AST from last time")
+        return loaded
+
+    compilation.messager(3, "Parsing")
+    raw, imports = raw_ast.parse(compilation, source)
+    raw_ast_cache.save(compilation, raw_ast_key, raw, imports)
+    return (raw, imports)
+
+
+def source2bytecode(compilation: common.Compilation, cache=None,
+                    use_raw_ast_files=False, parsed=None):
+    """Compiles a file, or copies it from a compile_cache.CompileCache.
+
+    If use_raw_ast_files is True, the raw AST is saved next to the compiled
+    file, and loaded from there if the source code hasn't changed, see
+    raw_ast_cache.py. If parsed is not None, it must be (raw AST statements,
+    imported paths) of the file, and it's used instead of parsing.
 
     Should be used like this:
     1.  Call this function. It does nothing and returns a generator.
@@ -23,37 +59,67 @@ def source2bytecode(compilation: common.Compilation):
     4.  Call the_generator.send(a dict) where the dict's keys are the paths
         from step 2 and the values are Compilation objects.
     5.  Finally, you're done with using this function :D
+
+    The compiler is recursive, so the generator should be used in a function
+    called with common.call_with_deep_recursion(), like CompileManager does.
+    Otherwise deeply nested code fails with RecursionError.
     """
+    from asdac import (bytecoder, cooked_ast, decision_tree_creator,
+                       optimizer)
+
     compilation.messager(0, 'Compiling to "%s"...' % common.path_string(
         compilation.compiled_path))
 
     compilation.messager(3, "Reading the source file")
-    with compilation.open_source_file() as file:
-        source = file.read()
+    with timings.measure(compilation, 'read'):
+        source = compilation.read_source_file()
 
-    compilation.messager(3, "Parsing")
-    raw, imports = raw_ast.parse(compilation, source)
+    if parsed is None:
+        with timings.measure(compilation, 'parse'):
+            parsed = _parse(compilation, source, use_raw_ast_files)
+    raw, imports = parsed
     import_compilation_dict = yield imports
     assert import_compilation_dict.keys() == set(imports)
     compilation.set_imports([
         import_compilation_dict[path] for path in imports])
 
+    cache_key = None
+    if cache is not None:
+        with timings.measure(compilation, 'cache'):
+            cache_key = cache.get_key(compilation, source)
+            entry = None if cache_key is None else cache.get(cache_key)
+
+        if entry is not None:
+            compilation.messager(1, "Found in the compile cache.")
+            compilation.set_export_types(entry.export_types, entry.export_hash)
+            with timings.measure(compilation, 'write'):
+                compilation.file_system.write_compiled_file(
+                    compilation.compiled_path, entry.bytecode)
+            compilation.set_done()
+            yield entry.export_types
+            return
+
     # TODO: better message for cooking?
     compilation.messager(3, "Creating typed AST")
-    cooked, export_types = cooked_ast.cook(
-        compilation, raw, import_compilation_dict)
-    compilation.set_export_types(export_types)
+    with timings.measure(compilation, 'cook'):
+        cooked, export_types = cooked_ast.cook(
+            compilation, raw, import_compilation_dict)
+        compilation.set_export_types(
+            export_types, objects.get_export_hash(export_types))
 
     compilation.messager(3, "Creating a decision tree")
-    root_node = decision_tree_creator.create_tree(cooked)
+    with timings.measure(compilation, 'create_tree'):
+        root_node = decision_tree_creator.create_tree(cooked)
 
     compilation.messager(3, "Optimizing")
     #decision_tree.graphviz(root_node, 'before_optimization')
-    optimizer.optimize(root_node, None)
+    with timings.measure(compilation, 'optimize'):
+        optimizer.optimize(root_node, None)
     #decision_tree.graphviz(root_node, 'after_optimization')
 
     compilation.messager(3, "Creating bytecode")
-    bytecode = bytecoder.create_bytecode(compilation, root_node, source)
+    with timings.measure(compilation, 'create_bytecode'):
+        bytecode = bytecoder.create_bytecode(compilation, root_node, source)
 
     compilation.messager(3, 'Writing bytecode to "%s"' % common.path_string(
         compilation.compiled_path))
@@ -62,20 +128,77 @@ def source2bytecode(compilation: common.Compilation):
     # exception is likely raised before the output file is opened, and the
     # output file gets left untouched if it exists and no invalid output files
     # are created
-    compilation.compiled_path.parent.mkdir(parents=True, exist_ok=True)
-    with compilation.compiled_path.open('wb') as outfile:
-        outfile.write(bytecode)
+    with timings.measure(compilation, 'write'):
+        compilation.file_system.write_compiled_file(
+            compilation.compiled_path, bytecode)
+
+    if cache_key is not None:
+        cache.put(cache_key, compile_cache.Entry(
+            bytes(bytecode), export_types, compilation.export_hash))
 
     compilation.set_done()
     yield export_types
 
 
+class WarmCache:
+    """Remembers compilations between builds, used by the compile server.
+
+    A remembered compilation can be used without reading any files if its
+    source file and compiled file haven't changed since it was remembered, and
+    the same is true for all files that it imports.
+    """
+
+    def __init__(self):
+        # {(compiled_dir, source_path): (compilation, source stat key,
+        #                                compiled stat key)}
+        self._items = {}
+
+    def get(self, compiled_dir, source_path):
+        """Return a compilation that is done, or None if there is none."""
+        try:
+            compilation, source_key, compiled_key = self._items[
+                (compiled_dir, source_path)]
+        except KeyError:
+            return None
+
+        file_system = compilation.file_system
+        if (file_system.get_stat_key(source_path) != source_key or
+                file_system.get_stat_key(compilation.compiled_path) !=
+                compiled_key):
+            return None
+        return compilation
+
+    def remember(self, compile_manager):
+        # compilations that aren't done are left here if compiling fails
+        for compilation in compile_manager.source_path_2_compilation.values():
+            if compilation.state == common.CompilationState.DONE:
+                self._items[(compile_manager.compiled_dir,
+                             compilation.source_path)] = (
+                    compilation,
+                    compilation.file_system.get_stat_key(
+                        compilation.source_path),
+                    compilation.file_system.get_stat_key(
+                        compilation.compiled_path))
+
+
 class CompileManager:
 
-    def __init__(self, compiled_dir, messager, always_recompile):
+    # file_system is a common.FileSystem, and the default is to use the disk,
+    # and compile_cache is a compile_cache.CompileCache or None
+    def __init__(self, compiled_dir, messager, always_recompile,
+                 warm_cache=None, file_system=None, compile_cache=None):
         self.compiled_dir = compiled_dir
         self.messager = messager
         self.always_recompile = always_recompile
+        self.warm_cache = warm_cache
+        self.compile_cache = compile_cache
+        if file_system is None:
+            file_system = common.FileSystem()
+        self.file_system = file_system
+
+        self.manifest = manifest.Manifest(compiled_dir, file_system)
+        if not always_recompile:
+            self.manifest.load(messager)
 
         # remains False forever if all compiled files are up to date
         self.something_was_compiled = False
@@ -85,41 +208,86 @@ class CompileManager:
 
     # there are 2 kinds of up to datenesses to consider:
     #   * has the source file been modified since the previous compilation?
-    #   * have the files that are imported been recompiled, or will they need
-    #     to be recompiled since the previous compilation?
+    #   * have the exports of the imported files changed since the previous
+    #     compilation?
+    #
+    # hashes are used instead of modification times, so that e.g. touching a
+    # file or checking it out with git doesn't cause recompiling
+
+    # returns a bytecode_reader.CompiledInfo, or None if the compiled file is
+    # missing, broken or outdated
+    def _read_compiled_if_up2date_with_source(self, compilation):
+        with timings.measure(compilation, 'check'):
+            info = self.manifest.get_info(compilation)
+            if info is not None:
+                compilation.messager(3, (
+                    "The manifest says that the compiled file is up to date "
+                    "with the source file."))
+                return info
 
-    def _compiled_is_up2date_with_source(self, compilation):
-        try:
-            compiled_mtime = compilation.compiled_path.stat().st_mtime
-        except FileNotFoundError:
-            compilation.messager(3, (
-                "Compiled file not found. Need to recompile."))
-            return False
+            try:
+                info = bytecode_reader.read_compiled_info(compilation)
+            except FileNotFoundError:
+                compilation.messager(3, (
+                    "Compiled file not found. Need to recompile."))
+                return None
+            except bytecode_reader.RecompileFixableError as e:
+                compilation.messager(3, (
+                    "Reading the compiled file failed: %s. Need to recompile."
+                    % e.message))
+                return None
 
-        if compiled_mtime < compilation.source_path.stat().st_mtime:
+            source_hash = common.hash_source(compilation.read_source_file())
+
+        if source_hash != info.source_hash:
             compilation.messager(3, (
-                "The source file is newer than the compiled file. "
+                "The source file has changed after compiling it. "
                 "Need to recompile."))
-            return False
+            return None
 
         compilation.messager(3, (
-            "The compiled file is newer than the source file."))
-        return True
+            "The source file hasn't changed after compiling it."))
+        return info
 
     def _compiled_is_up2date_with_imports(self, compilation,
-                                          import_compilations):
-        compilation_mtime = compilation.compiled_path.stat().st_mtime
-        for import_ in import_compilations:
-            if compilation_mtime < import_.compiled_path.stat().st_mtime:
+                                          import_compilations,
+                                          import_export_hashes):
+        assert len(import_compilations) == len(import_export_hashes)
+        for import_, export_hash in zip(import_compilations,
+                                        import_export_hashes):
+            if import_.export_hash != export_hash:
                 compilation.messager(3, (
-                    '"%s" is older than "%s". Need to recompile.' % (
-                        common.path_string(compilation.compiled_path),
-                        common.path_string(import_.compiled_path))))
+                    'The exports of "%s" have changed. Need to recompile.'
+                    % common.path_string(import_.source_path)))
                 return False
 
         compilation.messager(3, (
-            'No imported files have been recompiled after compiling "%s".' % (
-                common.path_string(compilation.compiled_path))))
+            'The exports of imported files haven\'t changed after compiling '
+            '"%s".' % common.path_string(compilation.compiled_path)))
+        return True
+
+    # returns True if the compilation and everything that it imports could be
+    # taken from self.warm_cache
+    def _use_warm_cache(self, source_path):
+        if self.warm_cache is None or self.always_recompile:
+            return False
+
+        compilation = self.warm_cache.get(self.compiled_dir, source_path)
+        if compilation is None:
+            return False
+
+        for import_ in compilation.imports:
+            if import_.source_path not in self.source_path_2_compilation:
+                self._use_warm_cache(import_.source_path)
+            if self.source_path_2_compilation.get(
+                    import_.source_path) is not import_:
+                return False
+
+        # the old messager may have e.g. different verbosity
+        compilation.messager = self.messager.with_prefix(
+            common.path_string(source_path))
+        compilation.messager(1, "No need to recompile.")
+        self.source_path_2_compilation[source_path] = compilation
         return True
 
     def _compile_imports(self, compilation, imported_paths):
@@ -129,7 +297,12 @@ class CompileManager:
                     % common.path_string(path))):
                 self.compile(path)
 
+    # the whole compiling happens in one deep recursion thread, because
+    # starting a thread for each file would be slow
     def compile(self, source_path):
+        common.call_with_deep_recursion(self._compile, source_path)
+
+    def _compile(self, source_path):
         if source_path in self.source_path_2_compilation:
             compilation = self.source_path_2_compilation[source_path]
             assert compilation.state == common.CompilationState.DONE
@@ -138,29 +311,34 @@ class CompileManager:
                     'again.' % common.path_string(compilation.compiled_path)))
             return
 
+        if self._use_warm_cache(source_path):
+            return
+
         compilation = common.Compilation(source_path, self.compiled_dir,
-                                         self.messager)
+                                         self.messager, self.file_system)
 
         if not self.always_recompile:
             with compilation.messager.indented(
                     2, ('Checking if this needs to be compiled to "%s"...'
                         % common.path_string(compilation.compiled_path))):
 
-                if self._compiled_is_up2date_with_source(compilation):
+                info = self._read_compiled_if_up2date_with_source(
+                    compilation)
+                if info is not None:
                     # there is a chance that nothing needs to be compiled
                     # but can't be sure yet
-                    imports, export_types = (
-                        bytecode_reader.read_imports_and_exports(compilation))
-                    self._compile_imports(compilation, imports)
+                    self._compile_imports(compilation, info.imports)
                     import_compilations = [self.source_path_2_compilation[path]
-                                           for path in imports]
+                                           for path in info.imports]
 
                     # now we can check
                     if self._compiled_is_up2date_with_imports(
-                            compilation, import_compilations):
+                            compilation, import_compilations,
+                            info.import_export_hashes):
                         compilation.messager(1, "No need to recompile.")
                         compilation.set_imports(import_compilations)
-                        compilation.set_export_types(export_types)
+                        compilation.set_export_types(
+                            info.export_types, info.export_hash)
                         compilation.set_done()
                         self.source_path_2_compilation[source_path] = (
                             compilation)
@@ -168,7 +346,8 @@ class CompileManager:
 
         self.source_path_2_compilation[source_path] = compilation
 
-        generator = source2bytecode(compilation)
+        generator = source2bytecode(
+            compilation, self._get_cache(), self._use_raw_ast_files())
         depends_on = next(generator)
         self._compile_imports(compilation, depends_on)
 
@@ -178,6 +357,418 @@ class CompileManager:
         })
         self.something_was_compiled = True
 
+    # raw ast files are not needed when everything gets recompiled anyway,
+    # and they would be unexpected in the compiled files of api.py
+    def _use_raw_ast_files(self):
+        return not (self.always_recompile or
+                    isinstance(self.file_system, common.MemoryFileSystem))
+
+    # returns the compile cache to pass to source2bytecode(), or None
+    def _get_cache(self):
+        if self.compile_cache is None or self.always_recompile:
+            return None
+        return self.compile_cache
+
+    # override _compile_all_internal instead of overriding this
+    def compile_all(self, source_paths):
+        try:
+            common.call_with_deep_recursion(
+                self._compile_all_internal, source_paths)
+        finally:
+            # files that were compiled before an error are in the manifest too
+            for compilation in self.source_path_2_compilation.values():
+                if compilation.state == common.CompilationState.DONE:
+                    self.manifest.update(compilation)
+            self.manifest.save()
+            if self.compile_cache is not None:
+                self.compile_cache.clean_up()
+
+    def _compile_all_internal(self, source_paths):
+        for path in source_paths:
+            self.compile(path)
+
+
+# export_types and export_hash are None on error, error is None on success,
+# output contains the messages that would have been printed to stderr, and
+# cache is the cache given to _compile_in_subprocess() after using it
+#
+# if raw_ast is not None, the file hasn't been compiled yet, but its exports
+# are known, and raw_ast is the parsed file from raw_ast_cache.dumps()
+_WorkerResult = collections.namedtuple('_WorkerResult', [
+    'export_types', 'export_hash', 'error', 'output', 'timings', 'cache',
+    'raw_ast'])
+
+
+def _compile_in_subprocess(source_path, compiled_dir, verbosity,
+                           import_exports, measure_timings, cache,
+                           use_raw_ast_files, extract_exports, raw_ast):
+    """Compiles a file in a worker process of ParallelCompileManager.
+
+    The import_exports dict must contain (export_types, export_hash) tuples of
+    all imported files, with source paths as keys. This returns a
+    _WorkerResult. Its timings is a timings.Timings object if measure_timings
+    is True, and None otherwise. The cache and use_raw_ast_files are passed
+    to source2bytecode().
+
+    If extract_exports is True and cooked_ast.extract_export_types() can find
+    out the export types after parsing, this returns them without compiling.
+    The raw_ast of that result can then be passed to this function to compile
+    the file without parsing it again.
+
+    The messages are returned instead of printing them, because the process
+    that started the compiling may have redirected sys.stderr somewhere else.
+    """
+    messager = common.Messager(verbosity)
+    compilation = common.Compilation(source_path, compiled_dir, messager)
+    worker_timings = timings.Timings() if measure_timings else None
+
+    # returns (export types, dumped raw ast or None)
+    def compile_it():
+        from asdac import cooked_ast, raw_ast_cache
+
+        if raw_ast is None:
+            parsed = None
+        else:
+            with timings.measure(compilation, 'parse'):
+                parsed = raw_ast_cache.loads(compilation, raw_ast)
+
+        if extract_exports:
+            with timings.measure(compilation, 'read'):
+                source = compilation.read_source_file()
+            with timings.measure(compilation, 'parse'):
+                parsed = _parse(compilation, source, use_raw_ast_files)
+            with timings.measure(compilation, 'interface'):
+                export_types = cooked_ast.extract_export_types(parsed[0])
+
+            if export_types is not None:
+                try:
+                    dumped = raw_ast_cache.dumps(compilation, *parsed)
+                except Exception:
+                    # pickle can fail in many ways, like raw_ast_cache.save()
+                    # explains, and compiling now works too
+                    pass
+                else:
+                    compilation.messager(3, (
+                        "The exports are known before compiling. Files that "
+                        "import this file can be compiled now."))
+                    return (export_types, dumped)
+
+        generator = source2bytecode(
+            compilation, cache, use_raw_ast_files, parsed)
+        depends_on = next(generator)
+
+        import_compilation_dict = {}
+        for path in depends_on:
+            import_compilation = common.Compilation(
+                path, compiled_dir, messager)
+            # the imports of the imported file are not needed for compiling
+            # this file, so they are left out
+            import_compilation.set_imports([])
+            import_compilation.set_export_types(*import_exports[path])
+            import_compilation.set_done()
+            import_compilation_dict[path] = import_compilation
+
+        return (generator.send(import_compilation_dict), None)
+
+    output = io.StringIO()
+    with contextlib.redirect_stderr(output), \
+            timings.activated(worker_timings):
+        try:
+            export_types, dumped = common.call_with_deep_recursion(
+                compile_it)
+        except common.CompileError as e:
+            return _WorkerResult(None, None, e, output.getvalue(),
+                                 worker_timings, cache, None)
+
+    if dumped is not None:
+        return _WorkerResult(
+            export_types, objects.get_export_hash(export_types), None,
+            output.getvalue(), worker_timings, None, dumped)
+    return _WorkerResult(export_types, compilation.export_hash, None,
+                         output.getvalue(), worker_timings, cache, None)
+
+
+class ParallelCompileManager(CompileManager):
+    """Like CompileManager, but compiles many files at once in processes.
+
+    This finds out what files import each other before compiling anything, and
+    then compiles each file as soon as everything that it imports is compiled,
+    or the export types of everything that it imports are known. The export
+    types can often be found out without compiling, see
+    cooked_ast.extract_export_types().
+    """
+
+    # if this is True, worker processes find out the export types of files
+    # that other files import before compiling them, and the files that
+    # import them are compiled at the same time, instead of waiting for the
+    # function bodies to get cooked, optimized and so on
+    _extract_exports = True
+
+    def __init__(self, compiled_dir, messager, always_recompile, jobs,
+                 warm_cache=None, compile_cache=None):
+        super().__init__(compiled_dir, messager, always_recompile, warm_cache,
+                         compile_cache=compile_cache)
+        self.jobs = jobs
+
+    # returns (imports, info), where info is a bytecode_reader.CompiledInfo or
+    # None if the compiled file is not up to date with the source file
+    def _find_imports(self, compilation):
+        if not self.always_recompile:
+            info = self._read_compiled_if_up2date_with_source(compilation)
+            if info is not None:
+                return (info.imports, info)
+
+        from asdac import raw_ast
+
+        source = compilation.read_source_file()
+        return (raw_ast.parse_imports(compilation, source), None)
+
+    # returns a list of compilations that has imported files before the files
+    # that import them, and dicts of imports and infos from _find_imports()
+    def _create_import_graph(self, source_paths):
+        import_dict = {}
+        info_dict = {}
+        sorted_compilations = []
+
+        def visit(source_path):
+            compilation = common.Compilation(
+                source_path, self.compiled_dir, self.messager,
+                self.file_system)
+            self.source_path_2_compilation[source_path] = compilation
+            with compilation.messager.indented(
+                    2, 'Finding out what "%s" imports...'
+                    % common.path_string(source_path)):
+                import_dict[compilation], info_dict[compilation] = (
+                    self._find_imports(compilation))
+            return compilation
+
+        # depth-first search without recursion, because import chains can be
+        # long, stack_iters contains iterators of imported paths
+        for source_path in source_paths:
+            if (source_path in self.source_path_2_compilation or
+                    self._use_warm_cache(source_path)):
+                continue
+
+            stack = [visit(source_path)]
+            stack_iters = [iter(import_dict[stack[0]])]
+            while stack:
+                try:
+                    path = next(stack_iters[-1])
+                except StopIteration:
+                    sorted_compilations.append(stack.pop())
+                    del stack_iters[-1]
+                    continue
+
+                if path in self.source_path_2_compilation:
+                    if self.source_path_2_compilation[path] in stack:
+                        raise common.CompileError(
+                            'cyclic imports are not supported: "%s" imports '
+                            'itself indirectly' % common.path_string(path))
+                    continue
+                if self._use_warm_cache(path):
+                    continue
+
+                compilation = visit(path)
+                stack.append(compilation)
+                stack_iters.append(iter(import_dict[compilation]))
+
+        return (sorted_compilations, import_dict, info_dict)
+
+    def _set_done(self, compilation, import_paths, export_types, export_hash):
+        if compilation.state == common.CompilationState.EXPORTS_KNOWN:
+            if export_hash != compilation.export_hash:
+                # cooked_ast.extract_export_types() gave wrong types, and files
+                # that were compiled with them get compiled again when they
+                # are checked in _compile_all_internal()
+                compilation.messager(1, (
+                    "The exports are different than what was found out "
+                    "before compiling. Files that import this file will be "
+                    "compiled again."))
+                compilation.export_types = export_types
+                compilation.export_hash = export_hash
+        else:
+            compilation.set_imports([self.source_path_2_compilation[path]
+                                     for path in import_paths])
+            compilation.set_export_types(export_types, export_hash)
+        compilation.set_done()
+
+    def _compile_all_internal(self, source_paths):
+        sorted_compilations, import_dict, info_dict = (
+            self._create_import_graph(source_paths))
+
+        # {compilation: number of imported files whose exports are not known}
+        # whether a file needs to be compiled can be decided when the exports
+        # of everything that it imports are known, because a file needs to be
+        # recompiled only if the exports of an imported file change
+        waiting = collections.OrderedDict()
+        dependents = collections.defaultdict(list)
+
+        for compilation in sorted_compilations:
+            not_done = set(self.source_path_2_compilation[path]
+                           for path in import_dict[compilation])
+            not_done &= waiting.keys()
+            waiting[compilation] = len(not_done)
+            for import_ in not_done:
+                dependents[import_].append(compilation)
+
+        ready = collections.deque(
+            compilation for compilation, count in waiting.items()
+            if count == 0)
+        running = {}    # {future: (compilation, import_exports)}
+        exports_found = set()
+
+        # {compilation: (result, {import path: export hash})}
+        #
+        # a file is done only when everything that it imports is done,
+        # because it may have been compiled with export types from
+        # cooked_ast.extract_export_types() that turn out to be wrong, and the
+        # hashes are the export hashes of the imported files that it was
+        # compiled with, the result is a _WorkerResult
+        finished = {}
+        errors = []
+
+        # this is called when the exports of the compilation are known, and
+        # that can happen before it's done, so exports_found is used to not
+        # do this twice for the same compilation
+        def find_ready(compilation):
+            if compilation in exports_found:
+                return
+            exports_found.add(compilation)
+            for dependent in dependents.get(compilation, []):
+                waiting[dependent] -= 1
+                if waiting[dependent] == 0:
+                    ready.append(dependent)
+
+        # a loop instead of recursion, because import chains can be long
+        def finish(compilation, result, import_hashes):
+            finished[compilation] = (result, import_hashes)
+            check = [compilation]
+            while check:
+                compilation = check.pop()
+                if compilation not in finished or any(
+                        self.source_path_2_compilation[path].state !=
+                        common.CompilationState.DONE
+                        for path in import_dict[compilation]):
+                    continue
+
+                result, import_hashes = finished.pop(compilation)
+                if any(self.source_path_2_compilation[path].export_hash !=
+                       export_hash
+                       for path, export_hash in import_hashes.items()):
+                    compilation.messager(1, (
+                        "Compiling again, because the exports of an imported "
+                        "file are different than expected."))
+                    info_dict[compilation] = None
+                    ready.append(compilation)
+                    continue
+
+                if result.error is not None:
+                    errors.append(result.error)
+                    continue
+
+                self._set_done(compilation, import_dict[compilation],
+                               result.export_types, result.export_hash)
+                find_ready(compilation)
+                check.extend(dependents.get(compilation, []))
+
+        # the executor is created only when needed, because starting processes
+        # is slow and usually nothing needs to be compiled
+        executor = None
+
+        def submit(compilation, import_exports, extract_exports, raw_ast):
+            cache = self._get_cache()
+            if cache is not None:
+                cache = cache.copy_without_stats()
+
+            future = executor.submit(
+                _compile_in_subprocess, compilation.source_path,
+                self.compiled_dir, self.messager.verbosity, import_exports,
+                timings.get_current() is not None, cache,
+                self._use_raw_ast_files(), extract_exports, raw_ast)
+            running[future] = (compilation, import_exports)
+
+        # after an error, nothing new is compiled, but files that are already
+        # being compiled are finished and marked done, so that their compiled
+        # files are in the manifest
+        try:
+            while ready or running:
+                while ready and not errors:
+                    compilation = ready.popleft()
+                    info = info_dict[compilation]
+                    if info is not None and (
+                            self._compiled_is_up2date_with_imports(
+                                compilation,
+                                [self.source_path_2_compilation[path]
+                                 for path in info.imports],
+                                info.import_export_hashes)):
+                        compilation.messager(1, "No need to recompile.")
+                        finish(compilation, _WorkerResult(
+                            info.export_types, info.export_hash, None, '',
+                            None, None, None), dict(zip(
+                                info.imports, info.import_export_hashes)))
+                        continue
+
+                    if executor is None:
+                        import concurrent.futures
+                        executor = concurrent.futures.ProcessPoolExecutor(
+                            self.jobs)
+
+                    import_exports = {}
+                    for path in import_dict[compilation]:
+                        import_ = self.source_path_2_compilation[path]
+                        import_exports[path] = (import_.export_types,
+                                                import_.export_hash)
+
+                    # exports_found contains files that are compiled again
+                    # after their exports were extracted
+                    submit(compilation, import_exports, (
+                        self._extract_exports and
+                        compilation in dependents and
+                        compilation not in exports_found), None)
+
+                if not running:
+                    break
+
+                done, junk = concurrent.futures.wait(
+                    running, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    compilation, import_exports = running.pop(future)
+                    result = future.result()
+                    sys.stderr.write(result.output)
+                    if result.timings is not None:
+                        timings.get_current().merge(result.timings)
+                    if result.cache is not None:
+                        self.compile_cache.merge(result.cache)
+                    if result.raw_ast is not None:
+                        compilation.set_imports([
+                            self.source_path_2_compilation[path]
+                            for path in import_dict[compilation]])
+                        compilation.set_export_types(
+                            result.export_types, result.export_hash)
+                        find_ready(compilation)
+                        if not errors:
+                            submit(compilation, import_exports, False,
+                                   result.raw_ast)
+                        continue
+
+                    if result.error is None:
+                        self.something_was_compiled = True
+                    finish(compilation, result, {
+                        path: export_hash for path, (junk, export_hash)
+                        in import_exports.items()})
+        finally:
+            if executor is not None:
+                # if something else than a compile error was raised, files
+                # that haven't started compiling yet won't be compiled
+                for future in running:
+                    future.cancel()
+                executor.shutdown()
+
+        if errors:
+            raise errors[0]
+        assert not finished
+        assert not any(waiting.values())
+
 
 def report_compile_error(error, red_function):
     eprint = functools.partial(print, file=sys.stderr)
@@ -215,6 +806,7 @@ def report_compile_error(error, red_function):
 
 
 def make_red(string):
+    import colorama
     return colorama.Fore.RED + string + colorama.Fore.RESET
 
 
@@ -222,10 +814,11 @@ def path_from_user(string):
     return common.resolve_dotdots(pathlib.Path(string).absolute())
 
 
-def main():
+# warm_cache is used when the compile server runs this, see server.py
+def main(argv=None, *, warm_cache=None):
     parser = argparse.ArgumentParser()
     parser.add_argument(
-        'infiles', nargs=argparse.ONE_OR_MORE, help="source code files")
+        'infiles', nargs=argparse.ZERO_OR_MORE, help="source code files")
     parser.add_argument(
         # argparse.FileType('wb') would open the file even if compiling fails
         '--compiled-dir', default='asda-compiled',
@@ -235,9 +828,42 @@ def main():
         help=("always compile all files, even if they have already been "
               "compiled and the compiled files are newer than the source "
               "files"))
+    parser.add_argument(
+        '--cache-dir', default=os.environ.get('ASDAC_CACHE_DIR'),
+        metavar='DIR',
+        help=("copy compiled files from DIR instead of compiling them if they "
+              "have been compiled before, and add compiled files to DIR, "
+              "default is $ASDAC_CACHE_DIR or no cache if it's not set, "
+              "and DIR must not be writable by anyone untrusted, because "
+              "the compiled files in it are run by the interpreter"))
+    parser.add_argument(
+        '--cache-max-size', type=int, default=100, metavar='MEGABYTES',
+        help=("delete least recently used files from the --cache-dir when it "
+              "gets bigger than this, default is 100"))
     parser.add_argument(
         '--color', choices=['auto', 'always', 'never'], default='auto',
         help="should error messages be displayed with colors?")
+    parser.add_argument(
+        '-j', '--jobs', type=int, default=1, metavar='N',
+        help=("compile N files at the same time in different processes, "
+              "default is 1"))
+    parser.add_argument(
+        '--timings', choices=['json', 'chrome'],
+        help=("print how long different parts of compiling took as JSON to "
+              "stdout, 'chrome' outputs a trace for chrome://tracing"))
+    parser.add_argument(
+        '--depfile', metavar='FILE',
+        help=("write the source files that each compiled file depends on to "
+              "FILE in the format that make understands"))
+    parser.add_argument(
+        '--watch', action='store_true', default=False,
+        help=("keep running and compile again when source files change, "
+              "until interrupted with Ctrl+C"))
+    parser.add_argument(
+        '--server', metavar='SOCKET',
+        help=("instead of compiling, wait for compile requests from "
+              "'python3 -m asdac.client SOCKET ...' and remember compiled "
+              "files between the requests"))
 
     verbosity_group = parser.add_mutually_exclusive_group()
     verbosity_group.add_argument(
@@ -249,10 +875,35 @@ def main():
         help=("print more messages, can be given many times for even more "
               "printing"))
 
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
+
+    if args.server is not None:
+        from asdac import server
+
+        if warm_cache is not None:
+            parser.error("--server cannot be used through the server")
+        if args.infiles:
+            parser.error("source files cannot be given with --server")
+        if not server.is_supported():
+            parser.error("--server is not supported on this platform")
+        server.run_server(args.server, functools.partial(
+            main, warm_cache=WarmCache()))
+        return
 
+    if not args.infiles:
+        parser.error("no source files given")
     if '-' in args.infiles:
         parser.error("reading from stdin is not supported")
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    if args.cache_max_size < 0:
+        parser.error("--cache-max-size must not be negative")
+    if args.watch and warm_cache is not None:
+        parser.error("--watch cannot be used through the server")
+    if args.watch and args.timings is not None:
+        parser.error("--watch and --timings cannot be used together")
+    if args.watch and args.depfile is not None:
+        parser.error("--watch and --depfile cannot be used together")
 
     messager = common.Messager(args.verbosity)
 
@@ -272,26 +923,70 @@ def main():
         'auto': sys.stderr.isatty(),
     }
     if color_dict[args.color]:
+        import colorama
         colorama.init()
         red_function = make_red
     else:
         red_function = lambda string: string    # noqa
 
-    compile_manager = CompileManager(compiled_dir, messager,
-                                     args.always_recompile)
+    if args.cache_dir:
+        cache = compile_cache.CompileCache(
+            path_from_user(args.cache_dir), args.cache_max_size * 1000 * 1000)
+    else:
+        cache = None
+
+    if args.jobs == 1:
+        compile_manager = CompileManager(
+            compiled_dir, messager, args.always_recompile, warm_cache,
+            compile_cache=cache)
+    else:
+        compile_manager = ParallelCompileManager(
+            compiled_dir, messager, args.always_recompile, args.jobs,
+            warm_cache, compile_cache=cache)
+
+    if args.watch:
+        from asdac import watch
+
+        watcher = watch.Watcher(
+            compile_manager, args.infiles,
+            functools.partial(report_compile_error,
+                              red_function=red_function))
+        with contextlib.suppress(KeyboardInterrupt):
+            watcher.run(0.2)
+        return
+
+    timings_object = None if args.timings is None else timings.Timings()
+
     try:
-        for path in args.infiles:
-            compile_manager.compile(path)
+        with timings.activated(timings_object):
+            compile_manager.compile_all(args.infiles)
     except common.CompileError as e:
         report_compile_error(e, red_function)
         sys.exit(1)
+    finally:
+        if warm_cache is not None:
+            warm_cache.remember(compile_manager)
+
+    if args.timings == 'json':
+        print(json.dumps(timings_object.get_json_report(), indent=2))
+    elif args.timings == 'chrome':
+        print(json.dumps(timings_object.get_chrome_trace()))
 
     for compilation in compile_manager.source_path_2_compilation.values():
         assert compilation.state == common.CompilationState.DONE, compilation
 
+    if args.depfile is not None:
+        from asdac import depfile
+
+        depfile.write_depfile(
+            path_from_user(args.depfile),
+            compile_manager.source_path_2_compilation.values())
+
     if not compile_manager.something_was_compiled:
         messager(0, ("Nothing was compiled because the source files haven't "
                      "changed since the previous compilation."))
+    elif cache is not None and not args.always_recompile:
+        messager(0, cache.get_stats_message())
 
 
 if __name__ == '__main__':      # pragma: no cover
@@ -0,0 +1,114 @@
+"""Compiling without files, for editors, tests and other python programs.
+
+Example:
+
+    >>> from asdac import api
+    >>> result = api.compile_sources({'hello.asda': 'print("Hello")\\n'})
+    >>> list(result.compiled.keys())
+    ['hello.asda']
+    >>> result.errors
+    []
+
+Nothing is read from or written to the disk. The paths are relative to the
+current working directory like paths given to 'python3 -m asdac', but they
+don't need to exist.
+"""
+
+import collections
+import contextlib
+import io
+import pathlib
+
+import asdac.__main__
+from asdac import common
+
+
+# compiled is {path: bytes} with the same keys as the sources dict given to
+# compile_sources(), and output contains the messages that would have been
+# printed, e.g. warnings
+Result = collections.namedtuple('Result', ['compiled', 'errors', 'output'])
+
+# lines start at 1 and columns start at 0, like in error messages of
+# 'python3 -m asdac', and the line and column attributes are None if the error
+# doesn't have a location
+Error = collections.namedtuple('Error', [
+    'path', 'message', 'line', 'column', 'end_line', 'end_column'])
+
+
+def _create_error(compile_error, path_strings):
+    if compile_error.location is None:
+        return Error(None, compile_error.message, None, None, None, None)
+
+    source_path = compile_error.location.compilation.source_path
+    return Error(
+        path_strings.get(source_path, common.path_string(source_path)),
+        compile_error.message, *compile_error.location.get_line_column())
+
+
+def compile_sources(sources, compiled_dir='asda-compiled'):
+    """Compile a dict like {path: source code string}. Returns a Result.
+
+    Files that fail to compile are not in the compiled dict of the result, and
+    the files that import them aren't either. Compiling continues after an
+    error, so the result may contain errors from many files.
+
+    Files can import each other, but they can't import files that are not in
+    the sources dict.
+    """
+    # {absolute path: path given by the caller}
+    path_strings = collections.OrderedDict(
+        (common.resolve_dotdots(pathlib.Path(path).absolute()), path)
+        for path in sources)
+    file_system = common.MemoryFileSystem({
+        source_path: sources[path]
+        for source_path, path in path_strings.items()})
+
+    compile_manager = asdac.__main__.CompileManager(
+        common.resolve_dotdots(pathlib.Path(compiled_dir).absolute()),
+        common.Messager(-1), True, file_system=file_system)
+
+    errors = []
+    output = io.StringIO()
+
+    def compile_all_sources():
+        for source_path in path_strings:
+            try:
+                compile_manager.compile(source_path)
+            except common.CompileError as e:
+                error = _create_error(e, path_strings)
+            except FileNotFoundError as e:
+                # a file imports something that is not in the sources dict
+                error = Error(
+                    common.path_string(pathlib.Path(e.filename)),
+                    "cannot import a file that doesn't exist",
+                    None, None, None, None)
+            else:
+                continue
+
+            if error not in errors:
+                errors.append(error)
+
+            # the failed compilation and everything that imports it is left
+            # in a half-done state, but the files they import are fine
+            for path, compilation in list(
+                    compile_manager.source_path_2_compilation.items()):
+                if compilation.state != common.CompilationState.DONE:
+                    del compile_manager.source_path_2_compilation[path]
+
+    # warnings are printed with print(), so this is not thread-safe
+    #
+    # compile_manager.compile() starts a thread for deeply recursive
+    # compiling, unless it's already running in one, and starting a thread
+    # for every file would be slow
+    with contextlib.redirect_stdout(output), \
+            contextlib.redirect_stderr(output):
+        common.call_with_deep_recursion(compile_all_sources)
+
+    compiled = collections.OrderedDict()
+    for source_path, path in path_strings.items():
+        compilation = compile_manager.source_path_2_compilation.get(
+            source_path)
+        if compilation is not None:
+            compiled[path] = file_system.compiled[compilation.compiled_path]
+
+    return Result(compiled, errors, output.getvalue())
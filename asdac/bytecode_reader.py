@@ -14,6 +14,21 @@ TYPE_FROM_LIST = b'l'
 
 IMPORT_SECTION = b'i'
 EXPORT_SECTION = b'e'
+TYPE_LIST_SECTION = b'y'
+HASH_SECTION = b'h'
+
+# all hashes are sha256 hashes, see bytecoder.py
+HASH_SIZE = 32
+
+# for types that can't be read yet
+_CANNOT_READ_YET = object()
+
+# imports is a list of absolute source file paths, and import_export_hashes
+# are the export hashes of the imported files from the time when the file was
+# compiled
+CompiledInfo = collections.namedtuple('CompiledInfo', [
+    'imports', 'export_types', 'source_hash', 'export_hash',
+    'import_export_hashes'])
 
 
 class RecompileFixableError(Exception):
@@ -37,6 +52,9 @@ class _BytecodeReader:
         self.compilation = compilation
         self.file = file
 
+        # TYPE_FROM_LIST types are looked up from here, see bytecoder.py
+        self.type_list = []
+
     def error(self, message):
         raise RecompileFixableError(self.compilation, message)
 
@@ -71,28 +89,83 @@ class _BytecodeReader:
         assert relative_to.is_absolute()
         return common.resolve_dotdots(relative_to / relative_path)
 
-    def read_type(self, *, name_hint='<unknown name>'):
+    # the TYPE_FUNCTION byte must be read before calling this
+    def _read_function_type_if_possible(self):
+        returntype = self._read_type_if_possible()
+        nargs = self.read_uint8()
+        argtypes = [self._read_type_if_possible() for junk in range(nargs)]
+        if any(tybe is _CANNOT_READ_YET for tybe in [returntype] + argtypes):
+            return _CANNOT_READ_YET
+        return objects.FunctionType(argtypes, returntype)
+
+    # returns _CANNOT_READ_YET for types that the bytecode doesn't describe
+    # well enough, e.g. Array[Str] is written as just Array
+    def _read_type_if_possible(self):
         byte = self._read(1)
 
         if byte == TYPE_BUILTIN:
             index = self.read_uint8()
+            if index >= len(objects.BUILTIN_TYPES):
+                # generic types are after other built-in types
+                return _CANNOT_READ_YET
             return list(objects.BUILTIN_TYPES.values())[index]
 
         if byte == TYPE_FUNCTION:
-            returntype = self.read_type()
-            nargs = self.read_uint8()
-            argtypes = [self.read_type() for junk in range(nargs)]
-            return objects.FunctionType(argtypes, returntype)
+            return self._read_function_type_if_possible()
 
         if byte == TYPE_VOID:
             return None
 
+        if byte == TYPE_FROM_LIST:
+            index = self.read_uint16()
+            if index >= len(self.type_list):
+                self.error("invalid type list index %d" % index)
+            return self.type_list[index]
+
         self.error("invalid type byte %r" % byte)
 
+    def read_type(self, *, name_hint='<unknown name>'):
+        result = self._read_type_if_possible()
+        if result is _CANNOT_READ_YET:
+            self.error("cannot read the type of '%s' yet" % name_hint)
+        return result
+
     def check_asda_part(self):
-        if self.file.read(4) != b'asda':
+        if self.file.read(6) != b'asda\xA5\xDA':
             self.error("the file is not an asda bytecode file")
 
+    # the type list is needed for reading the second export section, but it is
+    # after the first import and export sections
+    def skip_to_type_list_section(self):
+        self.read_string()      # source path
+        if self._read(1) != IMPORT_SECTION:
+            self.error(
+                "the file doesn't seem to have a valid first import section")
+        for junk in range(self.read_uint16()):
+            self.read_string()
+
+        if self._read(1) != EXPORT_SECTION:
+            self.error(
+                "the file doesn't seem to have a valid first export section")
+        self.read_uint16()
+
+    def read_type_list_section(self):
+        if self._read(1) != TYPE_LIST_SECTION:
+            self.error("the file doesn't seem to have a valid type list")
+
+        for junk in range(self.read_uint16()):
+            byte = self._read(1)
+            if byte == TYPE_FUNCTION:
+                self.type_list.append(self._read_function_type_if_possible())
+            elif byte == TYPE_ASDA_CLASS:
+                # TODO: the bytecode doesn't contain enough information for
+                #       creating the class
+                self.read_uint16()
+                self.read_uint16()
+                self.type_list.append(_CANNOT_READ_YET)
+            else:
+                self.error("invalid type list item byte %r" % byte)
+
     def seek_to_end_sections(self):
         self.file.seek(-32//8, io.SEEK_END)
         new_seek_pos = self.read_uint32()
@@ -123,16 +196,32 @@ class _BytecodeReader:
             result[name] = tybe
         return result
 
+    # returns (source hash, export hash, import export hashes)
+    def read_hash_section(self, how_many_imports):
+        if self._read(1) != HASH_SECTION:
+            self.error("the file doesn't seem to have a valid hash section")
+
+        source_hash = self._read(HASH_SIZE)
+        export_hash = self._read(HASH_SIZE)
+        import_export_hashes = [self._read(HASH_SIZE)
+                                for junk in range(how_many_imports)]
+        return (source_hash, export_hash, import_export_hashes)
+
 
-def read_imports_and_exports(compilation):
+# raises RecompileFixableError or OSError
+def read_compiled_info(compilation):
     with compilation.messager.indented(3, "Reading the compiled file..."):
-        with compilation.compiled_path.open('rb') as file:
+        with compilation.file_system.open_compiled_file(
+                compilation.compiled_path) as file:
             reader = _BytecodeReader(compilation, file)
             reader.check_asda_part()
+            reader.skip_to_type_list_section()
+            reader.read_type_list_section()
             reader.seek_to_end_sections()
             imports = reader.read_second_import_section()
             exports = reader.read_export_section()
+            hashes = reader.read_hash_section(len(imports))
             compilation.messager(4, "Imported files: " + (
                 ', '.join(map(common.path_string, imports)) or '(none)'))
 
-    return (imports, exports)
+    return CompiledInfo(imports, exports, *hashes)
@@ -3,7 +3,6 @@
 import bisect
 import collections
 import functools
-import io
 import os
 
 from asdac import common, decision_tree, objects
@@ -71,6 +70,7 @@ TYPE_FROM_LIST = b'l'
 IMPORT_SECTION = b'i'
 EXPORT_SECTION = b'e'
 TYPE_LIST_SECTION = b'y'
+HASH_SECTION = b'h'
 
 
 def _bit_storing_size(n):
@@ -128,6 +128,9 @@ class _ByteCodeCreator:
 
         # when the interpreter imports the bytecode file, it creates things
         # that represent these types, and looks up these types by index
+        #
+        # this is an ordered dict like {type: index}, because checking whether
+        # a type is in a list was slow for files with lots of types
         self.type_list = type_list
 
         self.local_vars = []
@@ -233,7 +236,7 @@ class _ByteCodeCreator:
         else:
             assert False, tybe      # pragma: no cover
 
-        self.type_list.append(tybe)
+        self.type_list[tybe] = len(self.type_list)
 
     def write_type(self, tybe, *, allow_void=False):
         if tybe is None:
@@ -245,7 +248,7 @@ class _ByteCodeCreator:
 
         if tybe in self.type_list:
             self.byte_array.extend(TYPE_FROM_LIST)
-            self.write_uint16(self.type_list.index(tybe))
+            self.write_uint16(self.type_list[tybe])
         elif tybe in objects.BUILTIN_TYPES.values():
             names = list(objects.BUILTIN_TYPES)
             self.byte_array.extend(TYPE_BUILTIN)
@@ -541,6 +544,13 @@ class _ByteCodeCreator:
             self.write_string(name)
             self.write_type(tybe)
 
+    def write_hash_section(self, source_code):
+        self.byte_array.extend(HASH_SECTION)
+        self.byte_array.extend(common.hash_source(source_code))
+        self.byte_array.extend(self.compilation.export_hash)
+        for impcomp in self.compilation.imports:
+            self.byte_array.extend(impcomp.export_hash)
+
 
 def _swap_bytes(byte_array, start, middle):
     """Swaps byte_array[start:middle] and byte_array[middle:] with each other.
@@ -564,20 +574,21 @@ def _swap_bytes(byte_array, start, middle):
 #   6.  opcode
 #   7.  second import section: source file paths, for the compiler
 #   8.  second export section: names and types, for the compiler
-#   9.  number of bytes in opcode and everything before it, as an uint32.
+#   9.  hash section: hash of the source code, export hash of this file, and
+#       export hashes of the imported files in the same order as in the
+#       second import section, see common.hash_source() and
+#       objects.get_export_hash()
+#   10. number of bytes in opcode and everything before it, as an uint32.
 #       The compiler uses this to efficiently read imports and exports.
 #
 # all paths are relative to the bytecode file's directory and have '/' as
 # the separator
 def create_bytecode(compilation, start_node, source_code):
-    line_start_offsets = []
-    offset = 0
-    for line in io.StringIO(source_code):
-        line_start_offsets.append(offset)
-        offset += len(line)
+    line_start_offsets = compilation.get_line_starts()
 
     creator = _ByteCodeCreator(
-        bytearray(), compilation, line_start_offsets, 1, [])
+        bytearray(), compilation, line_start_offsets, 1,
+        collections.OrderedDict())
 
     creator.byte_array.extend(b'asda\xA5\xDA')
     creator.write_path(compilation.source_path)
@@ -599,6 +610,7 @@ def create_bytecode(compilation, start_node, source_code):
     creator.write_import_section(
         [impcomp.source_path for impcomp in compilation.imports])
     creator.write_second_export_section(compilation.export_types)
+    creator.write_hash_section(source_code)
 
     creator.write_uint32(after_opcode)
 
@@ -0,0 +1,54 @@
+"""Sends a compile request to a server started with 'asdac --server SOCKET'.
+
+Usage:
+
+    python3 -m asdac.client SOCKET [asdac arguments...]
+
+This doesn't import the rest of asdac, so it starts a lot faster than
+'python3 -m asdac'.
+"""
+
+import json
+import os
+import socket
+import sys
+
+
+def send_request(socket_path, args, stderr_isatty=False):
+    """Returns a (stdout, stderr, exit_code) tuple."""
+    request = {
+        'cwd': os.getcwd(),
+        'args': args,
+        'stderr_isatty': stderr_isatty,
+    }
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+        sock.sendall(json.dumps(request).encode('utf-8') + b'\n')
+        with sock.makefile('rb') as file:
+            response = json.loads(file.readline().decode('utf-8'))
+
+    return (response['stdout'], response['stderr'], response['exit_code'])
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] in {'-h', '--help'}:
+        print("Usage: %s -m asdac.client SOCKET [asdac arguments...]"
+              % sys.executable, file=sys.stderr)
+        sys.exit(2)
+
+    try:
+        stdout, stderr, exit_code = send_request(
+            sys.argv[1], sys.argv[2:], sys.stderr.isatty())
+    except OSError as e:
+        print("%s: cannot connect to the compile server: %s"
+              % (sys.argv[0], e), file=sys.stderr)
+        sys.exit(1)
+
+    sys.stdout.write(stdout)
+    sys.stderr.write(stderr)
+    sys.exit(exit_code)
+
+
+if __name__ == '__main__':      # pragma: no cover
+    main()
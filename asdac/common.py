@@ -1,10 +1,17 @@
+import bisect
 import collections
 import contextlib
 import enum
+import errno
+import functools
+import hashlib
+import io
 import itertools
+import mmap
 import os
 import pathlib
 import sys
+import threading
 
 
 # TODO: on windows, relpath doesn't work for things that are on a different
@@ -17,7 +24,13 @@ def relpath(path, relative2='.'):
 
 def path_string(path):
     """Converts a pathlib.Path to a human-readable string."""
-    return str(relpath(path))
+    return _path_string(path, os.getcwd())
+
+
+# os.path.relpath is slow, and this is called many times for each file
+@functools.lru_cache(maxsize=16384)
+def _path_string(path, cwd):
+    return str(relpath(path, cwd))
 
 
 def resolve_dotdots(path):
@@ -25,6 +38,194 @@ def resolve_dotdots(path):
     return pathlib.Path(os.path.normpath(str(path)))
 
 
+def hash_source(source):
+    """Returns the hash of a source code string as bytes.
+
+    Compiled files contain the hash of the source code, and a compiled file is
+    up to date if the hash hasn't changed.
+    """
+    return hashlib.sha256(source.encode('utf-8')).digest()
+
+
+# most parts of the compiler are recursive functions, and they would fail with
+# RecursionError for deeply nested code, e.g. generated code with thousands
+# of nested parentheses or if statements
+#
+# the recursion limit must not be so big that the stack runs out before
+# reaching the limit, because that crashes the whole python process
+_DEEP_STACK_SIZE = 512 * 1024 * 1024
+_DEEP_RECURSION_LIMIT = 100000
+
+# has an 'active' attribute in threads started by call_with_deep_recursion()
+_deep_recursion_state = threading.local()
+
+
+def call_with_deep_recursion(function, *args):
+    """Call a function in a thread with a big stack and recursion limit.
+
+    This returns what the function returns, or raises the exception that
+    the function raised. The recursion limit is changed only while the
+    function runs.
+
+    Starting the thread is not free, so this should be called once for a
+    lot of work, e.g. for compiling all files. Calling this again in the
+    function just calls the given function.
+    """
+    if getattr(_deep_recursion_state, 'active', False):
+        return function(*args)
+
+    result = []
+
+    def target():
+        _deep_recursion_state.active = True
+        try:
+            result.append((True, function(*args)))
+        except BaseException as e:
+            result.append((False, e))
+
+    old_stack_size = threading.stack_size(_DEEP_STACK_SIZE)
+    old_recursion_limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(max(old_recursion_limit, _DEEP_RECURSION_LIMIT))
+    try:
+        # daemon thread doesn't prevent exiting on ctrl+c
+        thread = threading.Thread(target=target, daemon=True)
+        thread.start()
+        thread.join()
+    finally:
+        threading.stack_size(old_stack_size)
+        sys.setrecursionlimit(old_recursion_limit)
+
+    succeeded, value = result[0]
+    if succeeded:
+        return value
+    raise value
+
+
+class FileSystem:
+    """Reads source files and reads and writes compiled files.
+
+    This class uses files on the disk, but subclasses can do something else.
+    For example, MemoryFileSystem doesn't use the disk at all.
+    """
+
+    def open_source_file(self, path):
+        # see docs/syntax.md
+        # python accepts both LF and CRLF by default, but the default encoding
+        # is platform-dependent (not utf8 on windows, lol)
+        # utf-8-sig is like utf-8 but it ignores the bom, if there is a bom
+        return path.open('r', encoding='utf-8-sig')
+
+    def read_source_file(self, path):
+        """Returns the content of a source file as a string.
+
+        This gives the same string as reading open_source_file(), but big
+        files are copied less. The file is memory-mapped and decoded from
+        UTF-8 in one go, instead of reading it to a bytes object first.
+        """
+        with path.open('rb') as file:
+            try:
+                mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            except (ValueError, OSError):
+                # empty files and e.g. pipes can't be mapped
+                mapped = None
+
+        if mapped is None:
+            with self.open_source_file(path) as file:
+                return file.read()
+
+        with mapped:
+            source = str(mapped, 'utf-8-sig')
+
+        # like open_source_file(), this converts CRLF and CR to LF
+        if '\r' in source:
+            source = source.replace('\r\n', '\n').replace('\r', '\n')
+        return source
+
+    def open_compiled_file(self, path):
+        return path.open('rb')
+
+    def write_compiled_file(self, path, bytez):
+        # writing to a temporary file first means that no truncated files are
+        # left behind if writing fails, and other asdac processes never see
+        # partially written files
+        temp_path = path.with_name(path.name + '.tmp')
+        path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            with temp_path.open('wb') as file:
+                file.write(bytez)
+            os.replace(str(temp_path), str(path))
+        except Exception:
+            with contextlib.suppress(OSError):
+                temp_path.unlink()
+            raise
+
+    def get_stat_key(self, path):
+        """Returns something that changes when the file changes, or None.
+
+        None is returned if the file doesn't exist. Unlike hashing, this
+        doesn't read the file, but it can also change when the content stays
+        the same.
+        """
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+
+class MemoryFileSystem(FileSystem):
+    """A file system that has all files in dicts.
+
+    The sources dict is like {path: source code string}, and compiled files
+    are written to the compiled dict, which is like {path: bytes}. The paths
+    should be absolute pathlib.Path objects.
+    """
+
+    def __init__(self, sources):
+        self.sources = {resolve_dotdots(path): source
+                        for path, source in sources.items()}
+        self.compiled = {}
+        self._write_counts = collections.Counter()
+
+    def _not_found(self, path):
+        return FileNotFoundError(
+            errno.ENOENT, os.strerror(errno.ENOENT), str(path))
+
+    def open_source_file(self, path):
+        try:
+            source = self.sources[resolve_dotdots(path)]
+        except KeyError:
+            raise self._not_found(path)
+
+        # like FileSystem.open_source_file, this ignores a bom and converts
+        # CRLF to LF
+        if source.startswith('\uFEFF'):
+            source = source[1:]
+        return io.StringIO(source, newline=None)
+
+    def read_source_file(self, path):
+        with self.open_source_file(path) as file:
+            return file.read()
+
+    def open_compiled_file(self, path):
+        try:
+            return io.BytesIO(self.compiled[path])
+        except KeyError:
+            raise self._not_found(path)
+
+    def write_compiled_file(self, path, bytez):
+        self.compiled[path] = bytes(bytez)
+        self._write_counts[path] += 1
+
+    def get_stat_key(self, path):
+        if path in self.compiled:
+            return self._write_counts[path]
+        if resolve_dotdots(path) in self.sources:
+            # the sources dict should not be modified
+            return 0
+        return None
+
+
 class Messager:
     """Prints fancy messages to stderr.
 
@@ -88,8 +289,11 @@ class CompilationState(enum.Enum):
 class Compilation:
     """Represents a source file and its corresponding bytecode file."""
 
-    def __init__(self, source_path, compiled_dir, messager):
+    def __init__(self, source_path, compiled_dir, messager, file_system=None):
         self.messager = messager.with_prefix(path_string(source_path))
+        if file_system is None:
+            file_system = FileSystem()
+        self.file_system = file_system
 
         self.source_path = source_path
         self.compiled_path = self._get_bytecode_path(compiled_dir)
@@ -97,6 +301,11 @@ class Compilation:
         self.state = CompilationState.NOTHING_DONE
         self.imports = None         # list of other Compilation objects
         self.export_types = None    # ordered dict like {name: type}
+        self.export_hash = None     # see objects.get_export_hash()
+
+        # see read_source_file() and get_line_starts()
+        self._source = None
+        self._line_starts = None
 
     def _get_bytecode_path(self, compiled_dir):
         relative = relpath(self.source_path, compiled_dir.parent)
@@ -114,11 +323,41 @@ class Compilation:
         return '<%s of %s>' % (type(self).__name__, self.source_path)
 
     def open_source_file(self):
-        # see docs/syntax.md
-        # python accepts both LF and CRLF by default, but the default encoding
-        # is platform-dependent (not utf8 on windows, lol)
-        # utf-8-sig is like utf-8 but it ignores the bom, if there is a bom
-        return self.source_path.open('r', encoding='utf-8-sig')
+        return self.file_system.open_source_file(self.source_path)
+
+    # the source code is read only once, because it's needed for parsing,
+    # hashing and error messages, and reading a big file is slow
+    def read_source_file(self):
+        if self._source is None:
+            self._source = self.file_system.read_source_file(self.source_path)
+        return self._source
+
+    # returns a list of offsets where lines of the source code start, so
+    # that line i+1 starts at offset get_line_starts()[i]
+    #
+    # there's a line start after a trailing newline too, so that e.g.
+    # bisect.bisect(line_starts, offset) is the line number of any offset
+    def get_line_starts(self):
+        if self._line_starts is None:
+            source = self.read_source_file()
+            self._line_starts = [0]
+            offset = source.find('\n')
+            while offset != -1:
+                self._line_starts.append(offset + 1)
+                offset = source.find('\n', offset + 1)
+        return self._line_starts
+
+    # done compilations are remembered by compile managers, so they shouldn't
+    # hold the source code, and it's not sent to other processes
+    def _forget_source(self):
+        self._source = None
+        self._line_starts = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_source'] = None
+        state['_line_starts'] = None
+        return state
 
     def set_imports(self, import_compilations):
         assert self.state == CompilationState.NOTHING_DONE
@@ -126,19 +365,24 @@ class Compilation:
         self.state = CompilationState.IMPORTS_KNOWN
         self.imports = import_compilations
 
-    def set_export_types(self, export_types):
+    def set_export_types(self, export_types, export_hash=None):
         assert self.state == CompilationState.IMPORTS_KNOWN
         assert isinstance(export_types, collections.OrderedDict)
         self.state = CompilationState.EXPORTS_KNOWN
         self.export_types = export_types
+        self.export_hash = export_hash
 
     def set_done(self):
         assert self.state == CompilationState.EXPORTS_KNOWN
         self.state = CompilationState.DONE
+        self._forget_source()
 
 
 class Location:
 
+    # there is a location for every token and ast node, so this saves memory
+    __slots__ = ('compilation', 'offset', 'length')
+
     def __init__(self, compilation, offset, length):
         # these make debugging a lot easier, don't delete these
         # but tests do magic
@@ -163,44 +407,33 @@ class Location:
         return '<' + result + '>'
 
     # raises OSError
-    def _read_before_value_after(self):
-        with self.compilation.open_source_file() as file:
-            # seek won't do because seek wants a number of bytes, not number
-            # of characters
-            before = file.read(self.offset)
-            value = file.read(self.length)
-
-            # after is from this location to next \n (included)
-            if value.endswith('\n'):
-                after = ''
-            else:
-                after = file.readline()
-
-        if len(before) != self.offset or len(value) != self.length:
+    def _get_line_starts_and_source(self):
+        source = self.compilation.read_source_file()
+        if self.offset + self.length > len(source):
             # this can happen when input e.g. comes from /dev/fd/something
             # but is hard to test
             raise OSError("file ended too soon")   # pragma: no cover
+        return (self.compilation.get_line_starts(), source)
 
-        return (before, value, after)
-
-    def get_line_column_string(self):
+    # returns (startline, startcolumn, endline, endcolumn), lines start at 1
+    # and columns start at 0
+    def get_line_column(self):
         try:
-            before, value, junk = self._read_before_value_after()
+            line_starts, junk = self._get_line_starts_and_source()
         except OSError:
             # not perfect, but is the best we can do
-            startline = 1
-            startcolumn = self.offset
-            endline = 1
-            endcolumn = self.offset + self.length
-        else:
-            startline = 1 + before.count('\n')
-            startcolumn = len(before.rsplit('\n', 1)[-1])
-            endline = startline + value.count('\n')
-            endcolumn = len((before + value).rsplit('\n', 1)[-1])
+            return (1, self.offset, 1, self.offset + self.length)
+
+        end = self.offset + self.length
+        startline = bisect.bisect(line_starts, self.offset)
+        endline = bisect.bisect(line_starts, end)
+        return (startline, self.offset - line_starts[startline - 1],
+                endline, end - line_starts[endline - 1])
 
+    def get_line_column_string(self):
         return '%s:%s,%s...%s,%s' % (
-            path_string(self.compilation.source_path),
-            startline, startcolumn, endline, endcolumn)
+            (path_string(self.compilation.source_path),) +
+            self.get_line_column())
 
     def __eq__(self, other):
         if not isinstance(other, Location):
@@ -229,8 +462,20 @@ class Location:
 
         A trailing newline is not included in the last part.
         """
-        before, value, after = self._read_before_value_after()
-        return (before.rsplit('\n', 1)[-1], value, after.rstrip('\n'))
+        line_starts, source = self._get_line_starts_and_source()
+        end = self.offset + self.length
+        line_start = line_starts[bisect.bisect(line_starts, self.offset) - 1]
+
+        # the last part is from this location to next \n
+        if source[self.offset:end].endswith('\n'):
+            line_end = end
+        else:
+            line_end = source.find('\n', end)
+            if line_end == -1:
+                line_end = len(source)
+
+        return (source[line_start:self.offset], source[self.offset:end],
+                source[end:line_end])
 
 
 class CompileError(Exception):
@@ -245,6 +490,11 @@ class CompileError(Exception):
     def __str__(self):
         return '%r: %s' % (self.location, self.message)
 
+    # for sending errors between processes, the default implementation would
+    # pass self.args to __init__ in the wrong order
+    def __reduce__(self):
+        return (type(self), (self.message, self.location))
+
 
 # inheriting from this is a more debuggable alternative to "class Asd: pass"
 class Marker:
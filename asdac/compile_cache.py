@@ -0,0 +1,208 @@
+"""A cache of compiled files that can be shared between compiled directories.
+
+Like ccache, but for asda. Compiled files are stored in the cache directory
+with a key that is a hash of everything that affects the compiled file:
+
+    * the source code of asdac itself
+    * the source code of the file being compiled
+    * paths of the source file and the imported files, relative to the
+      compiled file, because they are in the compiled file
+    * export hashes of the imported files
+
+If a file with the same key has been compiled before, even in a different
+project or with a different compiled directory, the compiled file is copied
+from the cache instead of compiling it again.
+
+The cache directory is cleaned up at the end of compiling by deleting least
+recently used files until the cache is small enough.
+
+The cache files don't contain pickles or anything else that could run code
+when asdac reads them, but the compiled files in them are run by the
+interpreter, so the cache directory must be writable only by users and
+machines that are trusted.
+"""
+
+import collections
+import contextlib
+import functools
+import hashlib
+import itertools
+import json
+import os
+import pathlib
+
+from asdac import common, objects
+
+
+# increase this when changing what the cache files contain
+_VERSION = 2
+
+# cleaning up deletes files until the size of the cache is at most this much
+# of the maximum size, so that the cache isn't cleaned up on every compile
+_CLEANUP_RATIO = 0.8
+
+
+@functools.lru_cache()
+def get_asdac_hash():
+    sha = hashlib.sha256()
+    asdac_dir = pathlib.Path(__file__).absolute().parent
+    for path in sorted(asdac_dir.glob('**/*.py')):
+        sha.update(str(path.relative_to(asdac_dir)).encode('utf-8') + b'\0')
+        sha.update(path.read_bytes() + b'\0')
+    return sha.digest()
+
+
+def _path_bytes(path, relative2):
+    # forward slashes, because the compiled files use them too
+    return common.relpath(path, relative2).as_posix().encode('utf-8') + b'\0'
+
+
+# an entry contains the bytes of the compiled file, and the export types that
+# can't always be read from the compiled file, like in the manifest
+Entry = collections.namedtuple(
+    'Entry', ['bytecode', 'export_types', 'export_hash'])
+
+
+# a cache file is a line of json and then the bytes of the compiled file
+#
+# the cache files used to be pickles, but loading a pickle can run any code,
+# and the cache directory may be shared between machines
+def _write_entry(file, key, entry):
+    header = {
+        'version': _VERSION,
+        'key': key,
+        'export_types': objects.export_types_to_json(entry.export_types),
+        'export_hash': entry.export_hash.hex(),
+    }
+    # json.dumps() escapes newline characters in strings
+    file.write(json.dumps(header).encode('utf-8') + b'\n')
+    file.write(entry.bytecode)
+
+
+# raises an exception if the file is not a valid cache file for the key
+def _read_entry(file, key):
+    header = json.loads(file.readline().decode('utf-8'))
+    if header['version'] != _VERSION:
+        raise ValueError("the file is from a different version of asdac")
+    if header['key'] != key:
+        raise ValueError("the file is for a different key")
+
+    export_types = objects.export_types_from_json(header['export_types'])
+    export_hash = bytes.fromhex(header['export_hash'])
+    if objects.get_export_hash(export_types) != export_hash:
+        raise ValueError("export hash doesn't match the export types")
+    return Entry(file.read(), export_types, export_hash)
+
+
+class CompileCache:
+
+    def __init__(self, directory, max_size):
+        self.directory = directory
+        self.max_size = max_size    # in bytes
+        self.hits = 0
+        self.misses = 0
+        self._stored_something = False
+
+    # for using the cache in another process, the stats of the copy can be
+    # added to this with merge()
+    def copy_without_stats(self):
+        return CompileCache(self.directory, self.max_size)
+
+    def merge(self, other):
+        self.hits += other.hits
+        self.misses += other.misses
+        self._stored_something = (
+            self._stored_something or other._stored_something)
+
+    # returns None if the key can't be computed because an export hash is
+    # missing
+    def get_key(self, compilation, source):
+        relative2 = compilation.compiled_path.parent
+        sha = hashlib.sha256()
+        sha.update(get_asdac_hash())
+        sha.update(common.hash_source(source))
+        sha.update(_path_bytes(compilation.source_path, relative2))
+        for import_ in compilation.imports:
+            if import_.export_hash is None:
+                return None
+            sha.update(_path_bytes(import_.source_path, relative2))
+            sha.update(_path_bytes(import_.compiled_path, relative2))
+            sha.update(import_.export_hash)
+        return sha.hexdigest()
+
+    def _get_path(self, key):
+        # git does this too, because huge directories are slow
+        return self.directory / key[:2] / (key[2:] + '.entry')
+
+    # returns an Entry, or None if there is nothing with the key
+    def get(self, key):
+        path = self._get_path(key)
+        try:
+            with path.open('rb') as file:
+                entry = _read_entry(file, key)
+        except Exception:
+            # the file doesn't exist, or it's corrupted and reading it raised
+            # one of many possible errors, a corrupted file gets overwritten
+            # by put() after compiling
+            self.misses += 1
+            return None
+
+        # the modification time is used for finding least recently used files
+        with contextlib.suppress(OSError):
+            os.utime(str(path))
+        self.hits += 1
+        return entry
+
+    def put(self, key, entry):
+        path = self._get_path(key)
+
+        # other asdac processes may use the cache at the same time, so
+        # partially written files must not be visible, and the temporary file
+        # must have a name that other processes don't use
+        temp_path = path.with_name('%s.%d.tmp' % (path.name, os.getpid()))
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with temp_path.open('wb') as file:
+                _write_entry(file, key, entry)
+            os.replace(str(temp_path), str(path))
+        except (OSError, ValueError):
+            # compiling works without the cache, so this is not an error,
+            # and ValueError means that export_types_to_json() failed
+            with contextlib.suppress(OSError):
+                temp_path.unlink()
+            return
+        self._stored_something = True
+
+    def clean_up(self):
+        """Delete least recently used files if the cache is too big."""
+        if not self._stored_something:
+            return
+        self._stored_something = False
+
+        files = []
+        total_size = 0
+        # .pickle files are from older asdac versions, and they never get
+        # used, so they will be deleted eventually
+        for path in itertools.chain(self.directory.glob('*/*.entry'),
+                                    self.directory.glob('*/*.pickle')):
+            with contextlib.suppress(FileNotFoundError):
+                stat = path.stat()
+                files.append((stat.st_mtime, stat.st_size, path))
+                total_size += stat.st_size
+
+        if total_size <= self.max_size:
+            return
+
+        files.sort()
+        for mtime, size, path in files:
+            if total_size <= self.max_size * _CLEANUP_RATIO:
+                break
+            # another process may have deleted it already
+            with contextlib.suppress(FileNotFoundError):
+                path.unlink()
+            total_size -= size
+
+    def get_stats_message(self):
+        return "Compile cache: %d hit%s, %d miss%s" % (
+            self.hits, '' if self.hits == 1 else 's',
+            self.misses, '' if self.misses == 1 else 'es')
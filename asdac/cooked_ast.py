@@ -1,12 +1,12 @@
 import collections
 import itertools
 
-from . import raw_ast, common, objects
+from . import raw_ast, common, objects, utils
 
 
 def _astclass(name, fields):
     # type is set to None for statements
-    return collections.namedtuple(name, ['location', 'type'] + fields)
+    return utils.node_class(name, ['location', 'type'] + fields, __name__)
 
 
 StrConstant = _astclass('StrConstant', ['python_string'])
@@ -47,35 +47,100 @@ BoolNegation = _astclass('BoolNegation', ['value'])
 
 # this is a somewhat evil function
 def _replace_generic_markers_with_object(node, markers):
-    node = node._replace(type=node.type.undo_generics(
-        dict.fromkeys(markers, objects.BUILTIN_TYPES['Object'])))
+    changes = {'type': node.type.undo_generics(
+        dict.fromkeys(markers, objects.BUILTIN_TYPES['Object']))}
 
     for name, value in node._asdict().items():
         if name in ['location', 'type']:
             continue
 
         # FIXME: what if the value is a list
-        if not (isinstance(value, tuple) and
+        if not (isinstance(value, utils.Node) and
                 hasattr(value, 'location') and
                 hasattr(value, 'type')):
-            # it is not a cooked ast namedtuple
+            # it is not a cooked ast node
             continue
 
-        node = node._replace(**{
-            name: _replace_generic_markers_with_object(value, markers)
-        })
+        changes[name] = _replace_generic_markers_with_object(value, markers)
 
-    return node
+    # all changes at once, so that the node is copied only once
+    return node._replace(**changes)
 
 
-# FIXME: this is wrong? collections.ChainMap.__iter__ source code is:
-#
-#    def __iter__(self):
-#        return iter(set().union(*self.maps))
+class _SymbolTable:
+    """The names that are visible in the chef that is cooking.
 
-def _create_chainmap(fallback_chainmap):
-    return collections.ChainMap(
-        collections.OrderedDict(), *fallback_chainmap.maps)
+    Each chef used to have a ChainMap of the dicts of all its parent chefs
+    for each kind of names, so creating a chef and looking up a name took
+    time proportional to how deeply nested the chef is. Now all chefs of a
+    cook() share one of these, and looking up, defining and checking names is
+    O(1) regardless of nesting.
+
+    Chefs are entered when they are created and exited with a with
+    statement. Exiting a chef forgets the names defined in it, so only names
+    of the entered chefs are here.
+    """
+
+    def __init__(self):
+        # {(kind, name): [(chef, value), ...]} with the innermost chef last,
+        # kind is e.g. 'vars' or 'types'
+        self.definitions = {}
+        self._chefs = []    # entered chefs, innermost last
+
+    def enter(self, chef):
+        self._chefs.append(chef)
+
+    def exit(self, chef):
+        assert self._chefs.pop() is chef
+        for key in reversed(chef.defined_keys):
+            definitions = self.definitions[key]
+            assert definitions[-1][0] is chef
+            del definitions[-1]
+            if not definitions:
+                del self.definitions[key]
+
+    def define(self, chef, kind, name, value):
+        key = (kind, name)
+        self.definitions.setdefault(key, []).append((chef, value))
+        chef.defined_keys.append(key)
+
+
+class _ChefNames:
+    """Like a dict of the names of one kind that are visible in a chef.
+
+    Setting an item defines a name in the chef, even if it isn't the
+    innermost chef, and the other operations look up the innermost
+    definition.
+    """
+
+    def __init__(self, chef, kind):
+        self._chef = chef
+        self._kind = kind
+        # this is used a lot, so it's faster to not go through the chef
+        self._definitions = chef.symbols.definitions
+
+    def __contains__(self, name):
+        return (self._kind, name) in self._definitions
+
+    def __getitem__(self, name):
+        try:
+            return self._definitions[(self._kind, name)][-1][1]
+        except KeyError:
+            raise KeyError(name) from None
+
+    def __setitem__(self, name, value):
+        self._chef.symbols.define(self._chef, self._kind, name, value)
+
+    def update(self, dictionary):
+        for name, value in dictionary.items():
+            self[name] = value
+
+    # returns the chef that defines the name, or None
+    def get_chef(self, name):
+        try:
+            return self._definitions[(self._kind, name)][-1][0]
+        except KeyError:
+            return None
 
 
 # note that there is code that uses copy.copy() with Variable objects
@@ -130,17 +195,25 @@ class _Chef:
             self.returntype = None
 
         self.parent_chef = parent_chef
+        self.symbols = (_SymbolTable() if parent_chef is None
+                        else parent_chef.symbols)
+        self.symbols.enter(self)
+        self.defined_keys = []      # see _SymbolTable
+
+        self.vars = _ChefNames(self, 'vars')
+        self.types = _ChefNames(self, 'types')
+        self.generic_vars = _ChefNames(self, 'generic_vars')
+        self.generic_types = _ChefNames(self, 'generic_types')
+
         if parent_chef is None:
             self.level = 0
             self.import_compilations = None
             self.import_name_mapping = None
 
-            # these are ChainMaps to make any_chef.vars.maps[0] always work
-            self.vars = collections.ChainMap(BUILTIN_VARS)
-            self.types = collections.ChainMap(objects.BUILTIN_TYPES)
-            self.generic_vars = collections.ChainMap(BUILTIN_GENERIC_VARS)
-            self.generic_types = collections.ChainMap(
-                objects.BUILTIN_GENERIC_TYPES)
+            self.vars.update(BUILTIN_VARS)
+            self.types.update(objects.BUILTIN_TYPES)
+            self.generic_vars.update(BUILTIN_GENERIC_VARS)
+            self.generic_types.update(objects.BUILTIN_GENERIC_TYPES)
         else:
             # the level can be incremented immediately after creating a Chef
             self.level = parent_chef.level
@@ -154,14 +227,17 @@ class _Chef:
             else:
                 self.import_name_mapping = parent_chef.import_name_mapping
 
-            self.vars = _create_chainmap(parent_chef.vars)
-            self.types = _create_chainmap(parent_chef.types)
-            self.generic_vars = _create_chainmap(parent_chef.generic_vars)
-            self.generic_types = _create_chainmap(parent_chef.generic_types)
-
         # keys are strings, values are type objects
         self.export_types = export_types
 
+    # subchefs should be used like 'with parent._create_subchef() as subchef:'
+    # so that their names are forgotten when they are no longer used
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *junk):
+        self.symbols.exit(self)
+
     def _create_subchef(self):
         return _Chef(self, self.export_types,
                      self.is_function, self.returntype)
@@ -222,15 +298,12 @@ class _Chef:
                             function, args)
 
     def get_chef_for_varname(self, varname, is_generic, error_location):
-        chef = self
-        while chef is not None:
-            if is_generic:
-                if varname in chef.generic_vars.maps[0]:
-                    return chef
-            else:
-                if varname in chef.vars.maps[0]:
-                    return chef
-            chef = chef.parent_chef
+        if is_generic:
+            chef = self.generic_vars.get_chef(varname)
+        else:
+            chef = self.vars.get_chef(varname)
+        if chef is not None:
+            return chef
 
         if varname == 'this':
             raise common.CompileError(
@@ -449,30 +522,26 @@ class _Chef:
     def cook_setvar(self, raw):
         value = self.cook_expression(raw.value)
         varname = raw.varname
-        chef = self
 
         # TODO: should this use get_chef_for_varname?
-        while True:
-            if varname in chef.vars.maps[0]:
-                if chef.level == 0:
-                    raise common.CompileError(
-                        "cannot set built-in variable '%s'" % varname,
-                        raw.location)
-
-                var = chef.vars.maps[0][varname]
-                assert not isinstance(var, str)
-                self._check_assign_type(
-                    "'%s'" % varname, var.type, value, raw.location)
-                return SetVar(raw.location, None, var, value)
-
-            if chef.parent_chef is None:
-                # 'this = lel' fails in raw_ast.py
-                assert varname != 'this'
-                raise common.CompileError(
-                    "variable not found: %s" % varname,
-                    raw.location)
+        chef = self.vars.get_chef(varname)
+        if chef is None:
+            # 'this = lel' fails in raw_ast.py
+            assert varname != 'this'
+            raise common.CompileError(
+                "variable not found: %s" % varname,
+                raw.location)
 
-            chef = chef.parent_chef
+        if chef.level == 0:
+            raise common.CompileError(
+                "cannot set built-in variable '%s'" % varname,
+                raw.location)
+
+        var = self.vars[varname]
+        assert not isinstance(var, str)
+        self._check_assign_type(
+            "'%s'" % varname, var.type, value, raw.location)
+        return SetVar(raw.location, None, var, value)
 
     def cook_setattr(self, raw):
         obj = self.cook_expression(raw.obj)
@@ -504,21 +573,21 @@ class _Chef:
     # returns a list, unlike most other cook_blah methods
     def cook_let(self, raw):
         self._check_name_not_exist(raw.varname, raw.location)
+        target_chef = self.parent_chef if raw.outer else self
+        assert target_chef is not None
+
         if raw.generics is None:
-            value_chef = self
+            value = self.cook_expression(raw.value)
         else:
-            # TODO: figure out whether this should use self._create_subchef
-            value_chef = _Chef(self, self.export_types)
             generic_markers = collections.OrderedDict(
                 (name, objects.GenericMarker(name))
                 for name, location in raw.generics
             )
-            value_chef.types.update(generic_markers)
 
-        target_chef = self.parent_chef if raw.outer else self
-        assert target_chef is not None
-
-        value = value_chef.cook_expression(raw.value)
+            # TODO: figure out whether this should use self._create_subchef
+            with _Chef(self, self.export_types) as value_chef:
+                value_chef.types.update(generic_markers)
+                value = value_chef.cook_expression(raw.value)
 
         if raw.generics is None:
             var = Variable(raw.varname, value.type, raw.location, self.level)
@@ -576,11 +645,11 @@ class _Chef:
         else:
             returntype = self.cook_type(raw_returntype)
 
-        subchef = _Chef(self, self.export_types, True, returntype)
-        subchef.level += 1
-        subchef.vars.update(dict(zip(argnames, argvars)))
         functype = objects.FunctionType(argtypes, returntype)
-        body = subchef.cook_body(raw.body, new_subchef=False)
+        with _Chef(self, self.export_types, True, returntype) as subchef:
+            subchef.level += 1
+            subchef.vars.update(dict(zip(argnames, argvars)))
+            body = subchef.cook_body(raw.body, new_subchef=False)
 
         return CreateFunction(raw.location, functype, argvars, body)
 
@@ -647,20 +716,22 @@ class _Chef:
     #               body4
     #
     # TODO: use functools.reduce?
-    def cook_if_statement(self, raw):
-        raw_cond, raw_if_body = raw.ifs[0]
+    # ifs_index is the index of the first (cond, body) pair of raw.ifs to
+    # cook, and the rest of the pairs go to else_body, as nested ifs
+    def cook_if_statement(self, raw, ifs_index=0):
+        raw_cond, raw_if_body = raw.ifs[ifs_index]
         cond = self.cook_expression(raw_cond)
         if cond.type != objects.BUILTIN_TYPES['Bool']:
             raise common.CompileError(
                 "expected Bool, got " + cond.type.name, cond.location)
         if_body = self.cook_body(raw_if_body)
 
-        if len(raw.ifs) == 1:
+        if ifs_index == len(raw.ifs) - 1:
             else_body = self.cook_body(raw.else_body)
         else:
-            # _replace is a documented namedtuple method, it has _ in front to
-            # allow creating a namedtuple with an attribute named 'replace'
-            else_body = [self.cook_if_statement(raw._replace(ifs=raw.ifs[1:]))]
+            # this used to create a new raw IfStatement with raw.ifs[1:], but
+            # slicing a long elif chain for each elif took quadratic time
+            else_body = [self.cook_if_statement(raw, ifs_index + 1)]
 
         return IfStatement(cond.location, None, cond, if_body, else_body)
 
@@ -683,15 +754,15 @@ class _Chef:
 
     # returns a list, unlike most other things
     def cook_for(self, raw):
-        subchef = self._create_subchef()
-        init = subchef.cook_statement(raw.init)
-        cond = subchef.cook_expression(raw.cond)
-        if cond.type != objects.BUILTIN_TYPES['Bool']:
-            raise common.CompileError(
-                "expected Bool, got " + cond.type.name, cond.location)
+        with self._create_subchef() as subchef:
+            init = subchef.cook_statement(raw.init)
+            cond = subchef.cook_expression(raw.cond)
+            if cond.type != objects.BUILTIN_TYPES['Bool']:
+                raise common.CompileError(
+                    "expected Bool, got " + cond.type.name, cond.location)
 
-        incr = subchef.cook_statement(raw.incr)
-        body = subchef.cook_body(raw.body, new_subchef=False)
+            incr = subchef.cook_statement(raw.incr)
+            body = subchef.cook_body(raw.body, new_subchef=False)
         return init + [Loop(raw.location, None, cond, None, incr, body)]
 
     def cook_try_catch(self, try_location, raw_try_body, raw_catches):
@@ -707,12 +778,12 @@ class _Chef:
             self._check_name_not_exist(varname, varname_location)
             cooked_errortype = self.cook_type(errortype)
 
-            catch_chef = self._create_subchef()
             errorvar = Variable(varname, cooked_errortype, varname_location,
                                 self.level)
-            catch_chef.vars[varname] = errorvar
-            cooked_catch_body = catch_chef.cook_body(
-                catch_body, new_subchef=False)
+            with self._create_subchef() as catch_chef:
+                catch_chef.vars[varname] = errorvar
+                cooked_catch_body = catch_chef.cook_body(
+                    catch_body, new_subchef=False)
 
             create_local_vars.append(CreateLocalVar(
                 varname_location, None, errorvar))
@@ -827,8 +898,8 @@ class _Chef:
 
     def cook_body(self, raw_statements, *, new_subchef=True):
         if new_subchef:
-            return self._create_subchef().cook_body(
-                raw_statements, new_subchef=False)
+            with self._create_subchef() as subchef:
+                return subchef.cook_body(raw_statements, new_subchef=False)
 
         flatten = itertools.chain.from_iterable
         return list(flatten(map(self.cook_statement, raw_statements)))
@@ -845,3 +916,83 @@ def cook(compilation, raw_ast_statements, import_compilation_dict):
         raw_ast_statements, new_subchef=False)
 
     return (cooked_statements, export_types)
+
+
+# returns True if a raw statement contains an exporting let statement, e.g.
+# in the body of an if statement
+def _contains_export(raw_statement):
+    # list instead of recursion, because the code can be deeply nested
+    stack = [raw_statement]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, raw_ast.Let) and value.export:
+            return True
+        if isinstance(value, utils.Node):
+            stack.extend(value._values())
+        elif isinstance(value, (list, tuple)):
+            stack.extend(value)
+    return False
+
+
+# returns the type that cooking the value of a let statement would give, or
+# None if it can't be known without cooking
+def _get_let_type(builtin_chef, raw_let):
+    if raw_let.generics is not None or raw_let.outer:
+        return None
+
+    if isinstance(raw_let.value, (raw_ast.String, raw_ast.StrJoin)):
+        return objects.BUILTIN_TYPES['Str']
+    if isinstance(raw_let.value, raw_ast.Integer):
+        return objects.BUILTIN_TYPES['Int']
+
+    if isinstance(raw_let.value, raw_ast.FuncDefinition):
+        # unlike the body, the header contains everything needed
+        raw_args, raw_returntype = raw_let.value.header
+        try:
+            argtypes = [builtin_chef.cook_type(tybe)
+                        for tybe, name, location in raw_args]
+            if raw_returntype is None:
+                returntype = None
+            else:
+                returntype = builtin_chef.cook_type(raw_returntype)
+        except common.CompileError:
+            # e.g. a class defined in the file, cook() finds out the type
+            return None
+        return objects.FunctionType(argtypes, returntype)
+
+    return None
+
+
+def extract_export_types(raw_ast_statements):
+    """Find out the export types of a file without cooking all of it.
+
+    This returns an ordered dict like the export types that cook() returns, or
+    None if they can't be known from the raw AST alone, e.g. because an export
+    uses a class or the return value of a function. This is a lot faster than
+    cook(), because function bodies are not cooked, so files that import the
+    file can be compiled before it's done.
+
+    If cooking fails, the return value of this function doesn't matter.
+    """
+    builtin_chef = _Chef(None, None)
+    class_names = set()
+    export_types = collections.OrderedDict()
+
+    for raw in raw_ast_statements:
+        if isinstance(raw, raw_ast.Class):
+            class_names.add(raw.name)
+        elif isinstance(raw, raw_ast.Let):
+            if raw.export:
+                tybe = _get_let_type(builtin_chef, raw)
+                if tybe is None:
+                    return None
+                export_types[raw.varname] = tybe
+        elif _contains_export(raw):
+            return None
+
+    # if a class has the same name as a built-in type, cook_type() of the
+    # builtin chef would return the wrong type
+    if any(name in objects.BUILTIN_TYPES or
+           name in objects.BUILTIN_GENERIC_TYPES for name in class_names):
+        return None
+    return export_types
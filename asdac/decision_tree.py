@@ -531,6 +531,7 @@ def clean_all_unreachable_nodes(start_node):
                 node.jumped_from.remove(ref)
 
 
+# returns a set of the nodes that were found to be unreachable
 def clean_unreachable_nodes_given_one_of_them(unreachable_head):
     unreachable = set()
     to_visit = collections.deque([unreachable_head])
@@ -557,9 +558,13 @@ def clean_unreachable_nodes_given_one_of_them(unreachable_head):
             if ref.objekt in unreachable:
                 reachable_node.jumped_from.remove(ref)
 
+    return unreachable
+
 
 # to use this, create the new node and set its .next_node or similar
 # then call this function
+#
+# returns the nodes that became unreachable, including old
 def replace_node(old: Node, new: Node):
     if new is not None:
         new.jumped_from.update(old.jumped_from)
@@ -568,7 +573,7 @@ def replace_node(old: Node, new: Node):
         ref.set(new)
 
     old.jumped_from.clear()
-    clean_unreachable_nodes_given_one_of_them(old)
+    return clean_unreachable_nodes_given_one_of_them(old)
 
 
 # could be optimized more, but not a problem because this is used only for
@@ -0,0 +1,99 @@
+"""Writing dependency files for make and other build tools, for --depfile.
+
+A dependency file tells the build tool what source files each compiled file
+was created from, including files imported indirectly. For example, if
+main.asda imports lib.asda, then 'python3 -m asdac --depfile main.d main.asda'
+creates main.d with this content:
+
+    main.d: lib.asda main.asda
+    asda-compiled/lib.asdac: lib.asda
+    asda-compiled/main.asdac: main.asda lib.asda
+    lib.asda:
+    main.asda:
+
+The last lines tell make that the source files can be deleted, just like
+'gcc -MP' does. With the dependency file, make can decide that nothing needs
+to be compiled without running asdac at all.
+
+The compiled files are not written if they are already up to date, e.g. after
+touching a source file, but the dependency file is always written, so it is a
+good target for make:
+
+    main.d:
+            python3 -m asdac --depfile main.d main.asda
+    -include main.d
+"""
+
+import collections
+
+from asdac import common
+
+
+def _escape(path):
+    # this is how gcc escapes things, and make understands it
+    result = ''
+    for character in common.path_string(path):
+        if character in ' #':
+            result += '\\' + character
+        elif character == '$':
+            result += '$$'
+        else:
+            result += character
+    return result
+
+
+# returns {source path: list of source paths} for the given compilations and
+# everything they import, the first source path of each list is the key
+def get_dependencies(compilations):
+    result = collections.OrderedDict()
+
+    # depth-first search without recursion, because import chains can be
+    # long, and the imports of a compilation go to result before the
+    # compilation
+    for compilation in compilations:
+        stack = [compilation]
+        while stack:
+            current = stack[-1]
+            if current.source_path in result:
+                stack.pop()
+                continue
+
+            not_done = [import_ for import_ in current.imports
+                        if import_.source_path not in result]
+            if not_done:
+                stack.extend(not_done)
+                continue
+
+            stack.pop()
+            paths = collections.OrderedDict.fromkeys([current.source_path])
+            for import_ in current.imports:
+                paths.update(collections.OrderedDict.fromkeys(
+                    result[import_.source_path]))
+            result[current.source_path] = list(paths)
+
+    return result
+
+
+def write_depfile(path, compilations):
+    """Write a dependency file for compilations that are done."""
+    compilations = list(compilations)
+    dependencies = get_dependencies(compilations)
+
+    # the dependency file depends on everything
+    lines = [None]
+    all_source_paths = set()
+    for compilation in sorted(compilations,
+                              key=(lambda c: c.compiled_path)):
+        assert compilation.state == common.CompilationState.DONE
+        source_paths = dependencies[compilation.source_path]
+        lines.append('%s: %s\n' % (
+            _escape(compilation.compiled_path),
+            ' '.join(map(_escape, source_paths))))
+        all_source_paths.update(source_paths)
+
+    source_strings = sorted(map(_escape, all_source_paths))
+    lines[0] = '%s: %s\n' % (_escape(path), ' '.join(source_strings))
+    lines.extend('%s:\n' % string for string in source_strings)
+
+    with path.open('w', encoding='utf-8') as file:
+        file.writelines(lines)
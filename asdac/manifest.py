@@ -0,0 +1,99 @@
+"""The manifest file in the compiled directory, for fast no-op builds.
+
+Checking whether a compiled file is up to date means reading the compiled file
+and hashing the source file. The manifest contains the same information for
+all compiled files in one file that is read only once, so checking that
+nothing needs to be compiled is just a couple of stat() calls per file.
+
+An item of the manifest is used only if the source file and the compiled file
+haven't changed after writing the item. Other files are checked without the
+manifest, and the manifest is ignored entirely if it's corrupted or written by
+an incompatible version of asdac.
+"""
+
+import pickle
+
+from asdac import bytecode_reader, common
+
+
+FILENAME = 'manifest.pickle'
+
+# increase this when changing what the manifest contains
+_VERSION = 1
+
+
+class Manifest:
+
+    def __init__(self, compiled_dir, file_system):
+        self.path = compiled_dir / FILENAME
+        self.file_system = file_system
+
+        # {source_path: (source stat key, compiled stat key, compiled info)}
+        # the source hashes of the compiled infos are None, because an item is
+        # used only if the source file hasn't changed
+        self._items = {}
+        self._changed = False
+
+    def load(self, messager):
+        try:
+            with self.file_system.open_compiled_file(self.path) as file:
+                version, items = pickle.load(file)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            # pickle can raise many different errors for corrupted data
+            messager(3, 'Ignoring "%s" because reading it failed (%s: %s).'
+                     % (common.path_string(self.path), type(e).__name__, e))
+            return
+
+        if version == _VERSION:
+            self._items = items
+        else:
+            messager(3, 'Ignoring "%s" because it has version %r, not %r.'
+                     % (common.path_string(self.path), version, _VERSION))
+
+    # returns a bytecode_reader.CompiledInfo, or None if the manifest doesn't
+    # have up-to-date information about the compilation
+    def get_info(self, compilation):
+        try:
+            source_key, compiled_key, info = self._items[
+                compilation.source_path]
+        except KeyError:
+            return None
+
+        if (self.file_system.get_stat_key(compilation.source_path) !=
+                source_key or
+                self.file_system.get_stat_key(compilation.compiled_path) !=
+                compiled_key):
+            return None
+        return info
+
+    def update(self, compilation):
+        assert compilation.state == common.CompilationState.DONE
+        source_key = self.file_system.get_stat_key(compilation.source_path)
+        compiled_key = self.file_system.get_stat_key(
+            compilation.compiled_path)
+
+        old_item = self._items.get(compilation.source_path)
+        if old_item is not None and old_item[:2] == (source_key, compiled_key):
+            return
+
+        info = bytecode_reader.CompiledInfo(
+            [import_.source_path for import_ in compilation.imports],
+            compilation.export_types,
+            None,
+            compilation.export_hash,
+            [import_.export_hash for import_ in compilation.imports])
+        self._items[compilation.source_path] = (
+            source_key, compiled_key, info)
+        self._changed = True
+
+    def save(self):
+        if not self._changed:
+            return
+
+        # write_compiled_file() makes sure that other asdac processes don't
+        # see a partially written manifest
+        self.file_system.write_compiled_file(
+            self.path, pickle.dumps((_VERSION, self._items)))
+        self._changed = False
@@ -6,6 +6,8 @@ they are here as well.
 
 import collections
 import copy
+import hashlib
+import weakref
 
 from asdac import common
 
@@ -50,19 +52,9 @@ class Type:
         # remember to set this to True if you change .generic_types
         self.undo_generics_may_do_something = False
 
-    def __eq__(self, other):
-        if not isinstance(other, Type):
-            return NotImplemented
-
-        if self.generic_types:
-            return (self.generic_types == other.generic_types and
-                    self.original_generic == other.original_generic)
-        return (self is other)
-
-    def __hash__(self):
-        if self.generic_types:
-            return hash(tuple(self.generic_types) + (self.original_generic,))
-        return super().__hash__()
+    # types are compared with 'is', except function types, and that works
+    # for generic types because undo_generics() returns the same Array[Str]
+    # object every time, see _instantiate()
 
     @property
     def name(self):
@@ -76,11 +68,15 @@ class Type:
         if not self.undo_generics_may_do_something:
             return self
 
-        result = self._undo_generics_internal(type_dict)
-        if self.generic_types and result.original_generic is None:
-            assert result is not self
-            result.original_generic = self
-        return result
+        if self.generic_types:
+            if self.original_generic is None:
+                original = self
+            else:
+                original = self.original_generic
+            return _instantiate(original, tuple(
+                tybe.undo_generics(type_dict) for tybe in self.generic_types))
+
+        return self._undo_generics_internal(type_dict)
 
     def _undo_generics_internal(self, type_dict):
         result = copy.copy(self)
@@ -106,6 +102,24 @@ class Type:
     def __repr__(self):
         return '<%s type %r>' % (__name__, self.name)
 
+    # built-in types and generic types are compared with 'is', so pickling
+    # them (e.g. when sending export types to another process) must not create
+    # new objects
+    def __reduce_ex__(self, protocol):
+        if _get_builtin_type(self._name) is self:
+            return (_get_builtin_type, (self._name,))
+        if self.original_generic is not None:
+            return (_instantiate, (self.original_generic,
+                                   tuple(self.generic_types)))
+        return super().__reduce_ex__(protocol)
+
+    # undo_generics() copies types that it must not reuse, so copying must not
+    # use __reduce_ex__
+    def __copy__(self):
+        result = object.__new__(type(self))
+        result.__dict__.update(self.__dict__)
+        return result
+
 
 class FunctionType(Type):
 
@@ -131,15 +145,21 @@ class FunctionType(Type):
         return (self.argtypes == other.argtypes and
                 self.returntype == other.returntype)
 
-    # FIXME: missing __hash__?
+    def __hash__(self):
+        return hash((tuple(self.argtypes), self.returntype))
 
     def _undo_generics_internal(self, type_dict):
-        result = super()._undo_generics_internal(type_dict)
-        result.argtypes = [tybe.undo_generics(type_dict)
-                           for tybe in self.argtypes]
-        if result.returntype is not None:
-            result.returntype = result.returntype.undo_generics(type_dict)
-        return result
+        argtypes = [tybe.undo_generics(type_dict) for tybe in self.argtypes]
+        if self.returntype is None:
+            returntype = None
+        else:
+            returntype = self.returntype.undo_generics(type_dict)
+
+        # most function types don't contain anything generic
+        if (returntype is self.returntype and
+                all(new is old for new, old in zip(argtypes, self.argtypes))):
+            return self
+        return FunctionType(argtypes, returntype)
 
     def remove_this_arg(self, this_arg_type):
         assert self.argtypes[0] == this_arg_type
@@ -198,7 +218,10 @@ class UserDefinedClass(Type):
         )
         # self.attributes will also contain methods added with add_method()
 
-        self.undo_generics_may_do_something = True
+        # classes can't be generic, and undo_generics() used to copy them,
+        # which created a different class that wasn't equal to this class, or
+        # recursed infinitely if the class had a method returning the class
+        self.undo_generics_may_do_something = False
         self.constructor_argtypes = list(attr_arg_types.values())
 
 
@@ -218,6 +241,36 @@ def n_types(n):
     return '%d types' % n
 
 
+# {(original generic type, generic types): the generic type with the generic
+# types substituted}, e.g. {(Array, (Str,)): Array[Str]}
+#
+# the values are weak references, so that types used by a compilation that is
+# done are not kept in memory forever, e.g. by the compile server
+_instantiations = weakref.WeakValueDictionary()
+
+
+# returns the only Array[Str] object, for example
+def _instantiate(original, generic_types):
+    if list(generic_types) == original.generic_types:
+        return original
+
+    key = (original, generic_types)
+    try:
+        return _instantiations[key]
+    except KeyError:
+        pass
+
+    result = original._undo_generics_internal(
+        dict(zip(original.generic_types, generic_types)))
+    result.original_generic = original
+    _instantiations[key] = result
+    return result
+
+
+# {(type, markers, types to substitute): result}, weak like _instantiations
+_substitutions = weakref.WeakValueDictionary()
+
+
 # turns Array[T] into Array[Str], for example
 def substitute_generics(tybe, markers, types_to_substitute, error_location):
     assert markers
@@ -229,8 +282,15 @@ def substitute_generics(tybe, markers, types_to_substitute, error_location):
                ', '.join(t.name for t in types_to_substitute)),
             error_location)
 
-    mapping = dict(zip(markers, types_to_substitute))
-    return tybe.undo_generics(mapping)
+    key = (tybe, tuple(markers), tuple(types_to_substitute))
+    try:
+        return _substitutions[key]
+    except KeyError:
+        pass
+
+    result = tybe.undo_generics(dict(zip(markers, types_to_substitute)))
+    _substitutions[key] = result
+    return result
 
 
 T = GenericMarker('T')
@@ -256,3 +316,160 @@ BUILTIN_GENERIC_VARS = collections.OrderedDict([
 ])
 
 del T
+
+
+# returns None if there is no built-in type with the given name
+def _get_builtin_type(name):
+    try:
+        return BUILTIN_TYPES[name]
+    except KeyError:
+        return BUILTIN_GENERIC_TYPES.get(name)
+
+
+# class_stack prevents infinite recursion with classes that have methods that
+# take or return the class itself
+def _describe_type(tybe, class_stack):
+    if tybe is None:
+        return 'void'
+
+    if isinstance(tybe, FunctionType):
+        return 'functype{(%s) -> %s}' % (
+            ', '.join(_describe_type(argtype, class_stack)
+                      for argtype in tybe.argtypes),
+            _describe_type(tybe.returntype, class_stack))
+
+    if isinstance(tybe, GenericMarker):
+        return 'generic ' + tybe.name
+
+    if isinstance(tybe, UserDefinedClass):
+        if tybe in class_stack:
+            return 'class ' + tybe.name
+
+        class_stack.append(tybe)
+        result = 'class %s{%s}' % (tybe.name, ', '.join(
+            '%s%s: %s' % ('' if attribute.settable else 'readonly ', name,
+                          _describe_type(attribute.tybe, class_stack))
+            for name, attribute in tybe.attributes.items()))
+        class_stack.pop()
+        return result
+
+    if tybe.generic_types:
+        return '%s[%s]' % (tybe._name, ', '.join(
+            _describe_type(generic, class_stack)
+            for generic in tybe.generic_types))
+
+    assert tybe in BUILTIN_TYPES.values(), tybe
+    return tybe.name
+
+
+def get_export_hash(export_types):
+    """Returns a hash of exported names and types as bytes.
+
+    A file that imports another file needs to be recompiled only if the export
+    hash of the imported file changes.
+    """
+    description = ''.join(
+        '%s: %s\n' % (name, _describe_type(tybe, []))
+        for name, tybe in export_types.items())
+    return hashlib.sha256(description.encode('utf-8')).digest()
+
+
+# export types are stored as json in the compile cache, instead of pickling
+# them, because loading a pickle can run any code, see compile_cache.py
+#
+# classes are in a separate list and referred to by index, because a class
+# can have methods that take or return the class itself
+def export_types_to_json(export_types):
+    """Convert export types to something that json.dumps() can handle.
+
+    This raises ValueError if there are types that can't be converted.
+    """
+    classes = []
+    class_jsons = []
+
+    def type_to_json(tybe):
+        if tybe is None:
+            return None
+
+        if isinstance(tybe, FunctionType):
+            return ['function', [type_to_json(argtype)
+                                 for argtype in tybe.argtypes],
+                    type_to_json(tybe.returntype)]
+
+        if isinstance(tybe, UserDefinedClass):
+            if tybe not in classes:
+                classes.append(tybe)
+                class_json = {'name': tybe.name}
+                class_jsons.append(class_json)     # before recursing
+                class_json['attributes'] = [
+                    [name, attribute.settable, type_to_json(attribute.tybe)]
+                    for name, attribute in tybe.attributes.items()]
+                class_json['constructor_argtypes'] = list(map(
+                    type_to_json, tybe.constructor_argtypes))
+            return ['class', classes.index(tybe)]
+
+        original = tybe.original_generic
+        if original is not None and (
+                _get_builtin_type(original._name) is original):
+            return ['generic', original._name,
+                    list(map(type_to_json, tybe.generic_types))]
+
+        if BUILTIN_TYPES.get(tybe.name) is tybe:
+            return ['builtin', tybe.name]
+
+        raise ValueError("cannot convert %r to json" % tybe)
+
+    exports = [[name, type_to_json(tybe)]
+               for name, tybe in export_types.items()]
+    return {'classes': class_jsons, 'exports': exports}
+
+
+def export_types_from_json(json_data):
+    """The opposite of export_types_to_json().
+
+    This raises ValueError, TypeError, KeyError or IndexError if the json
+    doesn't come from export_types_to_json().
+    """
+    classes = [UserDefinedClass(class_json['name'], collections.OrderedDict())
+               for class_json in json_data['classes']]
+
+    def type_from_json(type_json):
+        if type_json is None:
+            return None
+
+        kind, *args = type_json
+        if kind == 'function':
+            argtypes, returntype = args
+            return FunctionType(list(map(type_from_json, argtypes)),
+                                type_from_json(returntype))
+
+        if kind == 'class':
+            [index] = args
+            if not 0 <= index < len(classes):
+                raise IndexError("invalid class index: %r" % index)
+            return classes[index]
+
+        if kind == 'generic':
+            name, generic_types = args
+            original = BUILTIN_GENERIC_TYPES[name]
+            if len(generic_types) != len(original.generic_types):
+                raise ValueError("wrong number of generic types")
+            return _instantiate(original, tuple(
+                map(type_from_json, generic_types)))
+
+        if kind == 'builtin':
+            [name] = args
+            return BUILTIN_TYPES[name]
+
+        raise ValueError("invalid type kind: %r" % kind)
+
+    for klass, class_json in zip(classes, json_data['classes']):
+        for name, settable, type_json in class_json['attributes']:
+            klass.attributes[name] = Attribute(
+                type_from_json(type_json), bool(settable))
+        klass.constructor_argtypes = list(map(
+            type_from_json, class_json['constructor_argtypes']))
+
+    return collections.OrderedDict(
+        (name, type_from_json(type_json))
+        for name, type_json in json_data['exports'])
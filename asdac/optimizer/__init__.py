@@ -1,6 +1,6 @@
 import itertools
 
-from asdac import decision_tree
+from asdac import decision_tree, timings
 from asdac.optimizer import copy_pasta, decisions, functions, popone, variables
 
 
@@ -52,7 +52,11 @@ def optimize(root_node, createfunc_node):
         # been called subsequently without any of them doing anything
         while did_nothing_count < len(function_list):
             optimizer_function = next(infinite_function_iterator)
-            if optimizer_function(root_node, all_nodes, createfunc_node):
+            # optimize_function_bodies calls this function recursively, so
+            # its time includes the times of other optimizer functions
+            if timings.call_optimizer_function(
+                    optimizer_function, root_node, all_nodes,
+                    createfunc_node):
                 did_something = True
                 did_nothing_count = 0
                 all_nodes = decision_tree.get_all_nodes(root_node)
@@ -2,20 +2,28 @@ from asdac import decision_tree
 
 
 # handles e.g. loops and ifs with TRUE or FALSE as a condition
+#
+# this optimizes all of them at once, because finding all nodes again after
+# optimizing each of them would take quadratic time with deeply nested ifs
 def optimize_truefalse_before_booldecision(root_node, all_nodes,
                                            createfunc_node):
+    removed = set()
+
     for node in all_nodes:
+        if node in removed:
+            continue
+
         if (
           isinstance(node, decision_tree.GetBuiltinVar) and
           isinstance(node.next_node, decision_tree.BoolDecision)):
             if node.varname == 'TRUE':
-                decision_tree.replace_node(node, node.next_node.then)
-                return True
-            if node.varname == 'FALSE':
-                decision_tree.replace_node(node, node.next_node.otherwise)
-                return True
+                removed |= decision_tree.replace_node(
+                    node, node.next_node.then)
+            elif node.varname == 'FALSE':
+                removed |= decision_tree.replace_node(
+                    node, node.next_node.otherwise)
 
-    return False
+    return bool(removed)
 
 
 def optimize_booldecision_before_truefalse(
@@ -1,41 +1,56 @@
 from asdac import common, decision_tree
 
 
-# you can assume that the variable is set after any visited node
-def _check_matching_sets_exist(node, var, error_location, visited_nodes):
-    if not node.jumped_from:
-        assert isinstance(node, decision_tree.Start)
-        if var in node.argvars:
-            return
+# returns nodes that can be reached from the start node without setting the
+# box variable
+#
+# this goes through the nodes once for each variable, instead of going
+# backwards from each place that gets the value, because that would take
+# quadratic time when the variable is used in deeply nested code
+def _find_nodes_before_set(start_node, var):
+    result = set()
+    to_visit = [start_node]     # should be faster than recursion
+
+    while to_visit:
+        node = to_visit.pop()
+        if node in result:
+            continue
+        result.add(node)
 
-        # TODO: variable definition location in error message
-        # TODO: mention this error in spec
-        raise common.CompileError(
-            "variable '%s' might not be set" % var.name, error_location)
+        # the variable is set after this node
+        if not (isinstance(node, decision_tree.GetLocalVar) and
+                node.var is var and
+                isinstance(node.next_node, decision_tree.SetToBox)):
+            to_visit.extend(node.get_jumps_to())
 
-    visited_nodes.add(node)
+    return result
 
-    if (
-      isinstance(node, decision_tree.GetLocalVar) and
-      node.var is var and
-      isinstance(node.next_node, decision_tree.SetToBox)):
-        return
 
-    for ref in node.jumped_from:
-        if ref.objekt not in visited_nodes:
-            _check_matching_sets_exist(
-                ref.objekt, var, error_location, visited_nodes)
+def check_boxes_set(start_node, all_nodes, createfunc_node):
+    assert isinstance(start_node, decision_tree.Start)
 
+    # {var: nodes that can be reached without setting var}
+    unset_nodes = {}
 
-def check_boxes_set(start_node, all_nodes, createfunc_node):
     for node in all_nodes:
         if not isinstance(node, decision_tree.UnBox):
             continue
 
         for ref in node.jumped_from:
-            assert isinstance(ref.objekt, decision_tree.GetLocalVar)
-            _check_matching_sets_exist(
-                ref.objekt, ref.objekt.var, ref.objekt.location, set())
+            get_node = ref.objekt
+            assert isinstance(get_node, decision_tree.GetLocalVar)
+            if get_node.var in start_node.argvars:
+                continue
+
+            if get_node.var not in unset_nodes:
+                unset_nodes[get_node.var] = _find_nodes_before_set(
+                    start_node, get_node.var)
+            if get_node in unset_nodes[get_node.var]:
+                # TODO: variable definition location in error message
+                # TODO: mention this error in spec
+                raise common.CompileError(
+                    "variable '%s' might not be set" % get_node.var.name,
+                    get_node.location)
 
 
 def nexts(node, n):
@@ -98,29 +113,46 @@ def optimize_unnecessary_boxes(start_node, all_nodes, createfunc_node):
     return False
 
 
-def _find_gets_for_set(node, var, visited_nodes):
-    visited_nodes.add(node)
+# these use loops instead of recursive generators, because a value yielded
+# from a deeply nested generator goes through all the generators, and that
+# takes quadratic time with deeply nested code
+def _find_gets_for_set(node, var):
+    gets = set()
+    visited_nodes = set()
+    to_visit = [node]
 
-    if isinstance(node, decision_tree.GetLocalVar) and node.var is var:
-        yield node
-    if isinstance(node, decision_tree.SetLocalVar) and node.var is var:
-        return
+    while to_visit:
+        node = to_visit.pop()
+        if node in visited_nodes:
+            continue
+        visited_nodes.add(node)
 
-    for other_node in node.get_jumps_to():
-        if other_node not in visited_nodes:
-            yield from _find_gets_for_set(other_node, var, visited_nodes)
+        if isinstance(node, decision_tree.GetLocalVar) and node.var is var:
+            gets.add(node)
+        if not (isinstance(node, decision_tree.SetLocalVar) and
+                node.var is var):
+            to_visit.extend(node.get_jumps_to())
 
+    return gets
 
-def _find_sets_for_var(node, var, visited_nodes):
-    visited_nodes.add(node)
 
-    if isinstance(node, decision_tree.SetLocalVar) and node.var is var:
-        yield node
-        return
+def _find_sets_for_var(node, var):
+    sets = set()
+    visited_nodes = set()
+    to_visit = [node]
+
+    while to_visit:
+        node = to_visit.pop()
+        if node in visited_nodes:
+            continue
+        visited_nodes.add(node)
+
+        if isinstance(node, decision_tree.SetLocalVar) and node.var is var:
+            sets.add(node)
+        else:
+            to_visit.extend(ref.objekt for ref in node.jumped_from)
 
-    for ref in node.jumped_from:
-        if ref.objekt not in visited_nodes:
-            yield from _find_sets_for_var(ref.objekt, var, visited_nodes)
+    return sets
 
 
 def _find_sets_and_their_gets(all_nodes):
@@ -129,8 +161,7 @@ def _find_sets_and_their_gets(all_nodes):
             if node.next_node is None:
                 yield (node, set())
             else:
-                yield (node, set(
-                    _find_gets_for_set(node.next_node, node.var, set())))
+                yield (node, _find_gets_for_set(node.next_node, node.var))
 
 
 def _optimize_set_once_get_once(set_node, get_node):
@@ -168,7 +199,7 @@ def optimize_temporary_vars(root_node, all_nodes, createfunc_node):
 
         if len(gets) == 1 and set_node.var not in argvars:
             [get_node] = gets
-            set_nodes = set(_find_sets_for_var(get_node, get_node.var, set()))
+            set_nodes = _find_sets_for_var(get_node, get_node.var)
 
             if len(set_nodes) == 1:
                 assert set_nodes == {set_node}
@@ -1,12 +1,11 @@
 import collections
-import itertools
 import os
 
-from . import common, string_parser, tokenizer
+from . import common, string_parser, tokenizer, utils
 
 
 def _astclass(name, fields):
-    return collections.namedtuple(name, ['location'] + fields)
+    return utils.node_class(name, ['location'] + fields, __name__)
 
 
 # the "header" of the function is the "(Blah b) -> Blah" part
@@ -44,13 +43,13 @@ TernaryOperator = _astclass('TernaryOperator', ['operator', 'lhs', 'mid',
                                                 'rhs'])
 # catches is a list of tuples:
 #   (catch_location, errortype, varname, varname_location, body) tuples
-Try = _astclass('TryCatch', ['try_body', 'catches',
-                             'finally_location', 'finally_body'])
+Try = _astclass('Try', ['try_body', 'catches',
+                        'finally_location', 'finally_body'])
 New = _astclass('New', ['tybe', 'args'])
 # args are (tybe, name, location) tuples
 # methods are (name, name_location, FuncDefinition) tuples
 Class = _astclass('Class', ['name', 'args', 'methods'])
-ThisExpression = _astclass('This', [])
+ThisExpression = _astclass('ThisExpression', [])
 
 
 def _duplicate_check(iterable, what_are_they):
@@ -67,22 +66,27 @@ def _to_string(parsed):
     return FuncCall(location, GetAttr(location, parsed, 'to_string'), [])
 
 
+# this used to use itertools.tee() for peeking, but every tee() made all
+# later tokens slower to get, and now copying is just copying an index
 class _TokenIterator:
 
-    def __init__(self, iterable):
-        self._iterator = iter(iterable)
+    # buffer is a tokenizer.TokenBuffer, and index is the index of the next
+    # token in it
+    def __init__(self, buffer, index=0, paren_ends=None):
+        self._buffer = buffer
+        self._index = index
+
+        # {index of '(': index of the token after the matching ')'}, shared
+        # with copies
+        if paren_ends is None:
+            paren_ends = {}
+        self._paren_ends = paren_ends
 
     def copy(self):
-        self._iterator, copy = itertools.tee(self._iterator)
-        return _TokenIterator(copy)
+        return _TokenIterator(self._buffer, self._index, self._paren_ends)
 
     def peek(self):
-        return self.copy().next_token()
-
-    def next_token(self):
-        try:
-            return next(self._iterator)
-        except StopIteration:
+        if not self._buffer.has_token(self._index):
             # i think this code is currently impossible to reach, but that may
             # change in the future without noticing it when writing the
             # changing code
@@ -90,15 +94,43 @@ class _TokenIterator:
             # TODO: the 'file' in this error message is wrong for an error that
             #       comes from the {...} part of a string literal
             raise common.CompileError("unexpected end of file", None)
+        return self._buffer.get_token(self._index)
+
+    def next_token(self):
+        token = self.peek()
+        self._index += 1
+        return token
 
     def eof(self):
         # old bug: don't use .next_token() or .peek() and catch CompileError,
         # because that also catches errors from tokenizer
-        try:
-            next(self.copy()._iterator)
-            return False
-        except StopIteration:
-            return True
+        return not self._buffer.has_token(self._index)
+
+    # skips from '(' to the token after the matching ')'
+    #
+    # this is used for looking ahead, and the ends of nested parentheses are
+    # remembered, so that looking ahead from each '(' in '((((...))))' doesn't
+    # take quadratic time
+    def skip_parens(self):
+        start = self._index
+        stack = []
+
+        while start not in self._paren_ends:
+            if self._index in self._paren_ends:
+                # nested parentheses that have been skipped before
+                self._index = self._paren_ends[self._index]
+                continue
+
+            # tokenizer makes sure that the parens are matched, so this can't
+            # fail with end of file
+            index = self._index
+            value = self.next_token().value
+            if value == '(':
+                stack.append(index)
+            elif value == ')':
+                self._paren_ends[stack.pop()] = self._index
+
+        self._index = self._paren_ends[start]
 
 
 # the values can be used as bit flags, e.g. OP_BINARY | OP_BINARY_CHAINING
@@ -155,24 +187,6 @@ class _PrecedenceHandler:
             raise common.CompileError(
                 "invalid syntax", part1.value.location + part2.value.location)
 
-    def _find_op(self, op_flags_pairs):
-        ops = [op for op, flags in op_flags_pairs]
-
-        for parts_index, part in enumerate(self.parts):
-            if part.is_expression:
-                continue
-            token = part.value
-
-            try:
-                op_index = ops.index(token.value)
-            except ValueError:
-                continue
-
-            flags = op_flags_pairs[op_index][1]
-            return (parts_index, flags, token)
-
-        return None
-
     # the tokens around the token being considered are named like this:
     #   before, this_token, after, that_token, more_after
     #
@@ -244,39 +258,57 @@ class _PrecedenceHandler:
             self.parts[index].is_expression == should_be_expression
         ) else None
 
+    # this used to find the first operator, replace it and the expressions
+    # around it with one expression, and then start again from the beginning,
+    # which was slow for long expressions
+    #
+    # now each precedence level goes through the parts once, and operators
+    # are still handled from left to right, so errors and results are the same
+    def _handle_precedence_level(self, op_flags_pairs):
+        flags_dict = dict(op_flags_pairs)
+        new_parts = []
+        index = 0
+
+        while index < len(self.parts):
+            part = self.parts[index]
+            if part.is_expression or part.value.value not in flags_dict:
+                new_parts.append(part)
+                index += 1
+                continue
+
+            this_token = part.value
+            flags = flags_dict[this_token.value]
+
+            # everything before this_token has been handled already
+            if new_parts and new_parts[-1].is_expression:
+                before = new_parts[-1].value
+            else:
+                before = None
+            after = self._get_part_value(index+1, True)
+            that_token = self._get_part_value(index+2, False)
+            more_after = self._get_part_value(index+3, True)
+
+            if flags & OP_TERNARY:
+                assert flags == OP_TERNARY     # no other flags
+                before_count, after_count, result = self._handle_ternary(
+                    before, this_token, after, that_token, more_after)
+            else:
+                before_count, after_count, result = (
+                    self._handle_binary_or_prefix(
+                        before, this_token, after, that_token,
+                        op_flags_pairs, flags))
+
+            result = self.part_parsed_callback(result)
+            del new_parts[len(new_parts) - before_count:]
+            new_parts.append(_PrecedenceHandlerPart(True, result))
+            index += 1 + after_count
+
+        self.parts = new_parts
+
     def run(self):
         self._check_no_adjacent_parts()
-
         for op_flags_pairs in _PRECEDENCE_LIST:
-            while True:
-                find_result = self._find_op(op_flags_pairs)
-                if find_result is None:
-                    break
-                index, flags, this_token = find_result
-
-                before = self._get_part_value(index-1, True)
-                after = self._get_part_value(index+1, True)
-                that_token = self._get_part_value(index+2, False)
-                more_after = self._get_part_value(index+3, True)
-
-                if flags & OP_TERNARY:
-                    assert flags == OP_TERNARY     # no other flags
-                    before_count, after_count, result = self._handle_ternary(
-                        before, this_token, after, that_token, more_after)
-                else:
-                    before_count, after_count, result = (
-                        self._handle_binary_or_prefix(
-                            before, this_token, after, that_token,
-                            op_flags_pairs, flags))
-
-                result = self.part_parsed_callback(result)
-
-                start_index = index - before_count
-                end_index = index + 1 + after_count
-                assert start_index >= 0
-                assert end_index <= len(self.parts)
-                self.parts[start_index:end_index] = [
-                    _PrecedenceHandlerPart(True, result)]
+            self._handle_precedence_level(op_flags_pairs)
 
         assert len(self.parts) == 1
         assert self.parts[0].is_expression
@@ -285,12 +317,13 @@ class _PrecedenceHandler:
 
 class _AsdaParser:
 
-    def __init__(self, compilation, token_generator, import_paths):
+    # token_buffer is a tokenizer.TokenBuffer
+    def __init__(self, compilation, token_buffer, import_paths):
         # order matters, because modules may have import time side-effects (ew)
         assert isinstance(import_paths, collections.OrderedDict)
 
         self.compilation = compilation
-        self.tokens = _TokenIterator(token_generator)
+        self.tokens = _TokenIterator(token_buffer)
         self.import_paths = import_paths
 
     def _handle_string_literal(self, string, location, allow_curly_braces):
@@ -310,9 +343,8 @@ class _AsdaParser:
                     raise common.CompileError(
                         "cannot use {...} strings here", part_location)
 
-                tokens = tokenizer.tokenize(
-                    part_location.compilation, value,
-                    initial_offset=part_location.offset)
+                tokens = tokenizer.TokenBuffer(
+                    part_location.compilation, value, part_location.offset)
 
                 parser = _AsdaParser(
                     self.compilation, tokens, self.import_paths)
@@ -377,7 +409,11 @@ class _AsdaParser:
     def parse_function_header(self, parse_an_arg):
         lparen, args, rparen = self.parse_commasep_in_parens(
             parse_an_arg)
-        _duplicate_check((arg[1:] for arg in args), 'argument')
+
+        # the arguments of function types like functype{(Str) -> void} are
+        # types, not (tybe, name, location) tuples
+        if parse_an_arg != self.parse_type:
+            _duplicate_check((arg[1:] for arg in args), 'argument')
 
         arrow = self.tokens.next_token()
         if arrow.value != '->':
@@ -461,19 +497,7 @@ class _AsdaParser:
         if self.tokens.peek().value == '(':
             # it is a function definition when there is '->' after matching ')'
             copy = self.tokens.copy()
-            copy.next_token()       # '('
-            paren_count = 1
-
-            while paren_count != 0:
-                # tokenizer makes sure that the parens are matched, so this
-                # can't fail with end of file
-                token = copy.next_token()
-
-                if token.value == '(':
-                    paren_count += 1
-                if token.value == ')':
-                    paren_count -= 1
-
+            copy.skip_parens()
             if (not copy.eof()) and copy.next_token().value == '->':
                 location, *header = self.parse_function_header(
                     self.parse_argument_definition)
@@ -945,8 +969,17 @@ class _AsdaParser:
 
 
 def parse(compilation, code):
-    parser = _AsdaParser(compilation, tokenizer.tokenize(compilation, code),
+    parser = _AsdaParser(compilation, tokenizer.TokenBuffer(compilation, code),
                          collections.OrderedDict())
     parser.parse_imports()
     statements = list(parser.parse_file())    # must not be lazy iterator
     return (statements, list(parser.import_paths.values()))
+
+
+# this is a lot faster than parse() because the tokenizer is lazy, so only the
+# import statements at the beginning of the file get tokenized
+def parse_imports(compilation, code):
+    parser = _AsdaParser(compilation, tokenizer.TokenBuffer(compilation, code),
+                         collections.OrderedDict())
+    parser.parse_imports()
+    return list(parser.import_paths.values())
@@ -0,0 +1,125 @@
+"""Parsed raw ASTs, saved next to the compiled files.
+
+When a file's source code hasn't changed, but it must be recompiled anyway
+because the exports of a file that it imports changed, the raw AST is loaded
+from a file instead of tokenizing and parsing the source code again. The file
+is next to the compiled file, named like "something.asdac.rawast", and it
+contains a key that is a hash of:
+
+    * the source code of asdac itself
+    * the path of the file being compiled
+    * the source code of the file being compiled
+
+The path is needed because the raw AST contains absolute paths of imported
+files, and those change when a project directory is moved. Raw ASTs don't
+depend on anything else, not even the content of imported files. Loading
+also checks that the imported files exist, so that a raw AST file can't
+make asdac compile imports that aren't there.
+
+Each location in the raw AST refers to a common.Compilation, and those are
+not saved. Loading puts the compilation being compiled into the locations.
+"""
+
+import hashlib
+import io
+import pickle
+
+from asdac import common, compile_cache
+
+
+# increase this when changing what the raw ast files contain
+_VERSION = 2
+
+
+def get_path(compilation):
+    path = compilation.compiled_path
+    return path.with_name(path.name + '.rawast')
+
+
+def get_key(compilation, source):
+    sha = hashlib.sha256()
+    sha.update(compile_cache.get_asdac_hash())
+    sha.update(str(compilation.source_path).encode('utf-8') + b'\0')
+    sha.update(common.hash_source(source))
+    return sha.digest()
+
+
+class _Pickler(pickle.Pickler):
+
+    def __init__(self, file, compilation):
+        super().__init__(file, pickle.HIGHEST_PROTOCOL)
+        self._compilation = compilation
+
+    def persistent_id(self, obj):
+        if obj is self._compilation:
+            return 'compilation'
+        return None
+
+
+class _Unpickler(pickle.Unpickler):
+
+    def __init__(self, file, compilation):
+        super().__init__(file)
+        self._compilation = compilation
+
+    def persistent_load(self, persistent_id):
+        if persistent_id == 'compilation':
+            return self._compilation
+        raise pickle.UnpicklingError(
+            "unknown persistent id: %r" % (persistent_id,))
+
+
+def dumps(compilation, statements, imports):
+    """Returns a raw AST as bytes that loads() converts back.
+
+    This is used for sending raw ASTs to other processes, and unlike save(),
+    this doesn't catch errors from pickling.
+    """
+    file = io.BytesIO()
+    _Pickler(file, compilation).dump((statements, imports))
+    return file.getvalue()
+
+
+def loads(compilation, bytez):
+    """Returns (statements, imports) from bytes returned by dumps()."""
+    return _Unpickler(io.BytesIO(bytez), compilation).load()
+
+
+def load(compilation, key):
+    """Returns (statements, imports) like raw_ast.parse(), or None.
+
+    None is returned if there is no raw AST file for the compilation, it
+    was saved for a different source file, different source code or a
+    different asdac, or a file that it imports doesn't exist.
+    """
+    try:
+        with compilation.file_system.open_compiled_file(
+                get_path(compilation)) as file:
+            version, saved_key, statements, imports = _Unpickler(
+                file, compilation).load()
+    except Exception:
+        # the file doesn't exist, or it's corrupted and pickle raised one of
+        # many possible errors, a corrupted file gets overwritten by save()
+        return None
+
+    if version != _VERSION or saved_key != key:
+        return None
+
+    # parsing again gives the usual error for a missing import
+    for path in imports:
+        if compilation.file_system.get_stat_key(path) is None:
+            return None
+    return (statements, imports)
+
+
+def save(compilation, key, statements, imports):
+    file = io.BytesIO()
+    try:
+        _Pickler(file, compilation).dump((_VERSION, key, statements, imports))
+        compilation.file_system.write_compiled_file(
+            get_path(compilation), file.getvalue())
+    except Exception:
+        # writing failed, or pickling failed with one of many possible errors,
+        # e.g. PicklingError, AttributeError or RecursionError, and compiling
+        # works without the raw ast file, so this is not an error
+        pass
@@ -0,0 +1,107 @@
+"""The compile server started with 'python3 -m asdac --server SOCKET'.
+
+Starting python and importing asdac takes a while, and asdac doesn't remember
+anything between compilations except the compiled files. The server is a
+process that keeps running, so it starts only once and it can remember things
+in memory. Use asdac/client.py for sending compile requests to it.
+
+A request is one line of JSON like this:
+
+    {"cwd": "/home/akuli/asda", "args": ["hello.asda"], "stderr_isatty": true}
+
+The response is one line of JSON like this:
+
+    {"stdout": "", "stderr": "hello.asda: Compiling to ...\\n",
+     "exit_code": 0}
+
+The stdout is usually empty, but e.g. --help prints to stdout.
+"""
+
+import contextlib
+import io
+import json
+import os
+import socket
+import socketserver
+import sys
+import traceback
+
+
+def is_supported():
+    return hasattr(socket, 'AF_UNIX')
+
+
+class _FakeTtyStringIO(io.StringIO):
+
+    def __init__(self, isatty):
+        super().__init__()
+        self._isatty = isatty
+
+    def isatty(self):
+        return self._isatty
+
+
+# main_function is called with the args of each request, and it must raise
+# SystemExit for errors like main() in __main__.py does
+def handle_request(request, main_function):
+    stdout = io.StringIO()
+    stderr = _FakeTtyStringIO(request['stderr_isatty'])
+
+    with contextlib.redirect_stdout(stdout), \
+            contextlib.redirect_stderr(stderr):
+        # relative paths in args are relative to the client's working dir
+        old_cwd = os.getcwd()
+        os.chdir(request['cwd'])
+        try:
+            main_function(request['args'])
+            exit_code = 0
+        except SystemExit as e:
+            if e.code is None:
+                exit_code = 0
+            elif isinstance(e.code, int):
+                exit_code = e.code
+            else:
+                print(e.code, file=sys.stderr)
+                exit_code = 1
+        except Exception:
+            # the server must not die because of bugs in asdac
+            traceback.print_exc()
+            exit_code = 1
+        finally:
+            os.chdir(old_cwd)
+
+    return {'stdout': stdout.getvalue(), 'stderr': stderr.getvalue(),
+            'exit_code': exit_code}
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        request = json.loads(self.rfile.readline().decode('utf-8'))
+        response = handle_request(request, self.server.main_function)
+        self.wfile.write(json.dumps(response).encode('utf-8') + b'\n')
+
+
+def create_server(socket_path, main_function):
+    # a socket file is left behind if the previous server was killed
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(socket_path)
+
+    # requests are handled one at a time because the working directory and
+    # sys.stderr are process-wide
+    server = socketserver.UnixStreamServer(socket_path, _RequestHandler)
+    server.main_function = main_function
+    return server
+
+
+def run_server(socket_path, main_function):
+    server = create_server(socket_path, main_function)
+    print("Waiting for compile requests in '%s'. Press Ctrl+C to stop."
+          % socket_path, file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.remove(socket_path)
@@ -22,7 +22,11 @@ _REGEXES = [
     ('interpolate', r'\{%s*\}' % _NOT_SPECIAL),
     ('text', r'%s+' % _NOT_SPECIAL),
 ]
-CONTENT_REGEX = '(?:%s)*' % '|'.join(regex for name, regex in _REGEXES)
+
+# this is like (escape|interpolate|text)* but without + inside *, because
+# that takes exponential time with the re module when there's no closing "
+CONTENT_REGEX = '(?:%s|%s|%s)*' % (
+    _REGEXES[0][1], _REGEXES[1][1], _NOT_SPECIAL)
 _PARSING_REGEX = '|'.join(
     '(?P<%s>%s)' % pair for pair in (_REGEXES + [('error', '.')]))
 
@@ -0,0 +1,212 @@
+"""Measuring how long compiling takes, for the --timings option.
+
+Usage:
+
+    recorder = timings.Timings()
+    with timings.activated(recorder):
+        ...
+        with timings.measure(compilation, 'parse'):
+            ...
+    print(json.dumps(recorder.get_json_report()))
+
+The measure() function and other things in this file do nothing if there is
+no activated Timings object, so they can be used without slowing down
+compiling when --timings is not used.
+"""
+
+import collections
+import contextlib
+import os
+import time
+
+from asdac import common
+
+
+# wall times are time.perf_counter() differences, but start is time.time()
+# because perf_counter() values can't be compared between processes
+Phase = collections.namedtuple('Phase', [
+    'source_path', 'name', 'start', 'wall_time', 'cpu_time', 'pid'])
+
+# the Timings object given to activated(), or None
+_current = None
+
+
+class _OptimizerFunctionStats:
+
+    def __init__(self):
+        self.calls = 0
+        self.changing_calls = 0     # calls that returned True
+        self.seconds = 0.0
+
+    def add(self, other):
+        self.calls += other.calls
+        self.changing_calls += other.changing_calls
+        self.seconds += other.seconds
+
+    def to_json(self):
+        return {
+            'calls': self.calls,
+            'changing_calls': self.changing_calls,
+            'seconds': self.seconds,
+        }
+
+
+class Timings:
+
+    def __init__(self):
+        self.start = time.time()
+        self.phases = []
+
+        # {(source_path, function_name): _OptimizerFunctionStats}
+        self.optimizer_functions = collections.OrderedDict()
+
+        # optimizer functions don't know what file they are optimizing
+        self._current_source_path = None
+
+    def add_phase(self, phase):
+        self.phases.append(phase)
+
+    def add_optimizer_call(self, function_name, seconds, did_something):
+        key = (self._current_source_path, function_name)
+        try:
+            stats = self.optimizer_functions[key]
+        except KeyError:
+            stats = self.optimizer_functions[key] = _OptimizerFunctionStats()
+
+        stats.calls += 1
+        stats.changing_calls += int(bool(did_something))
+        stats.seconds += seconds
+
+    # for combining timings from different processes
+    def merge(self, other):
+        self.phases.extend(other.phases)
+        for key, other_stats in other.optimizer_functions.items():
+            self.optimizer_functions.setdefault(
+                key, _OptimizerFunctionStats()).add(other_stats)
+
+    def get_json_report(self):
+        """Returns a JSON-serializable dict of measured timings."""
+        files = collections.OrderedDict()
+        phase_totals = collections.OrderedDict()
+
+        for phase in self.phases:
+            path = common.path_string(phase.source_path)
+            file = files.setdefault(path, collections.OrderedDict([
+                ('path', path),
+                ('wall_time', 0.0),
+                ('cpu_time', 0.0),
+                ('phases', collections.OrderedDict()),
+                ('optimizer_functions', collections.OrderedDict()),
+            ]))
+            file['wall_time'] += phase.wall_time
+            file['cpu_time'] += phase.cpu_time
+
+            for totals in [file['phases'].setdefault(phase.name, {}),
+                           phase_totals.setdefault(phase.name, {})]:
+                totals['wall_time'] = (
+                    totals.get('wall_time', 0.0) + phase.wall_time)
+                totals['cpu_time'] = (
+                    totals.get('cpu_time', 0.0) + phase.cpu_time)
+
+        function_totals = collections.OrderedDict()
+        for (source_path, name), stats in self.optimizer_functions.items():
+            function_totals.setdefault(
+                name, _OptimizerFunctionStats()).add(stats)
+            if source_path is not None:
+                path = common.path_string(source_path)
+                if path in files:
+                    files[path]['optimizer_functions'][name] = stats.to_json()
+
+        return collections.OrderedDict([
+            ('wall_time', time.time() - self.start),
+            ('phases', phase_totals),
+            ('optimizer_functions', collections.OrderedDict(
+                (name, stats.to_json())
+                for name, stats in function_totals.items())),
+            ('files', sorted(files.values(),
+                             key=(lambda file: file['wall_time']),
+                             reverse=True)),
+        ])
+
+    def get_chrome_trace(self):
+        """Returns a JSON-serializable dict in the Chrome trace event format.
+
+        Save the dict to a file and open it in chrome://tracing or Perfetto.
+        Each process that compiled files is shown as a separate row.
+        """
+        events = []
+        for phase in self.phases:
+            args = collections.OrderedDict([
+                ('cpu_time', phase.cpu_time),
+            ])
+            if phase.name == 'optimize':
+                for (source_path, name), stats in (
+                        self.optimizer_functions.items()):
+                    if source_path == phase.source_path:
+                        args[name] = stats.to_json()
+
+            events.append(collections.OrderedDict([
+                ('name', '%s: %s' % (common.path_string(phase.source_path),
+                                     phase.name)),
+                ('cat', phase.name),
+                ('ph', 'X'),
+                ('ts', (phase.start - self.start) * 1000 * 1000),
+                ('dur', phase.wall_time * 1000 * 1000),
+                ('pid', phase.pid),
+                ('tid', phase.pid),
+                ('args', args),
+            ]))
+
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+
+def get_current():
+    """Returns the activated Timings object, or None."""
+    return _current
+
+
+@contextlib.contextmanager
+def activated(timings):
+    global _current
+    old_current = _current
+    _current = timings
+    try:
+        yield
+    finally:
+        _current = old_current
+
+
+@contextlib.contextmanager
+def measure(compilation, phase_name):
+    if _current is None:
+        yield
+        return
+
+    timings = _current
+    old_source_path = timings._current_source_path
+    timings._current_source_path = compilation.source_path
+    start = time.time()
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    try:
+        yield
+    finally:
+        timings._current_source_path = old_source_path
+        timings.add_phase(Phase(
+            compilation.source_path, phase_name, start,
+            time.perf_counter() - wall_start,
+            time.process_time() - cpu_start,
+            os.getpid()))
+
+
+def call_optimizer_function(function, *args):
+    if _current is None:
+        return function(*args)
+
+    timings = _current
+    start = time.perf_counter()
+    result = function(*args)
+    timings.add_optimizer_call(
+        '%s.%s' % (function.__module__.split('.')[-1], function.__name__),
+        time.perf_counter() - start, result)
+    return result
@@ -1,27 +1,44 @@
-import collections
+import array
+import itertools
+import re
 
-import more_itertools
 import regex
 
 from . import common, string_parser
 
 
-_LETTER_REGEX = r'\p{Lu}|\p{Ll}|\p{Lo}'    # not available in stdlib re module
-_ID_REGEX = r'(?:%s|_)(?:%s|[0-9_])*' % (_LETTER_REGEX, _LETTER_REGEX)
+def _get_token_regex(letter_regex):
+    id_regex = r'(?:%s|_)(?:%s|[0-9_])*' % (letter_regex, letter_regex)
+    return '|'.join('(?P<%s>%s)' % pair for pair in [
+        ('OPERATOR', r'==|!=|->|[+\-*=`;:.,\[\]{}()]'),
+        ('INTEGER', r'[1-9][0-9]*|0'),
+        ('MODULEFUL_ID', r'%s:%s' % (id_regex, id_regex)),
+        ('ID', id_regex),
+        ('STRING', '"' + string_parser.CONTENT_REGEX + '"'),
+        ('IGNORE_BLANK_LINE', r'(?:(?<=\n)|^) *(?:#.*)?\n'),
+        ('NEWLINE', r'\n'),
+        # DEDENT tokens are created "manually"
+        ('INDENT', r'(?:(?<=\n)|^) +'),
+        ('IGNORE_SPACES', r' '),
+        ('IGNORE_COMMENT', r'#.*'),
+        ('ERROR', '.'),
+    ])
+
+
+# \p{...} is not available in the stdlib re module, and the regex module is
+# much slower than re, so re is used for files that contain only ASCII
+# characters, and for those, the letters are just A-Z and a-z
+_TOKEN_REGEX = _get_token_regex(r'\p{Lu}|\p{Ll}|\p{Lo}')
+_UNICODE_TOKEN_PATTERN = regex.compile(_TOKEN_REGEX)
+_ASCII_TOKEN_PATTERN = re.compile(_get_token_regex(r'[A-Za-z]'))
+_NON_ASCII_PATTERN = re.compile(r'[^\x00-\x7f]')
+
+
+def _get_token_pattern(code):
+    if _NON_ASCII_PATTERN.search(code) is None:
+        return _ASCII_TOKEN_PATTERN
+    return _UNICODE_TOKEN_PATTERN
 
-_TOKEN_REGEX = '|'.join('(?P<%s>%s)' % pair for pair in [
-    ('OPERATOR', r'==|!=|->|[+\-*=`;:.,\[\]{}()]'),
-    ('INTEGER', r'[1-9][0-9]*|0'),
-    ('MODULEFUL_ID', r'%s:%s' % (_ID_REGEX, _ID_REGEX)),
-    ('ID', _ID_REGEX),
-    ('STRING', '"' + string_parser.CONTENT_REGEX + '"'),
-    ('IGNORE_BLANK_LINE', r'(?<=\n|^) *(?:#.*)?\n'),
-    ('NEWLINE', r'\n'),
-    ('INDENT', r'(?<=\n|^) +'),      # DEDENT tokens are created "manually"
-    ('IGNORE_SPACES', r' '),
-    ('IGNORE_COMMENT', r'#.*'),
-    ('ERROR', '.'),
-])
 
 # keep this up to date! this is what prevents these from being valid
 # variable names
@@ -38,7 +55,121 @@ _KEYWORDS = {
 }
 
 
-Token = collections.namedtuple('Token', ['type', 'value', 'location'])
+class Token:
+    """A token with a type string, a value string and a location.
+
+    Tokens from a TokenBuffer create their locations only when needed,
+    because most locations are never used.
+    """
+
+    __slots__ = ('type', 'value', '_location', '_buffer', '_index')
+
+    def __init__(self, type, value, location):
+        self.type = type
+        self.value = value
+        self._location = location
+        self._buffer = None
+        self._index = None
+
+    @property
+    def location(self):
+        if self._location is None:
+            self._location = self._buffer.get_location(self._index)
+        return self._location
+
+    def __repr__(self):
+        return 'Token(type=%r, value=%r, location=%r)' % (
+            self.type, self.value, self.location)
+
+    def __eq__(self, other):
+        if not isinstance(other, Token):
+            return NotImplemented
+        return ((self.type, self.value, self.location) ==
+                (other.type, other.value, other.location))
+
+
+_TYPES = ['OPERATOR', 'INTEGER', 'MODULEFUL_ID', 'ID', 'STRING', 'NEWLINE',
+          'INDENT', 'DEDENT', 'KEYWORD']
+_TYPE_CODES = {name: code for code, name in enumerate(_TYPES)}
+
+
+class TokenBuffer:
+    """Tokens of a file in arrays of numbers, for using less memory.
+
+    Each token has a type, a value, an offset and a length. Values are stored
+    only once, because the same names and operators are used many times.
+    Locations and Token objects are created only when needed.
+
+    The tokens are created lazily, so that errors from the tokenizer don't hide
+    errors that the parser finds from code before the tokenizer error.
+    """
+
+    def __init__(self, compilation, code, initial_offset=0):
+        assert initial_offset >= 0
+        self.compilation = compilation
+        self._types = array.array('B')      # indexes of _TYPES
+        self._value_ids = array.array('L')  # indexes of self._values
+        self._offsets = array.array('L')
+        self._lengths = array.array('L')
+        self._values = []
+        self._value_ids_by_value = {}
+        self._filler = _fill_buffer(self, code, initial_offset)
+
+    def _append(self, type_, value, offset, length):
+        value_id = self._value_ids_by_value.get(value)
+        if value_id is None:
+            value_id = self._value_ids_by_value[value] = len(self._values)
+            self._values.append(value)
+
+        self._types.append(_TYPE_CODES[type_])
+        self._value_ids.append(value_id)
+        self._offsets.append(offset)
+        self._lengths.append(length)
+
+    def has_token(self, index):
+        """Tokenize until the token at the index exists or there are no more.
+
+        Returns False if the index is after the last token.
+        """
+        while index >= len(self._types):
+            if self._filler is None:
+                return False
+            try:
+                next(self._filler)
+            except StopIteration:
+                self._filler = None
+        return True
+
+    # these don't tokenize more, use has_token() first
+    def get_type(self, index):
+        return _TYPES[self._types[index]]
+
+    def get_value(self, index):
+        return self._values[self._value_ids[index]]
+
+    def get_location(self, index):
+        return common.Location(self.compilation, self._offsets[index],
+                               self._lengths[index])
+
+    def get_token(self, index):
+        token = Token(self.get_type(index), self.get_value(index), None)
+        token._buffer = self
+        token._index = index
+        return token
+
+    def __iter__(self):
+        index = 0
+        while True:
+            while index < len(self._types):
+                token = Token(_TYPES[self._types[index]],
+                              self._values[self._value_ids[index]], None)
+                token._buffer = self
+                token._index = index
+                yield token
+                index += 1
+
+            if not self.has_token(index):
+                return
 
 
 # tabs are disallowed because they aren't used for indentation and you can use
@@ -53,208 +184,218 @@ def _tab_check(compilation, code, initial_offset):
                               common.Location(compilation, first_tab, 1))
 
 
-def _raw_tokenize(compilation, code, initial_offset):
+_LPARENS = {'(': ')', '[': ']', '{': '}'}
+_RPARENS = {')': '(', ']': '[', '}': '{'}
+
+
+# this used to be a chain of generators that each did one of the things that
+# this does, and this does the same things in one pass over the tokens
+#
+# tokens are (type, value, offset, length) tuples here, and they are produced
+# in 3 steps for each match of _TOKEN_REGEX:
+#   1.  The token is checked and parentheses are matched.
+#   2.  Indents, dedents and newlines are handled. This adds 0 or more tokens
+#       to a list of new tokens.
+#   3.  Each new token is checked for invalid colons and indents. Colons and
+#       newlines before indents are removed, and for that, a token is added to
+#       the buffer only when the next 2 tokens are known.
+#
+# this yields None after adding each token to the buffer
+def _fill_buffer(buffer, code, initial_offset):
+    compilation = buffer.compilation
+    append = buffer._append
     _tab_check(compilation, code, initial_offset)
 
-    # remember this part of this code, because many other things rely on this
-    if not code.endswith('\n'):
-        code += '\n'
+    # remember this part of this code, because many other things rely on this:
+    # the code is tokenized as if it ended with '\n'
+    #
+    # code += '\n' would copy all of the code, so only the last line is
+    # copied, and that works because '\n' can be only at the end of a token
+    pattern = _get_token_pattern(code)
+    last_line_start = code.rfind('\n') + 1
+    if last_line_start == len(code):
+        last_line = ''
+    else:
+        last_line = code[last_line_start:] + '\n'
+    matches = itertools.chain(pattern.finditer(code, 0, last_line_start),
+                              pattern.finditer(last_line))
+
+    def error(message, token):
+        return common.CompileError(
+            message, common.Location(compilation, token[2], token[3]))
+
+    paren_stack = []
+
+    # step 2 stuff, see _handle_indents_and_dedents_and_unwanted_whitespace()
+    # in git history for the original code
+    space_ignore_stack = [False]
+    indent_levels = [0]
+    new_line_starting = True
+    token = None
+    new_tokens = []
+
+    # step 3 stuff, the 2 tokens before the newest token or None
+    token1 = token2 = None
 
-    for match in regex.finditer(_TOKEN_REGEX, code):
+    for match in matches:
         token_type = match.lastgroup
-        location = common.Location(
-            compilation, match.start() + initial_offset,
-            match.end() - match.start())
+        if token_type.startswith('IGNORE_'):
+            continue
+
         value = match.group(0)
+        start = match.start()
+        length = match.end() - start
+        if match.string is last_line:
+            start += last_line_start
+        token = (token_type, value, start + initial_offset, length)
 
         if token_type == 'ERROR':
             if value == '"':
-                raise common.CompileError(
-                    "invalid string", location)
+                raise error("invalid string", token)
             # the value is 1 character
             if value.isprintable():
-                raise common.CompileError(
-                    # TODO: this is confusing if value == "'"
-                    "unexpected '%s'" % value, location)
-            raise common.CompileError(
-                "unexpected character U+%04X" % ord(value), location)
-
-        if token_type.startswith('IGNORE_'):
-            continue
+                # TODO: this is confusing if value == "'"
+                raise error("unexpected '%s'" % value, token)
+            raise error("unexpected character U+%04X" % ord(value), token)
 
         if value in _KEYWORDS:
             assert token_type == 'ID'
             token_type = 'KEYWORD'
-
-        yield Token(token_type, value, location)
-
-
-def _match_parens(tokens):
-    lparens = list('([{')
-    rparens = list(')]}')
-    lparen2rparen = dict(zip(lparens, rparens))
-    rparen2lparen = dict(zip(rparens, lparens))
-
-    stack = []
-    for token in tokens:
-        if token.value in lparens:
-            stack.append(token)
-
-        if token.value in rparens:
-            if not stack:
-                raise common.CompileError(
-                    "there is no matching '%s'" % rparen2lparen[token.value],
-                    token.location)
-
-            matching_paren = stack.pop().value
-            if matching_paren != rparen2lparen[token.value]:
-                raise common.CompileError(
-                    "the matching paren is '%s', not '%s'" % (
-                        matching_paren, rparen2lparen[token.value]),
-                    token.location)
-
-        yield token
-
-    if stack:
-        raise common.CompileError(
-            "there is no '%s'" % lparen2rparen[stack[-1].value],
-            stack[-1].location)
-
-
-def _handle_indents_and_dedents_and_unwanted_whitespace(tokens):
-    # this code took a while to figure out... don't ask me to comment it more
-    space_ignore_stack = [False]
-    indent_levels = [0]
-    new_line_starting = True
-
-    token = None    # used below, set in for loop
-
-    for token in tokens:
-        assert token is not None
-
-        if token.type in {'NEWLINE', 'INDENT'} and space_ignore_stack[-1]:
+            token = (token_type,) + token[1:]
+
+        # step 1: parentheses
+        if value in _LPARENS:
+            paren_stack.append(token)
+        elif value in _RPARENS:
+            if not paren_stack:
+                raise error("there is no matching '%s'" % _RPARENS[value],
+                            token)
+
+            matching_paren = paren_stack.pop()[1]
+            if matching_paren != _RPARENS[value]:
+                raise error("the matching paren is '%s', not '%s'" % (
+                    matching_paren, _RPARENS[value]), token)
+
+        # step 2: indents and dedents
+        if token_type in {'NEWLINE', 'INDENT'} and space_ignore_stack[-1]:
             continue
 
-        if token.type == 'NEWLINE':
-            assert not new_line_starting, "_raw_tokenize() doesn't work"
+        if token_type == 'NEWLINE':
+            assert not new_line_starting
             new_line_starting = True
-            yield token
+            new_tokens.append(token)
 
         elif new_line_starting:
-            if token.type == 'INDENT':
-                indent_level = len(token.value)
+            if token_type == 'INDENT':
+                indent_level = len(value)
             else:
                 indent_level = 0
 
-            fake_token_location = common.Location(
-                token.location.compilation, token.location.offset, 0)
-
             if indent_level > indent_levels[-1]:
-                assert token.type == 'INDENT'
-                yield token
+                assert token_type == 'INDENT'
+                new_tokens.append(token)
                 indent_levels.append(indent_level)
 
             elif indent_level < indent_levels[-1]:
                 if indent_level not in indent_levels:
-                    raise common.CompileError(
-                        "the indentation is wrong", token.location)
+                    raise error("the indentation is wrong", token)
+
                 while indent_level != indent_levels[-1]:
                     del indent_levels[-1]
                     was_ignoring_spaces = space_ignore_stack.pop()
                     assert not was_ignoring_spaces
-                    yield Token('DEDENT', '', fake_token_location)
+                    new_tokens.append(('DEDENT', '', token[2], 0))
 
                     if not space_ignore_stack[-1]:
                         # this is why you shouldn't check if the value of a
                         # token is '\n', you should instead check if the type
                         # of the token is 'NEWLINE'
-                        yield Token('NEWLINE', '', fake_token_location)
+                        new_tokens.append(('NEWLINE', '', token[2], 0))
 
-            if token.type != 'INDENT':
-                yield token
+            if token_type != 'INDENT':
+                new_tokens.append(token)
 
             new_line_starting = False
 
         else:
-            yield token
-
-        if token.value in {'(', '[', '{'}:
+            new_tokens.append(token)
+
+        # step 3: colons
+        for token3 in new_tokens:
+            _check_colons(error, token1, token2, token3)
+            if token1 is not None and (token2[0] != 'INDENT' and
+                                       token3[0] != 'INDENT'):
+                append(*token1)
+                yield
+            token1 = token2
+            token2 = token3
+        new_tokens.clear()
+
+        # this is after step 3, so that errors from step 3 are raised before
+        # this assert fails for code like '[x:y z]', like they used to be
+        if value in _LPARENS:
             space_ignore_stack.append(True)
-        elif token.value in {')', ']', '}'}:
+        elif value in _RPARENS:
             was_ignoring_spaces = space_ignore_stack.pop()
             assert was_ignoring_spaces
-        elif token.value == ':':
+        elif value == ':':
             space_ignore_stack.append(False)
 
-    # if the previous loop didn't leave a token variable around, it can't have
-    # done anything
+    if paren_stack:
+        raise error("there is no '%s'" % _LPARENS[paren_stack[-1][1]],
+                    paren_stack[-1])
+
+    # if there were no tokens, the loop didn't do anything
     if token is None:
-        assert space_ignore_stack == [False]
-        assert indent_levels == [0]
         return
 
-    fake_token_location = common.Location(
-        token.location.compilation,
-        token.location.offset + token.location.length, 0)
-
+    end_offset = token[2] + token[3]
     while indent_levels != [0]:
-        yield Token('DEDENT', '', fake_token_location)
-        yield Token('NEWLINE', '', fake_token_location)
+        new_tokens.append(('DEDENT', '', end_offset, 0))
+        new_tokens.append(('NEWLINE', '', end_offset, 0))
         del indent_levels[-1]
 
     assert space_ignore_stack
     assert not any(space_ignore_stack)
 
+    for token3 in new_tokens:
+        _check_colons(error, token1, token2, token3)
+        if token1 is not None and (token2[0] != 'INDENT' and
+                                   token3[0] != 'INDENT'):
+            append(*token1)
+            yield
+        token1 = token2
+        token2 = token3
+
+    # corner case: file may end with ':'
+    if token1 is not None and token1[1] == ':':
+        raise error("unexpected end of file", token2)
+
+    if token1 is not None and token2[0] != 'INDENT':
+        append(*token1)
+        yield
+    if token2 is not None:
+        append(*token2)
+        yield
+
 
 # the only allowed sequence that contains colon or indent is: colon \n indent
 #
 # x:y looks up the exported thing 'y' from a module 'x', but x:y as a whole is
 # a MODULEFUL_ID token, there is no colon token involved in that
-def _check_colons(tokens):
-    staggered = more_itertools.stagger(tokens, offsets=(-2, -1, 0))
-    token1 = token2 = token3 = None
-
-    for token1, token2, token3 in staggered:
-        assert token3 is not None
-
-        if token3.type == 'INDENT':
-            if (token1 is None or
-                    token2 is None or
-                    token1.value != ':' or
-                    token2.type != 'NEWLINE'):
-                raise common.CompileError(
-                    "indent without : and newline", token3.location)
-
-        if token1 is not None and token1.value == ':':
-            assert token2 is not None and token3 is not None
-            if token2.type != 'NEWLINE' or token3.type != 'INDENT':
-                raise common.CompileError(
-                    ": without newline and indent", token1.location)
-
-        yield token3
-
-    # corner case: file may end with ':'
-    if token2 is not None and token2.value == ':':
-        raise common.CompileError("unexpected end of file", token3.location)
-
+def _check_colons(error, token1, token2, token3):
+    if token3[0] == 'INDENT':
+        if (token1 is None or
+                token2 is None or
+                token1[1] != ':' or
+                token2[0] != 'NEWLINE'):
+            raise error("indent without : and newline", token3)
 
-# to make rest of the code simpler, 'colon \n indent' sequences are
-# replaced with just indents
-def _remove_colons(tokens):
-    staggered = more_itertools.stagger(tokens, offsets=(0, 1, 2), longest=True)
-    for token1, token2, token3 in staggered:
-        # that is, ignore some stuff that comes before indents
-        if (
-          (token2 is None or token2.type != 'INDENT') and
-          (token3 is None or token3.type != 'INDENT')):
-            yield token1
+    if token1 is not None and token1[1] == ':':
+        if token2[0] != 'NEWLINE' or token3[0] != 'INDENT':
+            raise error(": without newline and indent", token1)
 
 
 def tokenize(compilation, code, *, initial_offset=0):
-    assert initial_offset >= 0
-    tokens = _raw_tokenize(compilation, code, initial_offset)
-    tokens = _match_parens(tokens)
-    tokens = _handle_indents_and_dedents_and_unwanted_whitespace(tokens)
-    tokens = _check_colons(tokens)
-    tokens = _remove_colons(tokens)
-    return tokens
+    """Returns an iterator of Token objects."""
+    return iter(TokenBuffer(compilation, code, initial_offset))
@@ -1,3 +1,6 @@
+import collections
+
+
 # util files are an antipattern imo, but python just doesn't have this
 class AttributeReference:
 
@@ -22,3 +25,66 @@ class AttributeReference:
 
     def get(self):
         return getattr(self.objekt, self.attribute)
+
+
+class Node:
+    """Base class for classes created with node_class()."""
+
+    __slots__ = ()
+    _fields = ()
+
+    def _values(self):
+        return tuple(getattr(self, name) for name in self._fields)
+
+    def __repr__(self):
+        return '%s(%s)' % (type(self).__name__, ', '.join(
+            '%s=%r' % (name, getattr(self, name)) for name in self._fields))
+
+    def __eq__(self, other):
+        if type(self) is not type(other):
+            return NotImplemented
+        return self._values() == other._values()
+
+    def __hash__(self):
+        return hash(self._values())
+
+    # pickling with this is a lot more compact than pickling the slots
+    def __reduce__(self):
+        return (type(self), self._values())
+
+    def _asdict(self):
+        return collections.OrderedDict(zip(self._fields, self._values()))
+
+    # creates a new node, like namedtuple's _replace
+    def _replace(self, **changes):
+        values = self._asdict()
+        for name, value in changes.items():
+            if name not in values:
+                raise ValueError("%s has no field named %r"
+                                 % (type(self).__name__, name))
+            values[name] = value
+        return type(self)(*values.values())
+
+
+def node_class(name, fields, module):
+    """Creates a class for AST nodes, like collections.namedtuple but smaller.
+
+    Instances have the field values in __slots__, and they compare equal if
+    they are of the same class and their field values are equal. Unlike with
+    namedtuples, the nodes are not tuples, so they can't be indexed or
+    unpacked, and there's no per-instance tuple header to store.
+    """
+    # an __init__ with the field names as arguments is a lot faster than
+    # looping over the fields, namedtuple does this too
+    source = 'def __init__(self%s):\n' % ''.join(', ' + f for f in fields)
+    source += ''.join('    self.%s = %s\n' % (f, f) for f in fields)
+    source += '    pass\n'
+    namespace = {}
+    exec(source, namespace)
+
+    return type(name, (Node,), {
+        '__slots__': tuple(fields),
+        '__module__': module,
+        '_fields': tuple(fields),
+        '__init__': namespace['__init__'],
+    })
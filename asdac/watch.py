@@ -0,0 +1,122 @@
+"""Compiling again when files change, for 'python3 -m asdac --watch'.
+
+The watcher uses the same CompileManager for all builds, so everything that
+was compiled is remembered in its source_path_2_compilation dict. When files
+change, the watcher forgets the changed files and the files that import them,
+directly or indirectly, and then the next build checks only the forgotten
+files. Files that import a changed file are recompiled only if the exports
+of the changed file changed, because CompileManager compares export hashes.
+
+Changes are found by polling the modification times and sizes of the source
+files, because that works everywhere without dependencies.
+"""
+
+import collections
+import time
+
+from asdac import common
+
+
+class Watcher:
+
+    # report_error is called with a common.CompileError when compiling fails
+    def __init__(self, compile_manager, source_paths, report_error):
+        self.compile_manager = compile_manager
+        self.source_paths = source_paths
+        self._report_error = report_error
+
+        # {source_path: set of source paths of files that import it}
+        self.importers = collections.defaultdict(set)
+
+        # {source_path: compilation}, used for updating self.importers
+        self._indexed = {}
+
+        # {source_path: stat key} for all files used in the previous build,
+        # including files that failed to compile
+        self._stat_keys = {}
+
+    def _update_importers(self):
+        current = self.compile_manager.source_path_2_compilation
+
+        for path, compilation in list(self._indexed.items()):
+            if current.get(path) is not compilation:
+                for import_ in compilation.imports:
+                    self.importers[import_.source_path].discard(path)
+                del self._indexed[path]
+
+        for path, compilation in current.items():
+            if path not in self._indexed:
+                for import_ in compilation.imports:
+                    self.importers[import_.source_path].add(path)
+                self._indexed[path] = compilation
+
+    # returns True if compiling succeeded
+    def build(self):
+        manager = self.compile_manager
+        manager.something_was_compiled = False
+        try:
+            manager.compile_all(self.source_paths)
+            success = True
+        except common.CompileError as e:
+            self._report_error(e)
+            success = False
+        except OSError as e:
+            # e.g. a file was deleted, but it is still imported
+            if e.filename is None:
+                message = str(e)
+            else:
+                message = 'cannot read "%s": %s' % (
+                    common.path_string(e.filename), e.strerror)
+            self._report_error(common.CompileError(message))
+            success = False
+
+        file_system = manager.file_system
+        self._stat_keys = {
+            path: file_system.get_stat_key(path)
+            for path in manager.source_path_2_compilation}
+
+        # compilations that failed are checked again in the next build
+        for path, compilation in list(
+                manager.source_path_2_compilation.items()):
+            if compilation.state != common.CompilationState.DONE:
+                del manager.source_path_2_compilation[path]
+        self._update_importers()
+
+        if success and not manager.something_was_compiled:
+            manager.messager(0, "Nothing needed to be compiled.")
+        return success
+
+    # returns source paths of files that have changed after the previous
+    # build
+    def find_changes(self):
+        file_system = self.compile_manager.file_system
+        return [path for path, key in self._stat_keys.items()
+                if file_system.get_stat_key(path) != key]
+
+    # returns a set of source paths
+    def forget(self, changed_paths):
+        forgotten = set()
+        stack = list(changed_paths)
+        while stack:
+            path = stack.pop()
+            if path not in forgotten:
+                forgotten.add(path)
+                self.compile_manager.source_path_2_compilation.pop(path, None)
+                stack.extend(self.importers.get(path, ()))
+        return forgotten
+
+    def run(self, interval):
+        """Compile, and compile again after every change forever."""
+        self.build()
+        while True:
+            self.compile_manager.messager(0, "Waiting for changes...")
+            changed = []
+            while not changed:
+                time.sleep(interval)
+                changed = self.find_changes()
+
+            for path in changed:
+                self.compile_manager.messager(1, '"%s" has changed.' % (
+                    common.path_string(path)))
+            self.forget(changed)
+            self.build()